@@ -1,11 +1,30 @@
+import datetime
 from typing import Optional, Type
 
 from fastapi.params import Query
 from pydantic import ValidationError
 from starlette.exceptions import HTTPException
 
-from app.core.const import DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT, DEFAULT_BOOK_ORDER_BY
-from app.models.schemas.books import BooksFilter
+from app.core.const import DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT, DEFAULT_BOOK_ORDER_BY, MAX_SEARCH_QUERY_LENGTH
+from app.core.cursor import cursor_value, decode_cursor, encode_cursor
+from app.db.queries.facets import FACETS
+from app.db.queries.sorting import parse_sort
+from app.models.domain.books import Book
+from app.db.rows import BookSearchRow
+from app.models.schemas.books import BooksFilter, BooksSearch
+
+
+# search results are ordered by rank only, the cursor carries it as its sort_by
+SEARCH_SORT_BY = '-rank'
+
+# type of the sort value a cursor carries per sort key, and whether it may be None (the NULLS LAST group)
+CURSOR_VALUE_TYPES = {
+    'title': (str, False),
+    'rate': (float, True),
+    'pub_date': (datetime.datetime, False),
+    'created_at': (datetime.datetime, True),
+    'rank': (float, False),
+}
 
 
 class BookFilterManager:
@@ -22,7 +41,9 @@ class BookFilterManager:
             authors: Optional[str] = None,
             sort_by: Optional[str] = DEFAULT_BOOK_ORDER_BY,
             offset: int = Query(DEFAULT_BOOK_OFFSET, ge=0),
-            limit: int = Query(DEFAULT_BOOK_LIMIT, ge=1)
+            limit: int = Query(DEFAULT_BOOK_LIMIT, ge=1),
+            cursor: Optional[str] = None,
+            facets: Optional[str] = None,
     ) -> BooksFilter:
 
         if tags:
@@ -37,8 +58,13 @@ class BookFilterManager:
         if authors:
             authors = self.split_to_ids(authors)
 
-        if sort_by:
-            sort_by = self.modify_sort_by(sort_by)
+        # an empty sort_by means the default order
+        sort_by = self.modify_sort_by(sort_by or DEFAULT_BOOK_ORDER_BY)
+
+        after = self.decode_after(cursor, sort_by) if cursor else None
+
+        if facets:
+            facets = self.split_facets(facets)
 
         return BooksFilter(
             tags=tags,
@@ -48,8 +74,17 @@ class BookFilterManager:
             sort_by=sort_by,
             limit=limit,
             offset=offset,
+            after=after,
+            facets=facets,
         )
 
+    def split_facets(self, spl: str) -> list[str]:
+        facets = spl.split(',')
+        if not set(facets) <= set(FACETS):
+            raise self.validation_error(status_code=400, detail='facets not one of allowed.')
+
+        return facets
+
     def split_to_ids(self, spl: str, type_: Type[int | str] = int) -> list[int | str]:
         try:
             return list(map(type_, spl.split(',')))
@@ -57,12 +92,68 @@ class BookFilterManager:
             raise self.validation_error(status_code=400, detail='Wrong prams')
 
     def modify_sort_by(self, value: str) -> str:
-        desc = False
-        if value.startswith('-'):
-            desc = True
-            value = value[1:]
-
-        if value not in self.allowed_sort_values:
+        key, _ = parse_sort(value)
+        if key not in self.allowed_sort_values:
             raise self.validation_error(status_code=400, detail='sort_by not one of allowed.')
 
-        return f'{value} ASC' if not desc else f'{value} DESC'
+        return value
+
+    def decode_after(self, cursor: str, sort_by: str) -> tuple:
+        try:
+            cursor_sort_by, value, book_id = decode_cursor(cursor)
+        except (TypeError, ValueError):
+            raise self.validation_error(status_code=400, detail='Wrong cursor')
+
+        if cursor_sort_by != sort_by:
+            raise self.validation_error(status_code=400, detail='cursor does not match sort_by.')
+
+        sort_key, _ = parse_sort(sort_by)
+        try:
+            value_type, nullable = CURSOR_VALUE_TYPES[sort_key]
+            return cursor_value(value, value_type, nullable), cursor_value(book_id, int)
+        except (KeyError, ValueError):
+            raise self.validation_error(status_code=400, detail='Wrong cursor')
+
+    @staticmethod
+    def next_cursor(books: list[Book], books_filter: BooksFilter) -> Optional[str]:
+        if len(books) < books_filter.limit:
+            return None
+
+        last_book = books[-1]
+        sort_key, _ = parse_sort(books_filter.sort_by)
+        return encode_cursor(books_filter.sort_by, getattr(last_book, sort_key), last_book.id)
+
+
+class BookSearchManager(BookFilterManager):
+    """Search query and facets of /books/search/, pages are continued by a (rank, id) cursor."""
+
+    def __init__(self):
+        super().__init__([])
+
+    def __call__(
+            self,
+            q: str = Query(..., min_length=1, max_length=MAX_SEARCH_QUERY_LENGTH),
+            tags: Optional[str] = None,
+            categories: Optional[str] = None,
+            publishers: Optional[str] = None,
+            authors: Optional[str] = None,
+            limit: int = Query(DEFAULT_BOOK_LIMIT, ge=1),
+            cursor: Optional[str] = None,
+    ) -> BooksSearch:
+        return BooksSearch(
+            q=q,
+            tags=self.split_to_ids(tags, str) if tags else None,
+            categories=self.split_to_ids(categories) if categories else None,
+            publishers=self.split_to_ids(publishers) if publishers else None,
+            authors=self.split_to_ids(authors) if authors else None,
+            limit=limit,
+            after=self.decode_after(cursor, SEARCH_SORT_BY) if cursor else None,
+        )
+
+    @staticmethod
+    def next_cursor(books: list[BookSearchRow], books_search: BooksSearch) -> Optional[str]:
+        if len(books) < books_search.limit:
+            return None
+
+        last_book = books[-1]
+        return encode_cursor(SEARCH_SORT_BY, last_book.rank, last_book.id)
@@ -0,0 +1,42 @@
+import datetime
+from typing import Optional
+
+from fastapi.params import Query
+from starlette.exceptions import HTTPException
+
+from app.core.const import DEFAULT_COMMENTS_LIMIT, MAX_COMMENTS_LIMIT
+from app.core.cursor import cursor_value, decode_cursor, encode_cursor
+from app.db.rows import CommentRow
+from app.models.schemas.comments import CommentsPage
+
+
+class CommentsPageManager:
+    """Newest first comment pages, continued by a (pub_date, id) cursor."""
+    validation_error = HTTPException
+
+    def __call__(
+            self,
+            limit: int = Query(DEFAULT_COMMENTS_LIMIT, ge=1, le=MAX_COMMENTS_LIMIT),
+            cursor: Optional[str] = None,
+    ) -> CommentsPage:
+        after = self.decode_after(cursor) if cursor else None
+
+        return CommentsPage(limit=limit, after=after)
+
+    def decode_after(self, cursor: str) -> tuple:
+        try:
+            pub_date, comment_id = decode_cursor(cursor)
+            return cursor_value(pub_date, datetime.datetime, nullable=True), cursor_value(comment_id, int)
+        except (TypeError, ValueError):
+            raise self.validation_error(status_code=400, detail='Wrong cursor')
+
+    @staticmethod
+    def next_cursor(comments: list[CommentRow], page: CommentsPage) -> Optional[str]:
+        if len(comments) < page.limit:
+            return None
+
+        last_comment = comments[-1]
+        return encode_cursor(last_comment.pub_date, last_comment.id)
+
+
+comments_page = CommentsPageManager()
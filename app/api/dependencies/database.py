@@ -1,23 +1,79 @@
-from typing import Callable, Type, Awaitable
+import time
+from typing import AsyncIterator, Callable, Type
 from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker as SessionMaker
 from starlette.requests import Request
+from starlette.responses import Response
 
+from app.core.config import get_app_settings
+from app.core.const import PRIMARY_PIN_COOKIE
 from app.db.repositories.base import BaseRepository
+from app.db.repositories.books.books import BookRepository
+from app.db.repositories.books.raw import RawBookRepository
+from app.db.repositories.shelves.raw import RawShelfRepository
+from app.db.repositories.shelves.shelves import ShelfRepository
+from app.services.invalidation import invalidation_bus
 
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
 
-def _get_session_maker(request: Request) -> SessionMaker:
-    return request.app.state.session_maker
+# repositories replaced by their raw asyncpg counterpart when raw_sql_reads is on
+RAW_REPOSITORIES: dict[Type[BaseRepository], Type[BaseRepository]] = {
+    BookRepository: RawBookRepository,
+    ShelfRepository: RawShelfRepository,
+}
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _pin_to_primary(response: Response) -> None:
+    window = get_app_settings().read_your_writes_window
+    response.set_cookie(PRIMARY_PIN_COOKIE, str(int(time.time()) + window), max_age=window, httponly=True)
+
+
+def _get_read_session_maker(request: Request) -> SessionMaker:
+    # a client that just wrote reads from the primary until replicas caught up
+    if _pinned_to_primary(request):
+        return request.app.state.primary_read_session_maker
+    return next(request.app.state.read_session_makers)
+
+
+async def get_session(request: Request, response: Response) -> AsyncIterator[AsyncSession]:
+    """Unit of work of a request.
+
+    FastAPI resolves a dependency once per request, so every repository injected
+    into the same request shares this session, its connection and its transaction.
+    Safe methods get a READ ONLY session on a replica which is just closed (rolled
+    back) instead of being flushed and committed, writes go to the primary and
+    send the invalidations they published once committed.
+    """
+    if request.method in SAFE_METHODS:
+        async with _get_read_session_maker(request)() as session:
+            yield session
+        return
+
+    _pin_to_primary(response)
+    async with request.app.state.session_maker() as session:
+        async with session.begin():
+            yield session
+        await invalidation_bus.flush(session)
 
 
 def get_repository(
         repo_type: Type[BaseRepository],
-) -> Callable[[SessionMaker], BaseRepository]:
+) -> Callable[[AsyncSession], BaseRepository]:
+    if get_app_settings().raw_sql_reads:
+        repo_type = RAW_REPOSITORIES.get(repo_type, repo_type)
+
+    # async so FastAPI calls it on the event loop instead of handing it to the threadpool
     async def _get_repo(
-            session_maker: SessionMaker = Depends(_get_session_maker),
+            session: AsyncSession = Depends(get_session),
     ) -> BaseRepository:
-        async with session_maker() as session:
-            async with session.begin():
-                yield repo_type(session)
+        return repo_type(session)
 
     return _get_repo
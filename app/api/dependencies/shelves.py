@@ -1,13 +1,25 @@
+import datetime
 from typing import Optional, Type
+from uuid import UUID
 
 from fastapi.params import Query
+from starlette.exceptions import HTTPException
 
 from app.core.const import DEFAULT_SHELF_ORDER_BY, DEFAULT_SHELF_OFFSET, DEFAULT_SHELF_LIMIT
+from app.core.cursor import cursor_value, decode_cursor, encode_cursor
+from app.db.queries.sorting import parse_sort
+from app.models.domain.shelves import Shelf
 from app.models.schemas.shelves import ShelfFilter
 
+# type of the sort value a cursor carries per sort key, and whether it may be None (the NULLS LAST group)
+CURSOR_VALUE_TYPES = {
+    'name': (str, False),
+    'created_at': (datetime.datetime, True),
+}
+
 
 class ShelfFilterManager:
-    validation_error = ValueError
+    validation_error = HTTPException
 
     def __init__(self, allowed_sort_values: list[str]):
         self.allowed_sort_values = allowed_sort_values
@@ -17,35 +29,60 @@ class ShelfFilterManager:
             tags: Optional[str] = None,
             sort_by: Optional[str] = DEFAULT_SHELF_ORDER_BY,
             offset: int = Query(DEFAULT_SHELF_OFFSET, ge=0),
-            limit: int = Query(DEFAULT_SHELF_LIMIT, ge=1)
+            limit: int = Query(DEFAULT_SHELF_LIMIT, ge=1),
+            cursor: Optional[str] = None,
     ) -> ShelfFilter:
 
         if tags:
             tags = self.split_to_ids(tags, str)
 
-        if sort_by:
-            sort_by = self.modify_sort_by(sort_by)
+        # an empty sort_by means the default order
+        sort_by = self.modify_sort_by(sort_by or DEFAULT_SHELF_ORDER_BY)
+
+        after = self.decode_after(cursor, sort_by) if cursor else None
 
         return ShelfFilter(
             tags=tags,
             sort_by=sort_by,
             limit=limit,
             offset=offset,
+            after=after,
         )
 
     def split_to_ids(self, spl: str, type_: Type[int | str] = int) -> list[int | str]:
         try:
             return list(map(type_, spl.split(',')))
-        except TypeError:
-            raise self.validation_error('Wrong prams')
+        except (TypeError, ValueError):
+            raise self.validation_error(status_code=400, detail='Wrong prams')
 
     def modify_sort_by(self, value: str) -> str:
-        desc = False
-        if value.startswith('-'):
-            desc = True
-            value = value[1:]
+        key, _ = parse_sort(value)
+        if key not in self.allowed_sort_values:
+            raise self.validation_error(status_code=400, detail='sort_by not one of allowed.')
+
+        return value
+
+    def decode_after(self, cursor: str, sort_by: str) -> tuple:
+        try:
+            cursor_sort_by, value, shelf_uid = decode_cursor(cursor)
+        except (TypeError, ValueError):
+            raise self.validation_error(status_code=400, detail='Wrong cursor')
+
+        if cursor_sort_by != sort_by:
+            raise self.validation_error(status_code=400, detail='cursor does not match sort_by.')
+
+        sort_key, _ = parse_sort(sort_by)
+        try:
+            value_type, nullable = CURSOR_VALUE_TYPES[sort_key]
+            return cursor_value(value, value_type, nullable), cursor_value(shelf_uid, UUID)
+        except (KeyError, ValueError):
+            raise self.validation_error(status_code=400, detail='Wrong cursor')
 
-        if value not in self.allowed_sort_values:
-            raise self.validation_error('sort_by not on of allowed.')
+    @staticmethod
+    def next_cursor(shelves: list[Shelf], shelf_filter: ShelfFilter) -> Optional[str]:
+        if len(shelves) < shelf_filter.limit:
+            return None
 
-        return f'{value} ASC' if not desc else f'{value} DESC'
+        last_shelf = shelves[-1]
+        sort_key, _ = parse_sort(shelf_filter.sort_by)
+        return encode_cursor(shelf_filter.sort_by, getattr(last_shelf, sort_key), last_shelf.uid)
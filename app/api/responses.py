@@ -0,0 +1,41 @@
+from typing import Any, Awaitable, Callable, Hashable, Type, Union
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+
+from app.core.config import get_app_settings
+from app.models.serialization import dump_json
+from app.services.cache import TTLCache
+
+settings = get_app_settings()
+
+
+async def cached_json_response(
+        cache: TTLCache,
+        key: Hashable,
+        build: Callable[[], Awaitable[BaseModel]],
+        session: AsyncSession,
+) -> Response:
+    """Serve the serialized body stored under key, building and storing it on a miss.
+
+    build reads through session. Replicas may not have caught up with a write for
+    read_your_writes_window seconds, so a body a replica built within that long of
+    the key's invalidation is served but not stored.
+    """
+    content = cache.get(key)
+    if content is None:
+        model = await build()
+        content = model.json(by_alias=True).encode()
+        if not (session.info.get('replica') and cache.invalidated_within(key, settings.read_your_writes_window)):
+            cache.set(key, content)
+
+    return Response(content=content, media_type='application/json')
+
+
+def model_response(schema: Type[BaseModel], **content: Any) -> Union[BaseModel, Response]:
+    """schema(**content), written straight to bytes by its compiled serializer in fast mode."""
+    if not settings.fast_json_responses:
+        return schema(**content)
+
+    return Response(content=dump_json(schema, content), media_type='application/json')
@@ -1,61 +1,125 @@
 import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from starlette.responses import Response
 from fastapi.security import OAuth2PasswordBearer
 
-from app.api.dependencies.books import BookFilterManager
+from app.api.dependencies.books import BookFilterManager, BookSearchManager
+from app.api.dependencies.comments import comments_page
 from app.api.dependencies.database import get_repository
 from app.api.dependencies.user import require_user, possible_user
+from app.api.responses import cached_json_response, model_response
+from app.core.const import DEFAULT_AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_QUERY_LENGTH
 from app.db.queries.tables import User
 
 from app.db.repositories.books.authors import BookAuthorRepository
 from app.db.repositories.books.categories import BookCategoryRepository
 from app.db.repositories.books.tags import BookTagsRepository
 from app.db.repositories.books.publishers import BookPublisherRepository
-from app.db.repositories.books.books import BookRepository
-from app.models.schemas.comments import CommentInResponse, CommentInCreate, ListOfCommentsInResponse
+from app.db.repositories.books.books import BookRepository, BOOK_SORT
+from app.models.schemas.comments import CommentInResponse, CommentInCreate, ListOfCommentsInResponse, CommentsPage
 from app.models.schemas.common import SuccessDelete
 from app.models.schemas.tags import TagsInList
 from app.models.schemas.books import ListOfBookPublisherInResponse, ListOfBooksInResponse, BooksFilter, \
-    BookInResponse, ListOfBookAuthorInResponse, ListOfBookCategoriesInResponse, BookRateInCreate, BookRateInResponse
+    BookInResponse, ListOfBookAuthorInResponse, ListOfBookCategoriesInResponse, BookRateInCreate, BookRateInResponse, \
+    BooksSearch, ListOfBookTitlesInResponse
+from app.services.cache import reference_cache, BOOK_TAGS, BOOK_PUBLISHERS, BOOK_AUTHORS, BOOK_CATEGORIES
 from app import resources
 
 router = APIRouter()
 
-book_filter_manager = BookFilterManager(['title', 'rate', 'pub_date', 'created_at'])
+book_filter_manager = BookFilterManager(list(BOOK_SORT.columns))
+book_search_manager = BookSearchManager()
 
 
 @router.get("/tags/", response_model=TagsInList, name="books:book-tags")
 async def get_all_tags(
         tags_repo: BookTagsRepository = Depends(get_repository(BookTagsRepository)),
-) -> TagsInList:
-    tags = await tags_repo.get_all_book_tags()
-    return TagsInList(tags=tags)
+) -> Response:
+    async def build() -> TagsInList:
+        tags = await tags_repo.get_all_book_tags()
+        return TagsInList(tags=tags)
+
+    return await cached_json_response(reference_cache, BOOK_TAGS, build, tags_repo.session)
 
 
 @router.get("/publishers/", response_model=ListOfBookPublisherInResponse, name="books:book-publishers")
 async def get_all_tags(
         publisher_repo: BookPublisherRepository = Depends(get_repository(BookPublisherRepository)),
-) -> ListOfBookPublisherInResponse:
-    publishers = await publisher_repo.get_all_publishers()
-    return ListOfBookPublisherInResponse(publishers=publishers)
+) -> Response:
+    async def build() -> ListOfBookPublisherInResponse:
+        publishers = await publisher_repo.get_all_publishers()
+        return ListOfBookPublisherInResponse(publishers=publishers)
+
+    return await cached_json_response(reference_cache, BOOK_PUBLISHERS, build, publisher_repo.session)
 
 
 @router.get("/authors/", response_model=ListOfBookAuthorInResponse, name="books:book-authors")
 async def get_all_tags(
         author_repo: BookAuthorRepository = Depends(get_repository(BookAuthorRepository)),
-) -> ListOfBookAuthorInResponse:
-    authors = await author_repo.get_all_authors()
-    return ListOfBookAuthorInResponse(authors=authors)
+) -> Response:
+    async def build() -> ListOfBookAuthorInResponse:
+        authors = await author_repo.get_all_authors()
+        return ListOfBookAuthorInResponse(authors=authors)
+
+    return await cached_json_response(reference_cache, BOOK_AUTHORS, build, author_repo.session)
 
 
 @router.get("/categories/", response_model=ListOfBookCategoriesInResponse, name="books:bookl-categories")
 async def get_all_tags(
         category_repo: BookCategoryRepository = Depends(get_repository(BookCategoryRepository)),
-) -> ListOfBookCategoriesInResponse:
-    categories = await category_repo.get_all_categories()
-    return ListOfBookCategoriesInResponse(categories=categories)
+) -> Response:
+    async def build() -> ListOfBookCategoriesInResponse:
+        categories = await category_repo.get_all_categories()
+        return ListOfBookCategoriesInResponse(categories=categories)
+
+    return await cached_json_response(reference_cache, BOOK_CATEGORIES, build, category_repo.session)
+
+
+AutocompleteQuery = Query(..., min_length=1, max_length=MAX_AUTOCOMPLETE_QUERY_LENGTH)
+AutocompleteLimit = Query(DEFAULT_AUTOCOMPLETE_LIMIT, ge=1, le=MAX_AUTOCOMPLETE_LIMIT)
+
+
+@router.get("/autocomplete/titles/", response_model=ListOfBookTitlesInResponse, name="books:autocomplete-titles")
+async def autocomplete_titles(
+        q: str = AutocompleteQuery,
+        limit: int = AutocompleteLimit,
+        book_repo: BookRepository = Depends(get_repository(BookRepository)),
+) -> Response:
+    books = await book_repo.autocomplete_titles(q, limit)
+    return model_response(ListOfBookTitlesInResponse, books=books)
+
+
+@router.get("/autocomplete/authors/", response_model=ListOfBookAuthorInResponse, name="books:autocomplete-authors")
+async def autocomplete_authors(
+        q: str = AutocompleteQuery,
+        limit: int = AutocompleteLimit,
+        author_repo: BookAuthorRepository = Depends(get_repository(BookAuthorRepository)),
+) -> Response:
+    authors = await author_repo.autocomplete_authors(q, limit)
+    return model_response(ListOfBookAuthorInResponse, authors=authors)
+
+
+@router.get("/autocomplete/publishers/", response_model=ListOfBookPublisherInResponse,
+            name="books:autocomplete-publishers")
+async def autocomplete_publishers(
+        q: str = AutocompleteQuery,
+        limit: int = AutocompleteLimit,
+        publisher_repo: BookPublisherRepository = Depends(get_repository(BookPublisherRepository)),
+) -> Response:
+    publishers = await publisher_repo.autocomplete_publishers(q, limit)
+    return model_response(ListOfBookPublisherInResponse, publishers=publishers)
+
+
+@router.get("/autocomplete/tags/", response_model=TagsInList, name="books:autocomplete-tags")
+async def autocomplete_tags(
+        q: str = AutocompleteQuery,
+        limit: int = AutocompleteLimit,
+        tags_repo: BookTagsRepository = Depends(get_repository(BookTagsRepository)),
+) -> TagsInList:
+    tags = await tags_repo.autocomplete_tags(q, limit)
+    return TagsInList(tags=tags)
 
 
 @router.get("/", response_model=ListOfBooksInResponse, name="books:filter-books")
@@ -63,7 +127,7 @@ async def filter_books(
         books_filter: BooksFilter = Depends(book_filter_manager),
         user: Optional[User] = Depends(possible_user),
         book_repo: BookRepository = Depends(get_repository(BookRepository))
-) -> ListOfBooksInResponse:
+) -> Response:
     books = await book_repo.filter_books(
         tags=books_filter.tags,
         categories=books_filter.categories,
@@ -73,34 +137,80 @@ async def filter_books(
         sort_by=books_filter.sort_by,
         offset=books_filter.offset,
         limit=books_filter.limit,
+        after=books_filter.after,
+    )
+
+    facets = None
+    if books_filter.facets:
+        facets = await book_repo.count_facets(
+            facets=books_filter.facets,
+            tags=books_filter.tags,
+            categories=books_filter.categories,
+            publishers=books_filter.publishers,
+            authors=books_filter.authors,
+        )
+
+    return model_response(
+        ListOfBooksInResponse,
+        books=books,
+        next_cursor=book_filter_manager.next_cursor(books, books_filter),
+        facets=facets,
     )
 
-    return ListOfBooksInResponse(books=books)
+
+@router.get("/search/", response_model=ListOfBooksInResponse, name="books:search-books")
+async def search_books(
+        books_search: BooksSearch = Depends(book_search_manager),
+        user: Optional[User] = Depends(possible_user),
+        book_repo: BookRepository = Depends(get_repository(BookRepository))
+) -> Response:
+    books = await book_repo.search_books(
+        q=books_search.q,
+        tags=books_search.tags,
+        categories=books_search.categories,
+        publishers=books_search.publishers,
+        authors=books_search.authors,
+        user=user,
+        limit=books_search.limit,
+        after=books_search.after,
+    )
+
+    return model_response(
+        ListOfBooksInResponse,
+        books=books,
+        next_cursor=book_search_manager.next_cursor(books, books_search),
+    )
 
 
 @router.get("/{book_id}/", response_model=BookInResponse, name="books:retrieve")
 async def retrieve_book(
         book_id: int,
         book_repo: BookRepository = Depends(get_repository(BookRepository))
-) -> BookInResponse:
+) -> Response:
     book = await book_repo.get_book_by_id(book_id)
     if book is None:
         raise HTTPException(status_code=404, detail=resources.BOOK_NOT_FOUND)
 
-    return BookInResponse(book=book)
+    return model_response(BookInResponse, book=book)
 
 
 @router.get("/{book_id}/comments/", response_model=ListOfCommentsInResponse, name="books:book-comments")
 async def get_comments(
         book_id: int,
+        page: CommentsPage = Depends(comments_page),
         book_repo: BookRepository = Depends(get_repository(BookRepository))
-) -> ListOfCommentsInResponse:
+) -> Response:
     book = await book_repo.get_book_instance_by_id(book_id)
     if book is None:
         raise HTTPException(status_code=404, detail=resources.BOOK_NOT_FOUND)
 
-    comments = await book_repo.get_comments(book)
-    return ListOfCommentsInResponse(comments=comments)
+    comments = await book_repo.get_comments(book, limit=page.limit, after=page.after)
+    return model_response(
+        ListOfCommentsInResponse,
+        comments=comments,
+        comments_count=await book_repo.get_comments_count(book),
+        next_cursor=comments_page.next_cursor(comments, page),
+    )
 
 
 @router.post("/{book_id}/comments/", response_model=CommentInResponse, name="books:add-comment")
@@ -154,11 +264,23 @@ async def rate_book(
     if book is None:
         raise HTTPException(status_code=404, detail=resources.BOOK_NOT_FOUND)
 
-    existing_rate = await book_repo.get_rate(user=required_user, book=book)
-    if existing_rate is not None:
+    rate_obj = await book_repo.rate_book(user=required_user, book=book, rate=rate.rate)
+    if rate_obj is None:
         raise HTTPException(status_code=404, detail=resources.RATE_ALREADY_EXISTS)
 
-    rate_obj = await book_repo.rate_book(user=required_user, book=book, rate=rate.rate)
+    return BookRateInResponse(rate=rate_obj)
+
+
+@router.put("/{book_id}/rate/", response_model=BookRateInResponse, name="books:update-book-rate")
+async def update_book_rate(
+        book_id: int,
+        book_repo: BookRepository = Depends(get_repository(BookRepository)),
+        required_user: User = Depends(require_user),
+        rate: BookRateInCreate = Body(..., embed=True, alias="rate")
+) -> BookRateInResponse:
+    rate_obj = await book_repo.upsert_rate(user=required_user, book_id=book_id, rate=rate.rate)
+    if rate_obj is None:
+        raise HTTPException(status_code=404, detail=resources.BOOK_NOT_FOUND)
 
     return BookRateInResponse(rate=rate_obj)
 
@@ -3,32 +3,39 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Body, HTTPException
 from jwt import InvalidIssuerError
+from starlette.responses import Response
 
 from app import resources
+from app.api.dependencies.comments import comments_page
 from app.api.dependencies.database import get_repository
 from app.api.dependencies.shelves import ShelfFilterManager
 from app.api.dependencies.user import require_user, possible_user
+from app.api.responses import cached_json_response, model_response
 from app.db.queries.tables import User
 from app.db.repositories.books.books import BookRepository
-from app.db.repositories.shelves.shelves import ShelfRepository
+from app.db.repositories.shelves.shelves import ShelfRepository, SHELF_SORT
 from app.db.repositories.shelves.tag import ShelfTagsRepository
-from app.models.schemas.comments import ListOfCommentsInResponse, CommentInResponse, CommentInCreate
+from app.models.schemas.comments import ListOfCommentsInResponse, CommentInResponse, CommentInCreate, CommentsPage
 from app.models.schemas.common import SuccessDelete, SuccessUpdate
 from app.models.schemas.shelves import ShelfForCreate, ShelfInResponse, ListOfShelvesInResponse, ShelfFilter, \
     ShelfRateInResponse, ShelfRateInCreate, BookInShelfInResponse, BookInShelfInCreate, BookInShelfInUpdate
 from app.models.schemas.tags import TagsInList
+from app.services.cache import reference_cache, SHELF_TAGS
 
 router = APIRouter()
 
-shelf_filter_manager = ShelfFilterManager(['name', 'created_at'])
+shelf_filter_manager = ShelfFilterManager(list(SHELF_SORT.columns))
 
 
 @router.get("/tags", response_model=TagsInList, name="shelves:shelf-tags")
 async def get_all_tags(
         tags_repo: ShelfTagsRepository = Depends(get_repository(ShelfTagsRepository)),
-) -> TagsInList:
-    tags = await tags_repo.get_all_shelf_tags()
-    return TagsInList(tags=tags)
+) -> Response:
+    async def build() -> TagsInList:
+        tags = await tags_repo.get_all_shelf_tags()
+        return TagsInList(tags=tags)
+
+    return await cached_json_response(reference_cache, SHELF_TAGS, build, tags_repo.session)
 
 
 @router.get("/", response_model=ListOfShelvesInResponse, name="shelves:filter-shelves")
@@ -36,17 +43,22 @@ async def filter_shelves(
         shelf_filter: ShelfFilter = Depends(shelf_filter_manager),
         user: Optional[User] = Depends(possible_user),
         shelf_repo: ShelfRepository = Depends(get_repository(ShelfRepository))
-) -> ListOfShelvesInResponse:
+) -> Response:
     shelves = await shelf_repo.filter_shelves(
         tags=shelf_filter.tags,
         sort_by=shelf_filter.sort_by,
         user=user,
         offset=shelf_filter.offset,
         limit=shelf_filter.limit,
+        after=shelf_filter.after,
         _type='public'
     )
 
-    return ListOfShelvesInResponse(shelves=shelves)
+    return model_response(
+        ListOfShelvesInResponse,
+        shelves=shelves,
+        next_cursor=shelf_filter_manager.next_cursor(shelves, shelf_filter),
+    )
 
 
 @router.get("/{shelf_uid}/", response_model=ShelfInResponse, name="shelves:retrieve")
@@ -54,7 +66,7 @@ async def retrieve_shelf(
         shelf_uid: UUID,
         shelf_repo: ShelfRepository = Depends(get_repository(ShelfRepository)),
         user: Optional[User] = Depends(possible_user),
-) -> ShelfInResponse:
+) -> Response:
     shelf = await shelf_repo.get_shelf_by_uid(shelf_uid=shelf_uid)
     if shelf.type == 'private':
         if user is None:
@@ -62,7 +74,7 @@ async def retrieve_shelf(
         elif shelf.user_uid != user.uid:
             raise InvalidIssuerError(resources.PRIVATE_SHELF_ACCESS_DENIED)
 
-    return ShelfInResponse(shelf=shelf)
+    return model_response(ShelfInResponse, shelf=shelf)
 
 
 @router.post("/", response_model=ShelfInResponse, name="shelves:create-shelf")
@@ -97,11 +109,23 @@ async def rate_shelf(
     if shelf is None:
         raise HTTPException(status_code=404, detail=resources.BOOK_NOT_FOUND)
 
-    existing_rate = await shelf_repo.get_rate(user=required_user, shelf=shelf)
-    if existing_rate is not None:
+    rate_obj = await shelf_repo.rate_shelf(user=required_user, shelf=shelf, rate=rate.rate)
+    if rate_obj is None:
         raise HTTPException(status_code=404, detail=resources.RATE_ALREADY_EXISTS)
 
-    rate_obj = await shelf_repo.rate_shelf(user=required_user, shelf=shelf, rate=rate.rate)
+    return ShelfRateInResponse(rate=rate_obj)
+
+
+@router.put("/{shelf_uid}/rate/", response_model=ShelfRateInResponse, name="shelves:update-shelf-rate")
+async def update_shelf_rate(
+        shelf_uid: UUID,
+        shelf_repo: ShelfRepository = Depends(get_repository(ShelfRepository)),
+        required_user: User = Depends(require_user),
+        rate: ShelfRateInCreate = Body(..., embed=True, alias="rate")
+) -> ShelfRateInResponse:
+    rate_obj = await shelf_repo.upsert_rate(shelf_uid=shelf_uid, user=required_user, rate=rate.rate)
+    if rate_obj is None:
+        raise HTTPException(status_code=404, detail=resources.SHELF_NOT_FOUND)
 
     return ShelfRateInResponse(rate=rate_obj)
 
@@ -127,14 +151,20 @@ async def remove_rate_shelf(
 @router.get("/{shelf_uid}/comments/", response_model=ListOfCommentsInResponse, name="shelves:shelf-comments")
 async def get_comments(
         shelf_uid: UUID,
+        page: CommentsPage = Depends(comments_page),
         shelf_repo: ShelfRepository = Depends(get_repository(ShelfRepository))
-) -> ListOfCommentsInResponse:
+) -> Response:
     shelf = await shelf_repo.get_shelf_instance_by_uid(shelf_uid=shelf_uid)
     if shelf is None:
         raise HTTPException(status_code=404, detail=resources.SHELF_NOT_FOUND)
 
-    comments = await shelf_repo.get_comments(shelf)
-    return ListOfCommentsInResponse(comments=comments)
+    comments = await shelf_repo.get_comments(shelf, limit=page.limit, after=page.after)
+    return model_response(
+        ListOfCommentsInResponse,
+        comments=comments,
+        comments_count=await shelf_repo.get_comments_count(shelf),
+        next_cursor=comments_page.next_cursor(comments, page),
+    )
 
 
 @router.post("/{shelf_uid}/comments/", response_model=CommentInResponse, name="shelves:add-comment")
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from app.core.auth import JWTRequired, verified_tokens
+from app.db.queries.statements import query_shape_cache
+from app.db.repositories.users import user_cache
+from app.models.schemas.stats import CacheStatsInResponse
+from app.services.cache import reference_cache
+
+router = APIRouter()
+
+
+# sizes and hit rates of the process caches, only for authenticated clients
+@router.get("/caches/", response_model=CacheStatsInResponse, name="stats:caches",
+            dependencies=[Depends(JWTRequired())])
+async def get_cache_stats() -> CacheStatsInResponse:
+    return CacheStatsInResponse(caches={
+        'reference': reference_cache.stats(),
+        'users': user_cache.stats(),
+        'tokens': verified_tokens.stats(),
+        'query_shapes': query_shape_cache.stats(),
+    })
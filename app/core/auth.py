@@ -1,3 +1,4 @@
+import hashlib
 import time
 from typing import Optional
 
@@ -6,13 +7,36 @@ import jwt
 from fastapi.openapi.models import HTTPBearer as HTTPBearerModel
 from fastapi.security.base import SecurityBase
 from fastapi.security.utils import get_authorization_scheme_param
+from fastapi_jwt_auth.exceptions import AccessTokenRequired, InvalidHeaderError, JWTDecodeError, MissingTokenError
 from starlette.datastructures import Headers
 from starlette.requests import Request
 
 from app.core.config import get_app_settings
+from app.services.cache import TTLCache
 
 settings = get_app_settings()
 
+# claims of verified tokens keyed by the token digest, each entry lives until the token exp
+verified_tokens = TTLCache(max_size=settings.jwt_cache_max_size, ttl=None)
+
+
+def decode_verified_token(token: str) -> dict:
+    """Verify token and return its claims, raises jwt.PyJWTError on an invalid or expired token."""
+    digest = hashlib.sha256(token.encode()).digest()
+    claims: Optional[dict] = verified_tokens.get(digest)
+    if claims is not None:
+        return claims
+
+    claims = jwt.decode(token, settings.authjwt_secret_key, algorithms=[settings.authjwt_algorithm])
+    try:
+        ttl = claims['exp'] - time.time()
+    except (KeyError, TypeError):
+        raise jwt.MissingRequiredClaimError('exp')
+    if ttl <= 0:
+        raise jwt.ExpiredSignatureError('Signature has expired')
+
+    return verified_tokens.set(digest, claims, ttl=ttl)
+
 
 class JWTPossible(SecurityBase):
     def __init__(self):
@@ -47,7 +71,32 @@ class JWTPossible(SecurityBase):
     @classmethod
     def decode_token(cls, token: str) -> Optional[dict]:
         try:
-            decoded_token = jwt.decode(token, settings.authjwt_secret_key, algorithms=[settings.authjwt_algorithm])
-            return decoded_token if decoded_token["exp"] >= time.time() else None
-        except (jwt.PyJWTError, KeyError):
+            return decode_verified_token(token)
+        except jwt.PyJWTError:
             return None
+
+
+class JWTRequired(JWTPossible):
+    """Claims of the access token, failing like AuthJWT.jwt_required does."""
+
+    async def __call__(self, request: Request) -> dict:
+        if settings.authjwt_header_name not in request.headers:
+            raise MissingTokenError(status_code=401, message=f"Missing {settings.authjwt_header_name} Header")
+
+        token: Optional[str] = self.get_token_from_header(request.headers)
+        if token is None:
+            raise InvalidHeaderError(
+                status_code=422,
+                message=f"Bad {settings.authjwt_header_name} header. "
+                        f"Expected value '{settings.authjwt_header_type} <JWT>'"
+            )
+
+        try:
+            claims = decode_verified_token(token)
+        except jwt.PyJWTError as error:
+            raise JWTDecodeError(status_code=422, message=str(error))
+
+        if claims.get('type') != 'access':
+            raise AccessTokenRequired(status_code=422, message="Only access tokens are allowed")
+
+        return claims
@@ -1,7 +1,17 @@
 DEFAULT_BOOK_OFFSET = 0
 DEFAULT_BOOK_LIMIT = 40
 DEFAULT_BOOK_ORDER_BY = '-created_at'
+MAX_SEARCH_QUERY_LENGTH = 200
 
 DEFAULT_SHELF_OFFSET = 0
 DEFAULT_SHELF_LIMIT = 30
 DEFAULT_SHELF_ORDER_BY = '-created_at'
+
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+MAX_AUTOCOMPLETE_QUERY_LENGTH = 50
+
+DEFAULT_COMMENTS_LIMIT = 20
+MAX_COMMENTS_LIMIT = 100
+
+PRIMARY_PIN_COOKIE = 'jbook_primary_until'
@@ -0,0 +1,64 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any
+from uuid import UUID
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, UUID):
+        return {'uuid': str(value)}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.datetime.fromisoformat(value['dt'])
+        if 'uuid' in value:
+            return UUID(value['uuid'])
+        raise ValueError('Unknown cursor value')
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """Pack keyset values into an opaque url-safe token."""
+    payload = json.dumps([_dump_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> tuple:
+    """Unpack a token made by encode_cursor, raises ValueError on malformed input."""
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError('Malformed cursor')
+
+    if not isinstance(values, list):
+        raise ValueError('Malformed cursor')
+
+    return tuple(_load_value(value) for value in values)
+
+
+def cursor_value(value: Any, type_: type, nullable: bool = False) -> Any:
+    """A decoded cursor value checked against the type of the column it is bound to.
+
+    Ints are accepted for floats, None only for nullable columns and datetimes
+    only naive, like the TIMESTAMP columns they come from. Raises ValueError
+    on anything else, so a tampered cursor never reaches the query.
+    """
+    if value is None and nullable:
+        return None
+    if isinstance(value, bool):
+        raise ValueError('Wrong cursor value')
+    if type_ is float and isinstance(value, int):
+        return float(value)
+    if not isinstance(value, type_):
+        raise ValueError('Wrong cursor value')
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        raise ValueError('Wrong cursor value')
+    return value
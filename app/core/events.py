@@ -5,6 +5,7 @@ from loguru import logger
 
 from app.core.settings.app import AppSettings
 from app.db.events import dispose_engine, configure_sqlalchemy
+from app.services.invalidation import invalidation_bus
 
 
 def create_start_app_handler(
@@ -13,6 +14,8 @@ def create_start_app_handler(
 ) -> Callable:  # type: ignore
     async def start_app() -> None:
         await configure_sqlalchemy(app, settings)
+        if settings.invalidation_bus_enabled:
+            await invalidation_bus.start(settings.asyncpg_dsn)
 
     return start_app
 
@@ -20,6 +23,7 @@ def create_start_app_handler(
 def create_stop_app_handler(app: FastAPI) -> Callable:  # type: ignore
     @logger.catch
     async def stop_app() -> None:
+        await invalidation_bus.stop()
         await dispose_engine(app)
 
     return stop_app
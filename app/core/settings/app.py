@@ -1,6 +1,6 @@
 import logging
 import sys
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 from pydantic import PostgresDsn, SecretStr
@@ -20,9 +20,45 @@ class AppSettings(BaseAppSettings):
 
     database_url: str
     database_alembic_url: str
+    # replicas serving GET requests, reads go to the primary when empty
+    database_replica_urls: List[str] = []
+    # seconds a client reads from the primary after a write
+    read_your_writes_window: int = 5
 
     max_connection_count: int = 10
     min_connection_count: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    # asyncpg prepared statements kept per connection
+    statement_cache_size: int = 100
+    # transaction pooling PgBouncer can't keep prepared statements between transactions
+    pgbouncer_mode: bool = False
+
+    # Fetch list pages with related collections aggregated in one statement,
+    # disable to fall back to the ORM selectinload path.
+    single_query_lists: bool = True
+    fast_json_responses: bool = True
+    raw_sql_reads: bool = False
+    # books rendered in each card of a shelf list, retrieve_shelf returns all of them
+    shelf_preview_books: int = 5
+    # facet counts of /books/ cover at most facet_sample_size matching books
+    # and return the facet_values_limit most frequent values of every facet
+    facet_sample_size: int = 10000
+    facet_values_limit: int = 50
+
+    reference_cache_ttl: int = 300
+    reference_cache_max_size: int = 64
+
+    user_cache_ttl: int = 300
+    user_cache_max_size: int = 10000
+
+    jwt_cache_max_size: int = 10000
+
+    query_shape_cache_size: int = 256
+
+    # Evict caches on every replica through postgres LISTEN/NOTIFY
+    invalidation_bus_enabled: bool = True
 
     authjwt_header_name: str = 'Authorization'
     authjwt_secret_key: str = "secret"
@@ -41,6 +77,25 @@ class AppSettings(BaseAppSettings):
     class Config:
         validate_assignment = True
 
+    @property
+    def asyncpg_dsn(self) -> str:
+        return self.database_url.replace('postgresql+asyncpg://', 'postgresql://', 1)
+
+    @property
+    def engine_kwargs(self) -> Dict[str, Any]:
+        statement_cache_size = 0 if self.pgbouncer_mode else self.statement_cache_size
+        return {
+            "pool_size": self.min_connection_count,
+            "max_overflow": max(self.max_connection_count - self.min_connection_count, 0),
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+            "connect_args": {
+                "prepared_statement_cache_size": statement_cache_size,
+                "statement_cache_size": statement_cache_size,
+            },
+        }
+
     @property
     def fastapi_kwargs(self) -> Dict[str, Any]:
         return {
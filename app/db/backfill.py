@@ -0,0 +1,35 @@
+"""Recompute the aggregate tables from the raw history.
+
+Run after bulk imports or manual edits of rates:
+
+    python -m app.db.backfill
+"""
+import asyncio
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import get_app_settings
+from app.db.repositories.books.books import BookRepository
+from app.db.repositories.shelves.shelves import ShelfRepository
+
+
+async def backfill() -> None:
+    settings = get_app_settings()
+    engine = create_async_engine(settings.database_url)
+    session_maker = sessionmaker(bind=engine, class_=AsyncSession)
+
+    async with session_maker() as session:
+        async with session.begin():
+            logger.info("Rebuilding book_stats")
+            await BookRepository(session).rebuild_stats()
+            logger.info("Rebuilding shelf_stats")
+            await ShelfRepository(session).rebuild_stats()
+
+    await engine.dispose()
+    logger.info("Aggregates rebuilt")
+
+
+if __name__ == '__main__':
+    asyncio.run(backfill())
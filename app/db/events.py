@@ -1,19 +1,62 @@
+import asyncio
+import itertools
+
 from fastapi import FastAPI
 from loguru import logger
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.settings.app import AppSettings
 
 
+def _read_session_maker(engine: AsyncEngine, replica: bool = False) -> sessionmaker:
+    # BEGIN READ ONLY, and nothing to flush or expire for safe methods
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=engine.execution_options(postgresql_readonly=True),
+        class_=AsyncSession,
+        info={'replica': replica},
+    )
+
+
+async def _open_connections(engine: AsyncEngine, count: int) -> None:
+    """Fill the pool up front so first requests after a deploy don't pay connection setup."""
+    results = await asyncio.gather(
+        *(engine.connect().start() for _ in range(count)),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, AsyncConnection):
+            await result.close()
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        logger.warning("Could not pre-open {0} connections: {1}", len(errors), errors[0])
+
+
 async def configure_sqlalchemy(app: FastAPI, settings: AppSettings) -> None:
     logger.info("Configuring sqlalchemy. database url: {0}", repr(settings.database_url))
 
     engine = create_async_engine(
-        settings.database_url
+        settings.database_url,
+        **settings.engine_kwargs
     )
     app.state.engine = engine
     app.state.session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+    app.state.primary_read_session_maker = _read_session_maker(engine)
+
+    app.state.replica_engines = []
+    for replica_url in settings.database_replica_urls:
+        logger.info("Configuring read replica. database url: {0}", repr(replica_url))
+        app.state.replica_engines.append(create_async_engine(replica_url, **settings.engine_kwargs))
+
+    replica_session_makers = [_read_session_maker(replica, replica=True) for replica in app.state.replica_engines]
+    app.state.read_session_makers = itertools.cycle(replica_session_makers or [app.state.primary_read_session_maker])
+
+    for pool_engine in (engine, *app.state.replica_engines):
+        await _open_connections(pool_engine, settings.min_connection_count)
 
     logger.info("sqlalchemy configured")
 
@@ -22,5 +65,7 @@ async def dispose_engine(app: FastAPI) -> None:
     logger.info("Dispose Engine")
 
     await app.state.engine.dispose()
+    for replica in app.state.replica_engines:
+        await replica.dispose()
 
     logger.info("Engine disposed")
@@ -0,0 +1,62 @@
+"""sort indexes
+
+Revision ID: 3f1a9c2e7b54
+Revises: cd4f4d813994
+Create Date: 2026-10-18 14:26:09.731552
+
+"""
+from alembic import op
+
+
+revision = '3f1a9c2e7b54'
+down_revision = 'cd4f4d813994'
+branch_labels = None
+depends_on = None
+
+# app.db.queries.sorting orders nullable columns NULLS LAST both ways. A backward scan of
+# (x DESC NULLS LAST) gives (x ASC NULLS FIRST), so those columns get an index per direction
+SORT_INDEXES = [
+    ('ix_book_title_id', 'book', 'title, id'),
+    ('ix_book_pub_date_id', 'book', 'pub_date, id'),
+    ('ix_book_created_at_id', 'book', 'created_at DESC NULLS LAST, id DESC'),
+    ('ix_book_created_at_id_asc', 'book', 'created_at ASC NULLS LAST, id'),
+    ('ix_book_stats_rate_avg_book_id', 'book_stats', 'rate_avg DESC NULLS LAST, book_id DESC'),
+    ('ix_book_stats_rate_avg_book_id_asc', 'book_stats', 'rate_avg ASC NULLS LAST, book_id'),
+    ('ix_shelf_name_uid', 'shelf', 'name, uid'),
+    ('ix_shelf_created_at_uid', 'shelf', 'created_at DESC NULLS LAST, uid DESC'),
+    ('ix_shelf_created_at_uid_asc', 'shelf', 'created_at ASC NULLS LAST, uid'),
+]
+
+
+def upgrade() -> None:
+    # every book gets a stats row, so the rate order can be read from the book_stats index
+    op.execute(
+        'INSERT INTO jbook.book_stats (book_id) SELECT id FROM jbook.book '
+        'ON CONFLICT (book_id) DO NOTHING;'
+    )
+    op.execute('''
+        CREATE FUNCTION jbook.book_stats_create() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO jbook.book_stats (book_id) VALUES (NEW.id) ON CONFLICT (book_id) DO NOTHING;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    ''')
+    op.execute(
+        'CREATE TRIGGER book_stats_create AFTER INSERT ON jbook.book '
+        'FOR EACH ROW EXECUTE PROCEDURE jbook.book_stats_create();'
+    )
+
+    # the tables stay writable while the indexes build, see 8b2d61f0c3a7
+    with op.get_context().autocommit_block():
+        for name, table, columns in SORT_INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON jbook.{table} ({columns});')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(SORT_INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS jbook.{name};')
+
+    op.execute('DROP TRIGGER book_stats_create ON jbook.book;')
+    op.execute('DROP FUNCTION jbook.book_stats_create();')
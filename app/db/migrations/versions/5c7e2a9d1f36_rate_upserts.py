@@ -0,0 +1,116 @@
+"""rate upserts
+
+Revision ID: 5c7e2a9d1f36
+Revises: 8b2d61f0c3a7
+Create Date: 2026-10-18 16:11:52.603918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '5c7e2a9d1f36'
+down_revision = '8b2d61f0c3a7'
+branch_labels = None
+depends_on = None
+
+# keeps {stats_table} rate aggregates in step with {rate_table} and notifies
+# app.services.invalidation about the changed {entity}
+RATE_STATS_FUNCTION = '''
+CREATE FUNCTION jbook.{rate_table}_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.{key} IS NOT NULL THEN
+            UPDATE jbook.{stats_table}
+            SET rate_sum = rate_sum - coalesce(OLD.rate, 0),
+                rate_count = rate_count - 1,
+                rate_avg = (rate_sum - coalesce(OLD.rate, 0))::float / nullif(rate_count - 1, 0)
+            WHERE {key} = OLD.{key};
+            PERFORM pg_notify('jbook_invalidation',
+                json_build_object('entity', 'rate', 'key', '{entity}:' || OLD.{key})::text);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.{key} IS NOT NULL THEN
+            INSERT INTO jbook.{stats_table} AS s ({key}, rate_sum, rate_count, rate_avg{rated_at_column})
+            VALUES (NEW.{key}, coalesce(NEW.rate, 0), 1, coalesce(NEW.rate, 0){rated_at_value})
+            ON CONFLICT ({key}) DO UPDATE
+            SET rate_sum = s.rate_sum + EXCLUDED.rate_sum,
+                rate_count = s.rate_count + 1,
+                rate_avg = (s.rate_sum + EXCLUDED.rate_sum)::float / (s.rate_count + 1){rated_at_set};
+            PERFORM pg_notify('jbook_invalidation',
+                json_build_object('entity', 'rate', 'key', '{entity}:' || NEW.{key})::text);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+# rate_table, stats_table, key, entity, whether stats_table tracks last_rated_at
+RATE_TABLES = [
+    ('book_rate', 'book_stats', 'book_id', 'book', True),
+    ('shelf_rate', 'shelf_stats', 'shelf_uid', 'shelf', False),
+]
+
+RECOMPUTE_RATES = '''
+UPDATE jbook.{stats_table} s
+SET rate_sum = a.rate_sum, rate_count = a.rate_count, rate_avg = a.rate_avg
+FROM (
+    SELECT st.{key}, coalesce(sum(r.rate), 0) AS rate_sum, count(r.id) AS rate_count, avg(r.rate) AS rate_avg
+    FROM jbook.{stats_table} st
+    LEFT JOIN jbook.{rate_table} r ON r.{key} = st.{key}
+    GROUP BY st.{key}
+) a
+WHERE a.{key} = s.{key};
+'''
+
+
+def upgrade() -> None:
+    op.add_column('shelf_rate', sa.Column('rated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+                  schema='jbook')
+
+    # keep the latest rate of every user, then rebuild the aggregates the duplicates inflated
+    op.execute(
+        'DELETE FROM jbook.book_rate r USING jbook.book_rate newer '
+        'WHERE r.user_uid = newer.user_uid AND r.book_id = newer.book_id AND r.id < newer.id;'
+    )
+    op.execute(
+        'DELETE FROM jbook.shelf_rate r USING jbook.shelf_rate newer '
+        'WHERE r.user_uid = newer.user_uid AND r.shelf_uid = newer.shelf_uid AND r.id < newer.id;'
+    )
+    for rate_table, stats_table, key, _, _ in RATE_TABLES:
+        op.execute(RECOMPUTE_RATES.format(rate_table=rate_table, stats_table=stats_table, key=key))
+
+    op.create_unique_constraint('uq_book_rate_user_uid_book_id', 'book_rate', ['user_uid', 'book_id'],
+                                schema='jbook')
+    op.create_unique_constraint('uq_shelf_rate_user_uid_shelf_uid', 'shelf_rate', ['user_uid', 'shelf_uid'],
+                                schema='jbook')
+    # covered by uq_book_rate_user_uid_book_id
+    op.execute('DROP INDEX IF EXISTS jbook.ix_book_rate_user_uid_book_id;')
+
+    for rate_table, stats_table, key, entity, last_rated_at in RATE_TABLES:
+        op.execute(RATE_STATS_FUNCTION.format(
+            rate_table=rate_table, stats_table=stats_table, key=key, entity=entity,
+            rated_at_column=', last_rated_at' if last_rated_at else '',
+            rated_at_value=', NEW.rated_at' if last_rated_at else '',
+            rated_at_set=',\n                last_rated_at = greatest(s.last_rated_at, EXCLUDED.last_rated_at)'
+            if last_rated_at else '',
+        ))
+        op.execute(
+            f'CREATE TRIGGER {rate_table}_stats AFTER INSERT OR UPDATE OF rate, {key} OR DELETE '
+            f'ON jbook.{rate_table} FOR EACH ROW EXECUTE PROCEDURE jbook.{rate_table}_stats();'
+        )
+
+
+def downgrade() -> None:
+    for rate_table, _, _, _, _ in RATE_TABLES:
+        op.execute(f'DROP TRIGGER {rate_table}_stats ON jbook.{rate_table};')
+        op.execute(f'DROP FUNCTION jbook.{rate_table}_stats();')
+
+    op.create_index('ix_book_rate_user_uid_book_id', 'book_rate', ['user_uid', 'book_id'], schema='jbook')
+    op.drop_constraint('uq_shelf_rate_user_uid_shelf_uid', 'shelf_rate', schema='jbook')
+    op.drop_constraint('uq_book_rate_user_uid_book_id', 'book_rate', schema='jbook')
+    op.drop_column('shelf_rate', 'rated_at', schema='jbook')
@@ -0,0 +1,37 @@
+"""book stats
+
+Revision ID: 6889e9f4a6eb
+Revises: 99af38bd32a8
+Create Date: 2026-10-18 10:12:41.204113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '6889e9f4a6eb'
+down_revision = '99af38bd32a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('book_stats',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('rate_sum', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rate_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rate_avg', sa.Float(), nullable=True),
+    sa.Column('last_rated_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['jbook.book.id'], ),
+    sa.PrimaryKeyConstraint('book_id'),
+    schema='jbook'
+    )
+    op.execute(
+        'INSERT INTO jbook.book_stats (book_id, rate_sum, rate_count, rate_avg, last_rated_at) '
+        'SELECT book_id, sum(rate), count(id), avg(rate), max(rated_at) '
+        'FROM jbook.book_rate WHERE book_id IS NOT NULL GROUP BY book_id;'
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('book_stats', schema='jbook')
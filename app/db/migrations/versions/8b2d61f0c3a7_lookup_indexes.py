@@ -0,0 +1,42 @@
+"""lookup indexes
+
+Revision ID: 8b2d61f0c3a7
+Revises: 3f1a9c2e7b54
+Create Date: 2026-10-18 15:02:44.180326
+
+"""
+from alembic import op
+
+
+revision = '8b2d61f0c3a7'
+down_revision = '3f1a9c2e7b54'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_book_rate_book_id', 'book_rate', ['book_id']),
+    ('ix_book_rate_user_uid_book_id', 'book_rate', ['user_uid', 'book_id']),
+    ('ix_book_comment_book_id_pub_date', 'book_comment', ['book_id', 'pub_date']),
+    ('ix_shelf_comment_shelf_uid_pub_date', 'shelf_comment', ['shelf_uid', 'pub_date']),
+    ('ix_book_in_shelf_shelf_uid', 'book_in_shelf', ['shelf_uid']),
+    ('ix_m2m_book_book_category_category_id', '_m2m_book_book_category', ['category_id']),
+    ('ix_m2m_book_book_author_book_author_id', '_m2m_book_book_author', ['book_author_id']),
+    ('ix_m2m_book_book_tag_book_tag', '_m2m_book_book_tag', ['book_tag']),
+    ('ix_m2m_shelf_shelf_tag_shelf_tag', '_m2m_shelf_shelf_tag', ['shelf_tag']),
+    ('ix_shelf_user_uid', 'shelf', ['user_uid']),
+    ('ix_shelf_type_created_at', 'shelf', ['type', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, the tables stay writable while building.
+    # IF NOT EXISTS lets a rerun skip the indexes an interrupted run already built
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON jbook.{table} ({", ".join(columns)});')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS jbook.{name};')
@@ -0,0 +1,76 @@
+"""quiet rate triggers
+
+Revision ID: 9d4e6b1a2f80
+Revises: f58a2b6c9d04
+Create Date: 2026-10-18 21:04:17.552301
+
+"""
+from alembic import op
+
+
+revision = '9d4e6b1a2f80'
+down_revision = 'f58a2b6c9d04'
+branch_labels = None
+depends_on = None
+
+# the rate triggers of 5c7e2a9d1f36 without their pg_notify: nothing subscribes to 'rate'
+# in app.services.invalidation, and every NOTIFY takes the global notify queue lock at commit
+RATE_STATS_FUNCTION = '''
+CREATE OR REPLACE FUNCTION jbook.{rate_table}_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.{key} IS NOT NULL THEN
+            UPDATE jbook.{stats_table}
+            SET rate_sum = rate_sum - coalesce(OLD.rate, 0),
+                rate_count = rate_count - 1,
+                rate_avg = (rate_sum - coalesce(OLD.rate, 0))::float / nullif(rate_count - 1, 0)
+            WHERE {key} = OLD.{key};{notify_old}
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.{key} IS NOT NULL THEN
+            INSERT INTO jbook.{stats_table} AS s ({key}, rate_sum, rate_count, rate_avg{rated_at_column})
+            VALUES (NEW.{key}, coalesce(NEW.rate, 0), 1, coalesce(NEW.rate, 0){rated_at_value})
+            ON CONFLICT ({key}) DO UPDATE
+            SET rate_sum = s.rate_sum + EXCLUDED.rate_sum,
+                rate_count = s.rate_count + 1,
+                rate_avg = (s.rate_sum + EXCLUDED.rate_sum)::float / (s.rate_count + 1){rated_at_set};{notify_new}
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+NOTIFY = '''
+            PERFORM pg_notify('jbook_invalidation',
+                json_build_object('entity', 'rate', 'key', '{entity}:' || {row}.{key})::text);'''
+
+# rate_table, stats_table, key, entity, whether stats_table tracks last_rated_at
+RATE_TABLES = [
+    ('book_rate', 'book_stats', 'book_id', 'book', True),
+    ('shelf_rate', 'shelf_stats', 'shelf_uid', 'shelf', False),
+]
+
+
+def _replace_rate_functions(notify: bool) -> None:
+    for rate_table, stats_table, key, entity, last_rated_at in RATE_TABLES:
+        op.execute(RATE_STATS_FUNCTION.format(
+            rate_table=rate_table, stats_table=stats_table, key=key,
+            rated_at_column=', last_rated_at' if last_rated_at else '',
+            rated_at_value=', NEW.rated_at' if last_rated_at else '',
+            rated_at_set=',\n                last_rated_at = greatest(s.last_rated_at, EXCLUDED.last_rated_at)'
+            if last_rated_at else '',
+            notify_old=NOTIFY.format(entity=entity, row='OLD', key=key) if notify else '',
+            notify_new=NOTIFY.format(entity=entity, row='NEW', key=key) if notify else '',
+        ))
+
+
+def upgrade() -> None:
+    _replace_rate_functions(notify=False)
+
+
+def downgrade() -> None:
+    _replace_rate_functions(notify=True)
@@ -0,0 +1,29 @@
+"""shelf books preview
+
+Revision ID: a7f3c1e85b94
+Revises: e41b7d93a5c2
+Create Date: 2026-10-18 18:05:31.926104
+
+"""
+from alembic import op
+
+
+revision = 'a7f3c1e85b94'
+down_revision = 'e41b7d93a5c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # shelf lists read the first books of every shelf by id, see app.db.queries.relations.shelf_relations
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_book_in_shelf_shelf_uid_id '
+                   'ON jbook.book_in_shelf (shelf_uid, id);')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS jbook.ix_book_in_shelf_shelf_uid;')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_book_in_shelf_shelf_uid '
+                   'ON jbook.book_in_shelf (shelf_uid);')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS jbook.ix_book_in_shelf_shelf_uid_id;')
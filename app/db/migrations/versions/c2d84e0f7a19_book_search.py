@@ -0,0 +1,101 @@
+"""book search
+
+Revision ID: c2d84e0f7a19
+Revises: a7f3c1e85b94
+Create Date: 2026-10-18 18:47:15.302881
+
+"""
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+
+revision = 'c2d84e0f7a19'
+down_revision = 'a7f3c1e85b94'
+branch_labels = None
+depends_on = None
+
+# 'simple' is app.db.queries.search.SEARCH_CONFIG, queries only match vectors built with the same configuration
+SEARCH_VECTOR_FUNCTION = '''
+CREATE FUNCTION jbook.book_search_vector(book_id int, title text, description text, annotation text)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(a.name, ' ')
+            FROM jbook._m2m_book_book_author m JOIN jbook.book_author a ON a.id = m.book_author_id
+            WHERE m.book_id = $1), '')), 'B')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(m.book_tag, ' ')
+            FROM jbook._m2m_book_book_tag m
+            WHERE m.book_id = $1), '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+        || setweight(to_tsvector('simple', coalesce(annotation, '')), 'D');
+$$ LANGUAGE sql STABLE;
+'''
+
+REFRESH_SEARCH_VECTOR = '''
+UPDATE jbook.book b
+SET search_vector = jbook.book_search_vector(b.id, b.title, b.description, b.annotation)
+'''
+
+TRIGGER_FUNCTIONS = '''
+CREATE FUNCTION jbook.book_search_vector_book() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := jbook.book_search_vector(NEW.id, NEW.title, NEW.description, NEW.annotation);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION jbook.book_search_vector_m2m() RETURNS trigger AS $$
+BEGIN
+    {refresh} WHERE b.id IN (OLD.book_id, NEW.book_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION jbook.book_search_vector_author() RETURNS trigger AS $$
+BEGIN
+    {refresh} WHERE b.id IN (SELECT m.book_id FROM jbook._m2m_book_book_author m WHERE m.book_author_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''.format(refresh=REFRESH_SEARCH_VECTOR.strip())
+
+# (trigger, table, event, function)
+TRIGGERS = [
+    ('book_search_vector', 'book', 'BEFORE INSERT OR UPDATE OF title, description, annotation', 'book'),
+    ('book_search_vector', '_m2m_book_book_author', 'AFTER INSERT OR UPDATE OR DELETE', 'm2m'),
+    ('book_search_vector', '_m2m_book_book_tag', 'AFTER INSERT OR UPDATE OR DELETE', 'm2m'),
+    ('book_search_vector', 'book_author', 'AFTER UPDATE OF name', 'author'),
+]
+
+
+def upgrade() -> None:
+    op.add_column('book', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True), schema='jbook')
+
+    op.execute(SEARCH_VECTOR_FUNCTION)
+    op.execute(TRIGGER_FUNCTIONS)
+    for name, table, event, function in TRIGGERS:
+        op.execute(f'''
+            CREATE TRIGGER {name} {event} ON jbook.{table}
+            FOR EACH ROW EXECUTE PROCEDURE jbook.book_search_vector_{function}();
+        ''')
+
+    op.execute(REFRESH_SEARCH_VECTOR + ';')
+
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_book_search_vector '
+                   'ON jbook.book USING gin (search_vector);')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS jbook.ix_book_search_vector;')
+
+    for name, table, _, _ in reversed(TRIGGERS):
+        op.execute(f'DROP TRIGGER {name} ON jbook.{table};')
+    for function in ('author', 'm2m', 'book'):
+        op.execute(f'DROP FUNCTION jbook.book_search_vector_{function}();')
+    op.execute('DROP FUNCTION jbook.book_search_vector(int, text, text, text);')
+
+    op.drop_column('book', 'search_vector', schema='jbook')
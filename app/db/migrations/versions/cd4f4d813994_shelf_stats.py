@@ -0,0 +1,46 @@
+"""shelf stats
+
+Revision ID: cd4f4d813994
+Revises: 6889e9f4a6eb
+Create Date: 2026-10-18 11:03:27.518940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = 'cd4f4d813994'
+down_revision = '6889e9f4a6eb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('shelf_stats',
+    sa.Column('shelf_uid', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('rate_sum', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rate_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rate_avg', sa.Float(), nullable=True),
+    sa.Column('books_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['shelf_uid'], ['jbook.shelf.uid'], ),
+    sa.PrimaryKeyConstraint('shelf_uid'),
+    schema='jbook'
+    )
+    op.execute(
+        'INSERT INTO jbook.shelf_stats '
+        '(shelf_uid, rate_sum, rate_count, rate_avg, books_count, comments_count) '
+        'SELECT s.uid, coalesce(r.rate_sum, 0), coalesce(r.rate_count, 0), r.rate_avg, '
+        'coalesce(b.books_count, 0), coalesce(c.comments_count, 0) '
+        'FROM jbook.shelf s '
+        'LEFT JOIN (SELECT shelf_uid, sum(rate) AS rate_sum, count(id) AS rate_count, avg(rate) AS rate_avg '
+        'FROM jbook.shelf_rate GROUP BY shelf_uid) r ON r.shelf_uid = s.uid '
+        'LEFT JOIN (SELECT shelf_uid, count(id) AS books_count '
+        'FROM jbook.book_in_shelf GROUP BY shelf_uid) b ON b.shelf_uid = s.uid '
+        'LEFT JOIN (SELECT shelf_uid, count(id) AS comments_count '
+        'FROM jbook.shelf_comment GROUP BY shelf_uid) c ON c.shelf_uid = s.uid;'
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('shelf_stats', schema='jbook')
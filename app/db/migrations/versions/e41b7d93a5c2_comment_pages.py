@@ -0,0 +1,49 @@
+"""comment pages
+
+Revision ID: e41b7d93a5c2
+Revises: 5c7e2a9d1f36
+Create Date: 2026-10-18 17:23:08.417552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e41b7d93a5c2'
+down_revision = '5c7e2a9d1f36'
+branch_labels = None
+depends_on = None
+
+# (new index, replaced index, table, key column), pages are read newest first, see app.db.queries.sorting
+COMMENT_INDEXES = [
+    ('ix_book_comment_book_id_pub_date_id', 'ix_book_comment_book_id_pub_date', 'book_comment', 'book_id'),
+    ('ix_shelf_comment_shelf_uid_pub_date_id', 'ix_shelf_comment_shelf_uid_pub_date', 'shelf_comment', 'shelf_uid'),
+]
+
+
+def upgrade() -> None:
+    op.add_column('book_stats', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False),
+                  schema='jbook')
+    op.execute('''
+        UPDATE jbook.book_stats bs
+        SET comments_count = c.count
+        FROM (SELECT book_id, count(*) AS count FROM jbook.book_comment GROUP BY book_id) c
+        WHERE c.book_id = bs.book_id;
+    ''')
+
+    with op.get_context().autocommit_block():
+        for name, replaced, table, key in COMMENT_INDEXES:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON jbook.{table} ({key}, pub_date DESC NULLS LAST, id DESC);'
+            )
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS jbook.{replaced};')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, replaced, table, key in reversed(COMMENT_INDEXES):
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {replaced} ON jbook.{table} ({key}, pub_date);')
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS jbook.{name};')
+
+    op.drop_column('book_stats', 'comments_count', schema='jbook')
@@ -0,0 +1,38 @@
+"""autocomplete
+
+Revision ID: f58a2b6c9d04
+Revises: c2d84e0f7a19
+Create Date: 2026-10-18 19:26:40.118653
+
+"""
+from alembic import op
+
+
+revision = 'f58a2b6c9d04'
+down_revision = 'c2d84e0f7a19'
+branch_labels = None
+depends_on = None
+
+# trigram indexes serving both the ILIKE prefix and the <% word similarity
+# conditions of app.db.queries.autocomplete
+INDEXES = [
+    ('ix_book_title_trgm', 'book', 'title'),
+    ('ix_book_author_name_trgm', 'book_author', 'name'),
+    ('ix_book_publisher_name_trgm', 'book_publisher', 'name'),
+    ('ix_book_tag_name_trgm', 'book_tag', 'name'),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                       f'ON jbook.{table} USING gin ({column} gin_trgm_ops);')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS jbook.{name};')
@@ -0,0 +1,35 @@
+from sqlalchemy import bindparam, desc, func
+from sqlalchemy.future import select
+
+from app.db.queries.statements import cached_statement
+
+LIKE_ESCAPE = '!'
+
+
+def like_prefix(value: str) -> str:
+    """ILIKE pattern matching strings starting with value taken literally."""
+    for char in (LIKE_ESCAPE, '%', '_'):
+        value = value.replace(char, LIKE_ESCAPE + char)
+    return value + '%'
+
+
+def autocomplete_query(column, *columns):
+    """Rows of columns whose column starts with the 'q' bind parameter or resembles it.
+
+    Prefix matches come first, then the typo tolerant pg_trgm word similarity
+    matches, best first. Both conditions are served by the column's gin_trgm_ops
+    index, see the autocomplete migration.
+    """
+    def build():
+        q = bindparam('q', type_=column.type)
+        is_prefix = column.ilike(bindparam('prefix', type_=column.type), escape=LIKE_ESCAPE)
+        return select(*columns) \
+            .filter(is_prefix | q.op('<%')(column)) \
+            .order_by(desc(is_prefix), desc(func.word_similarity(q, column)), column) \
+            .limit(bindparam('limit'))
+
+    return cached_statement(('autocomplete', column.table.name, *(c.key for c in columns)), build)
+
+
+def autocomplete_params(q: str, limit: int) -> dict:
+    return {'q': q, 'prefix': like_prefix(q), 'limit': limit}
@@ -0,0 +1,63 @@
+from sqlalchemy import Integer, String, bindparam, cast, func, literal_column, null, union_all
+from sqlalchemy.future import select
+
+from app.db.queries import tables as models
+
+FACETS = ('categories', 'authors', 'publishers', 'tags')
+# row of the facet counts query holding the number of books counted
+TOTAL = 'total'
+
+
+def _facet_key(name: str):
+    # inlined like relations.json_key, a text parameter can't be typed by asyncpg inside UNION ALL
+    return literal_column(f"'{name}'").label('facet')
+
+
+def _facet_values(name: str, id_column, name_column, from_):
+    count = func.count().label('count')
+    group_by = [name_column] if id_column is None else [id_column, name_column]
+    id_column = cast(null(), Integer) if id_column is None else id_column
+    return select(_facet_key(name), id_column.label('id'), name_column.label('name'), count) \
+        .select_from(from_) \
+        .group_by(*group_by) \
+        .order_by(count.desc(), name_column) \
+        .limit(bindparam('facet_values'))
+
+
+def facet_counts_query(matched_books, facets: tuple[str, ...]):
+    """(facet, id, name, count) of the most frequent values of facets among matched_books.
+
+    matched_books is a select of book id and publisher_id, it is capped at the
+    facet_sample_size bind parameter so the cost doesn't grow with the catalog.
+    A TOTAL row carries the number of books the counts cover.
+    """
+    matched = matched_books.limit(bindparam('facet_sample_size')).cte('matched_books')
+
+    branches = [
+        select(_facet_key(TOTAL), cast(null(), Integer), cast(null(), String), func.count()).select_from(matched)
+    ]
+    if 'categories' in facets:
+        m2m = models.m2m_book_book_category
+        branches.append(_facet_values(
+            'categories', models.BookCategory.id, models.BookCategory.name,
+            matched.join(m2m, m2m.c.book_id == matched.c.id).join(models.BookCategory),
+        ))
+    if 'authors' in facets:
+        m2m = models.m2m_book_book_author
+        branches.append(_facet_values(
+            'authors', models.BookAuthor.id, models.BookAuthor.name,
+            matched.join(m2m, m2m.c.book_id == matched.c.id).join(models.BookAuthor),
+        ))
+    if 'publishers' in facets:
+        branches.append(_facet_values(
+            'publishers', models.BookPublisher.id, models.BookPublisher.name,
+            matched.join(models.BookPublisher, models.BookPublisher.id == matched.c.publisher_id),
+        ))
+    if 'tags' in facets:
+        m2m = models.m2m_book_book_tag
+        branches.append(_facet_values(
+            'tags', None, m2m.c.book_tag,
+            matched.join(m2m, m2m.c.book_id == matched.c.id),
+        ))
+
+    return union_all(*branches)
@@ -0,0 +1,169 @@
+"""Hand written SQL of the hottest reads, executed on the raw asyncpg connection.
+
+Every statement is rendered once per sort key, direction and cursor shape, so
+asyncpg can keep one prepared statement for each of them.
+"""
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+
+
+class RawSortColumn(NamedTuple):
+    """SQL counterpart of app.db.queries.sorting.SortColumn."""
+    column: str
+    type_: str
+    id_column: str
+    id_type: str
+    nullable: bool = False
+
+
+BOOK_SORT_COLUMNS = {
+    'title': RawSortColumn('b.title', 'varchar', 'b.id', 'int'),
+    'rate': RawSortColumn('bs.rate_avg', 'float8', 'bs.book_id', 'int', nullable=True),
+    'pub_date': RawSortColumn('b.pub_date', 'timestamp', 'b.id', 'int'),
+    'created_at': RawSortColumn('b.created_at', 'timestamp', 'b.id', 'int', nullable=True),
+}
+
+SHELF_SORT_COLUMNS = {
+    'name': RawSortColumn('s.name', 'varchar', 's.uid', 'uuid'),
+    'created_at': RawSortColumn('s.created_at', 'timestamp', 's.uid', 'uuid', nullable=True),
+}
+
+_BOOK_COLUMNS = """
+    b.id, b.title, b.description, b.annotation, b.pub_date, b.created_at, b.updated_at, b.publisher_id,
+    bs.rate_avg AS rate,
+    ur.rate AS user_rate,
+    (SELECT coalesce(json_agg(json_build_object('id', c.id, 'name', c.name)), '[]'::json)
+     FROM jbook._m2m_book_book_category m JOIN jbook.book_category c ON c.id = m.category_id
+     WHERE m.book_id = b.id) AS categories,
+    (SELECT coalesce(json_agg(json_build_object('id', a.id, 'name', a.name)), '[]'::json)
+     FROM jbook._m2m_book_book_author m JOIN jbook.book_author a ON a.id = m.book_author_id
+     WHERE m.book_id = b.id) AS authors,
+    (SELECT json_build_object('id', p.id, 'name', p.name)
+     FROM jbook.book_publisher p
+     WHERE p.id = b.publisher_id) AS publisher,
+    (SELECT coalesce(json_agg(json_build_object('name', m.book_tag)), '[]'::json)
+     FROM jbook._m2m_book_book_tag m
+     WHERE m.book_id = b.id) AS tags,
+    (SELECT coalesce(json_agg(json_build_object(
+        'id', i.id, 'src', i.src, 'alt_text', i.alt_text, 'is_main', i.is_main)), '[]'::json)
+     FROM jbook.book_image i
+     WHERE i.book_id = b.id) AS images
+FROM jbook.book b
+JOIN jbook.book_stats bs ON bs.book_id = b.id
+LEFT JOIN jbook.book_rate ur ON ur.book_id = b.id AND ur.user_uid = $1::uuid"""
+
+GET_BOOK_BY_ID = f"""
+SELECT {_BOOK_COLUMNS}
+WHERE b.id = $2::int
+"""
+
+_FILTER_BOOKS = f"""
+SELECT {_BOOK_COLUMNS}
+WHERE ($2::int[] IS NULL OR EXISTS (
+        SELECT 1 FROM jbook._m2m_book_book_category m WHERE m.book_id = b.id AND m.category_id = ANY($2)))
+    AND ($3::int[] IS NULL OR EXISTS (
+        SELECT 1 FROM jbook._m2m_book_book_author m WHERE m.book_id = b.id AND m.book_author_id = ANY($3)))
+    AND ($4::int[] IS NULL OR b.publisher_id = ANY($4))
+    AND ($5::varchar[] IS NULL OR EXISTS (
+        SELECT 1 FROM jbook._m2m_book_book_tag m WHERE m.book_id = b.id AND m.book_tag = ANY($5)))
+    {{keyset}}
+ORDER BY {{order_by}}
+LIMIT $6 OFFSET $7
+"""
+
+_FILTER_SHELVES = """
+SELECT
+    s.uid, s.name, s.description, s.type, s.user_uid, s.created_at, s.updated_at,
+    ss.rate_avg AS rate,
+    ur.rate AS user_rate,
+    coalesce(ss.books_count, 0) AS books_count,
+    coalesce(ss.comments_count, 0) AS comments_count,
+    u.first_name, u.surname,
+    (SELECT json_build_object('id', i.id, 'src', i.src, 'alt_text', i.alt_text)
+     FROM jbook.shelf_image i
+     WHERE i.id = s.avatar_id) AS avatar,
+    (SELECT coalesce(json_agg(json_build_object('name', m.shelf_tag)), '[]'::json)
+     FROM jbook._m2m_shelf_shelf_tag m
+     WHERE m.shelf_uid = s.uid) AS tags,
+    (SELECT coalesce(json_agg(json_build_object(
+        'id', bis.id,
+        'book', json_build_object('id', bk.id, 'title', bk.title),
+        'tags', (SELECT coalesce(json_agg(json_build_object('name', t.name)), '[]'::json)
+                 FROM jbook._m2m_book_in_shelf_tag m JOIN jbook.book_in_shelf_tag t ON t.id = m.book_in_shelf_tag_id
+                 WHERE m.book_in_shelf = bis.id)
+     ) ORDER BY bis.id), '[]'::json)
+     FROM (SELECT id, book_id FROM jbook.book_in_shelf
+           WHERE shelf_uid = s.uid
+           ORDER BY id
+           LIMIT {preview_books:d}) bis
+     JOIN jbook.book bk ON bk.id = bis.book_id) AS books_in_shelf
+FROM jbook.shelf s
+JOIN jbook."user" u ON u.uid = s.user_uid
+LEFT JOIN jbook.shelf_stats ss ON ss.shelf_uid = s.uid
+LEFT JOIN jbook.shelf_rate ur ON ur.shelf_uid = s.uid AND ur.user_uid = $1::uuid
+WHERE ($2::varchar[] IS NULL OR EXISTS (
+        SELECT 1 FROM jbook._m2m_shelf_shelf_tag m WHERE m.shelf_uid = s.uid AND m.shelf_tag = ANY($2)))
+    AND ($3::uuid IS NULL OR s.user_uid = $3)
+    {keyset}
+ORDER BY {order_by}
+LIMIT $4 OFFSET $5
+"""
+
+
+def _order_by(sort: RawSortColumn, desc: bool) -> str:
+    direction = 'DESC' if desc else 'ASC'
+    nulls = ' NULLS LAST' if sort.nullable else ''
+    return f'{sort.column} {direction}{nulls}, {sort.id_column} {direction}'
+
+
+def _keyset(sort: RawSortColumn, desc: bool, shape: Optional[tuple], first_param: int) -> str:
+    """Same condition as app.db.queries.sorting.SortEngine.after."""
+    if shape is None:
+        return ''
+
+    column, id_column = sort.column, sort.id_column
+    operator = '<' if desc else '>'
+    if shape[0] is None:
+        return f'AND {column} IS NULL AND {id_column} {operator} ${first_param}::{sort.id_type}'
+
+    value, id_value = f'${first_param}::{sort.type_}', f'${first_param + 1}::{sort.id_type}'
+    after = f'({column}, {id_column}) {operator} ({value}, {id_value})'
+    return f'AND ({after} OR {column} IS NULL)' if sort.nullable else f'AND {after}'
+
+
+def _keyset_shape(after: Optional[tuple]) -> Optional[tuple]:
+    if after is None:
+        return None
+    return (None,) if after[0] is None else (True,)
+
+
+def keyset_args(after: Optional[tuple]) -> tuple[Any, ...]:
+    """Parameters of the keyset condition rendered for after."""
+    if after is None:
+        return ()
+    return after[1:] if after[0] is None else after
+
+
+@lru_cache(maxsize=None)
+def _filter_books_sql(sort_key: str, desc: bool, keyset_shape: Optional[tuple]) -> str:
+    sort = BOOK_SORT_COLUMNS[sort_key]
+    return _FILTER_BOOKS.format(keyset=_keyset(sort, desc, keyset_shape, 8), order_by=_order_by(sort, desc))
+
+
+@lru_cache(maxsize=None)
+def _filter_shelves_sql(sort_key: str, desc: bool, keyset_shape: Optional[tuple], preview_books: int) -> str:
+    sort = SHELF_SORT_COLUMNS[sort_key]
+    return _FILTER_SHELVES.format(
+        keyset=_keyset(sort, desc, keyset_shape, 6),
+        order_by=_order_by(sort, desc),
+        preview_books=preview_books,
+    )
+
+
+def filter_books_sql(sort_key: str, desc: bool, after: Optional[tuple]) -> str:
+    return _filter_books_sql(sort_key, desc, _keyset_shape(after))
+
+
+def filter_shelves_sql(sort_key: str, desc: bool, after: Optional[tuple], preview_books: int) -> str:
+    """Shelf list page, books_in_shelf holds the first preview_books books of each shelf."""
+    return _filter_shelves_sql(sort_key, desc, _keyset_shape(after), preview_books)
@@ -0,0 +1,122 @@
+from typing import Optional
+
+from sqlalchemy import func, literal_column, true, type_coerce
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.future import select
+
+from app.db.queries import tables as models
+
+EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+
+def json_key(name: str):
+    # inlined, asyncpg can't infer the type of json_build_object's variadic parameters
+    return literal_column(f"'{name}'")
+
+
+def json_object(*columns):
+    """json_build_object over columns, keyed by column name."""
+    args = []
+    for column in columns:
+        args.extend((json_key(column.key), column))
+    return func.json_build_object(*args)
+
+
+def json_array_subquery(obj, from_, whereclause, order_by=None):
+    """Correlated subquery aggregating obj of every matching row into a json array."""
+    aggregate = func.json_agg(obj if order_by is None else aggregate_order_by(obj, order_by))
+    query = select(func.coalesce(aggregate, EMPTY_JSON_ARRAY)).select_from(from_).where(whereclause)
+    return type_coerce(query.scalar_subquery(), JSON)
+
+
+def json_object_subquery(obj, from_, whereclause):
+    query = select(obj).select_from(from_).where(whereclause)
+    return type_coerce(query.scalar_subquery(), JSON)
+
+
+def book_relations():
+    """Categories, authors, publisher, tags and images of models.Book as json columns."""
+    categories = json_array_subquery(
+        json_object(models.BookCategory.id, models.BookCategory.name),
+        models.m2m_book_book_category.join(models.BookCategory),
+        models.m2m_book_book_category.c.book_id == models.Book.id,
+    )
+    authors = json_array_subquery(
+        json_object(models.BookAuthor.id, models.BookAuthor.name),
+        models.m2m_book_book_author.join(models.BookAuthor),
+        models.m2m_book_book_author.c.book_id == models.Book.id,
+    )
+    publisher = json_object_subquery(
+        json_object(models.BookPublisher.id, models.BookPublisher.name),
+        models.BookPublisher,
+        models.BookPublisher.id == models.Book.publisher_id,
+    )
+    tags = json_array_subquery(
+        func.json_build_object(json_key('name'), models.m2m_book_book_tag.c.book_tag),
+        models.m2m_book_book_tag,
+        models.m2m_book_book_tag.c.book_id == models.Book.id,
+    )
+    images = json_array_subquery(
+        json_object(models.BookImage.id, models.BookImage.src, models.BookImage.alt_text, models.BookImage.is_main),
+        models.BookImage,
+        models.BookImage.book_id == models.Book.id,
+    )
+
+    return [
+        categories.label('categories'),
+        authors.label('authors'),
+        publisher.label('publisher'),
+        tags.label('tags'),
+        images.label('images'),
+    ]
+
+
+def shelf_relations(preview_books: Optional[int] = None):
+    """Avatar, tags and books in shelf of models.Shelf as json columns.
+
+    With preview_books only the first preview_books books in shelf are aggregated.
+    """
+    avatar = json_object_subquery(
+        json_object(models.ShelfImage.id, models.ShelfImage.src, models.ShelfImage.alt_text),
+        models.ShelfImage,
+        models.ShelfImage.id == models.Shelf.avatar_id,
+    )
+    tags = json_array_subquery(
+        func.json_build_object(json_key('name'), models.m2m_shelf_shelf_tag.c.shelf_tag),
+        models.m2m_shelf_shelf_tag,
+        models.m2m_shelf_shelf_tag.c.shelf_uid == models.Shelf.uid,
+    )
+    if preview_books is None:
+        book_in_shelf = models.BookInShelf.__table__
+        from_, whereclause = book_in_shelf, book_in_shelf.c.shelf_uid == models.Shelf.uid
+    else:
+        # top-N per shelf along ix_book_in_shelf_shelf_uid_id, whatever the shelf size
+        book_in_shelf = select(models.BookInShelf.id, models.BookInShelf.book_id) \
+            .where(models.BookInShelf.shelf_uid == models.Shelf.uid) \
+            .correlate(models.Shelf) \
+            .order_by(models.BookInShelf.id) \
+            .limit(preview_books) \
+            .lateral('book_in_shelf_preview')
+        from_, whereclause = book_in_shelf, true()
+
+    book_in_shelf_tags = json_array_subquery(
+        json_object(models.BookInShelfTag.name),
+        models.m2m_book_in_shelf_tag.join(models.BookInShelfTag),
+        models.m2m_book_in_shelf_tag.c.book_in_shelf == book_in_shelf.c.id,
+    )
+    books_in_shelf = json_array_subquery(
+        func.json_build_object(
+            json_key('id'), book_in_shelf.c.id,
+            json_key('book'), json_object(models.Book.id, models.Book.title),
+            json_key('tags'), book_in_shelf_tags,
+        ),
+        from_.join(models.Book.__table__, models.Book.id == book_in_shelf.c.book_id),
+        whereclause,
+        order_by=book_in_shelf.c.id,
+    )
+
+    return [
+        avatar.label('avatar'),
+        tags.label('tags'),
+        books_in_shelf.label('books_in_shelf'),
+    ]
@@ -0,0 +1,16 @@
+from sqlalchemy import Float, bindparam, func, literal_column
+
+from app.db.queries import tables as models
+
+# text search configuration of book.search_vector, the migration building it uses the same one.
+# 'simple' only lowercases, the catalog mixes languages so no stemming dictionary fits all of it
+SEARCH_CONFIG = 'simple'
+
+
+def search_query():
+    """tsquery of the 'q' bind parameter, in web search syntax: quoted phrases, OR and -word."""
+    return func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), bindparam('q'))
+
+
+def search_rank(tsquery):
+    return func.ts_rank_cd(models.Book.search_vector, tsquery, type_=Float).label('rank')
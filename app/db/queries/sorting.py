@@ -0,0 +1,53 @@
+from typing import Any, NamedTuple
+
+from sqlalchemy import and_, or_, tuple_
+
+
+class SortColumn(NamedTuple):
+    column: Any
+    # tiebreaker making the order total, taken from the same table as column so one index serves both
+    id_column: Any
+    # NULLs are placed last in both directions, otherwise the column is expected to be NOT NULL
+    nullable: bool = False
+
+
+def parse_sort(value: str) -> tuple[str, bool]:
+    """'-key' to (key, True), 'key' to (key, False)."""
+    if value.startswith('-'):
+        return value[1:], True
+    return value, False
+
+
+class SortEngine:
+    """Maps the allowed sort keys of a listing to index backed ORDER BY and keyset conditions."""
+
+    def __init__(self, columns: dict[str, SortColumn]):
+        self.columns = columns
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.columns
+
+    def keys(self) -> list[str]:
+        return list(self.columns)
+
+    def order_by(self, key: str, desc: bool) -> list:
+        column, id_column, nullable = self.columns[key]
+
+        column = column.desc() if desc else column.asc()
+        if nullable:
+            column = column.nullslast()
+        return [column, id_column.desc() if desc else id_column.asc()]
+
+    def after(self, key: str, desc: bool, value: Any, id_value: Any):
+        """Condition selecting rows placed after (value, id_value) in order_by(key, desc).
+
+        value is None when the cursor row is in the trailing NULL group.
+        """
+        column, id_column, nullable = self.columns[key]
+
+        if value is None:
+            return and_(column.is_(None), id_column < id_value if desc else id_column > id_value)
+
+        after = tuple_(column, id_column) < tuple_(value, id_value) if desc \
+            else tuple_(column, id_column) > tuple_(value, id_value)
+        return or_(after, column.is_(None)) if nullable else after
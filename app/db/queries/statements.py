@@ -0,0 +1,39 @@
+from typing import Callable, Hashable, Optional
+
+from sqlalchemy import bindparam
+from sqlalchemy.sql import Executable
+
+from app.core.config import get_app_settings
+from app.db.queries.sorting import SortEngine
+from app.services.cache import TTLCache
+
+settings = get_app_settings()
+
+# statements built from bindparams, keyed by the shape of the request that produced them
+query_shape_cache = TTLCache(max_size=settings.query_shape_cache_size, ttl=None)
+
+
+def cached_statement(shape: Hashable, build: Callable[[], Executable]) -> Executable:
+    """Statement of the given shape, built on the first request of that shape only."""
+    statement = query_shape_cache.get(shape)
+    if statement is None:
+        statement = query_shape_cache.set(shape, build())
+    return statement
+
+
+def keyset_shape(after: Optional[tuple]) -> Optional[bool]:
+    """None without a cursor, otherwise whether the cursor sort value is NULL."""
+    return None if after is None else after[0] is None
+
+
+def keyset_after_params(sort_engine: SortEngine, key: str, desc: bool, shape: Optional[bool]):
+    """SortEngine.after over the after_value and after_id bind parameters."""
+    column, id_column, _ = sort_engine.columns[key]
+    value = None if shape else bindparam('after_value', type_=column.type)
+    return sort_engine.after(key, desc, value, bindparam('after_id', type_=id_column.type))
+
+
+def keyset_params(after: Optional[tuple]) -> dict:
+    if after is None:
+        return {}
+    return {'after_value': after[0], 'after_id': after[1]}
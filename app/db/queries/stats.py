@@ -0,0 +1,109 @@
+from uuid import UUID
+
+from sqlalchemy import Integer, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from app.db.queries import tables as models
+
+
+def _stats_delta(table, key_column, key_value, counters: dict):
+    insert_query = insert(table).values({key_column.name: key_value, **counters})
+
+    set_ = {
+        name: getattr(table, name) + getattr(insert_query.excluded, name)
+        for name in counters
+    }
+    return insert_query.on_conflict_do_update(index_elements=[key_column], set_=set_)
+
+
+def book_stats_delta(book_id: int, comments_delta: int = 0):
+    """Upsert statement shifting the book comments counter by the given delta.
+
+    Rate aggregates are kept by the book_rate triggers.
+    """
+    return _stats_delta(models.BookStats, models.BookStats.book_id, book_id, {'comments_count': comments_delta})
+
+
+def shelf_stats_delta(shelf_uid: UUID, books_delta: int = 0, comments_delta: int = 0):
+    """Upsert statement shifting the shelf books and comments counters by the given deltas.
+
+    Rate aggregates are kept by the shelf_rate triggers.
+    """
+    return _stats_delta(
+        models.ShelfStats, models.ShelfStats.shelf_uid, shelf_uid,
+        {'books_count': books_delta, 'comments_count': comments_delta},
+    )
+
+
+def rebuild_book_stats() -> list:
+    """Statements recomputing book_stats of every book from the whole book_rate and book_comment history."""
+    rates = select(
+        models.BookRate.book_id,
+        func.sum(models.BookRate.rate).label('rate_sum'),
+        func.count(models.BookRate.id).label('rate_count'),
+        func.avg(models.BookRate.rate).label('rate_avg'),
+        func.max(models.BookRate.rated_at).label('last_rated_at'),
+    ).group_by(models.BookRate.book_id).subquery()
+    comments = select(models.BookComment.book_id, func.count(models.BookComment.id).label('count')) \
+        .group_by(models.BookComment.book_id) \
+        .subquery()
+
+    zero = literal(0, Integer)
+    aggregate_query = select(
+        models.Book.id,
+        func.coalesce(rates.c.rate_sum, zero),
+        func.coalesce(rates.c.rate_count, zero),
+        rates.c.rate_avg,
+        rates.c.last_rated_at,
+        func.coalesce(comments.c.count, zero),
+    ) \
+        .outerjoin(rates, rates.c.book_id == models.Book.id) \
+        .outerjoin(comments, comments.c.book_id == models.Book.id)
+
+    return [
+        delete(models.BookStats),
+        insert(models.BookStats).from_select(
+            ['book_id', 'rate_sum', 'rate_count', 'rate_avg', 'last_rated_at', 'comments_count'],
+            aggregate_query
+        ),
+    ]
+
+
+def _count_by_shelf(table, count_column):
+    return select(table.shelf_uid, func.count(count_column).label('count')) \
+        .group_by(table.shelf_uid) \
+        .subquery()
+
+
+def rebuild_shelf_stats() -> list:
+    """Statements recomputing shelf_stats for every shelf from rates, books and comments."""
+    rates = select(
+        models.ShelfRate.shelf_uid,
+        func.sum(models.ShelfRate.rate).label('rate_sum'),
+        func.count(models.ShelfRate.id).label('rate_count'),
+        func.avg(models.ShelfRate.rate).label('rate_avg'),
+    ).group_by(models.ShelfRate.shelf_uid).subquery()
+    books = _count_by_shelf(models.BookInShelf, models.BookInShelf.id)
+    comments = _count_by_shelf(models.ShelfComment, models.ShelfComment.id)
+
+    zero = literal(0, Integer)
+    aggregate_query = select(
+        models.Shelf.uid,
+        func.coalesce(rates.c.rate_sum, zero),
+        func.coalesce(rates.c.rate_count, zero),
+        rates.c.rate_avg,
+        func.coalesce(books.c.count, zero),
+        func.coalesce(comments.c.count, zero),
+    ) \
+        .outerjoin(rates, rates.c.shelf_uid == models.Shelf.uid) \
+        .outerjoin(books, books.c.shelf_uid == models.Shelf.uid) \
+        .outerjoin(comments, comments.c.shelf_uid == models.Shelf.uid)
+
+    return [
+        delete(models.ShelfStats),
+        insert(models.ShelfStats).from_select(
+            ['shelf_uid', 'rate_sum', 'rate_count', 'rate_avg', 'books_count', 'comments_count'],
+            aggregate_query
+        ),
+    ]
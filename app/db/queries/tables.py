@@ -1,9 +1,9 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Table, DateTime, TIMESTAMP, func
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Table, DateTime, TIMESTAMP, Float, Index, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship, backref
 
 from app.db.base import Base
 
@@ -94,6 +94,8 @@ class Book(Base):
     pub_date = Column(DateTime, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.current_timestamp())
+    # title, authors, tags, description and annotation, kept by the book_search_vector triggers
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
 
     publisher_id = Column(Integer, ForeignKey('book_publisher.id'))
     publisher = relationship(BookPublisher, backref="books")
@@ -119,7 +121,10 @@ class BookComment(Base):
 
 class BookRate(Base):
     __tablename__ = "book_rate"
-    __table_args__ = {"schema": "jbook"}
+    __table_args__ = (
+        UniqueConstraint('user_uid', 'book_id', name='uq_book_rate_user_uid_book_id'),
+        {"schema": "jbook"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, unique=True)
     book_id = Column(Integer, ForeignKey("book.id"))
@@ -128,6 +133,19 @@ class BookRate(Base):
     rated_at = Column(TIMESTAMP, server_default=func.now())
 
 
+class BookStats(Base):
+    """Rating and comments aggregates of a book, maintained on every write."""
+    __tablename__ = "book_stats"
+    __table_args__ = {"schema": "jbook"}
+
+    book_id = Column(Integer, ForeignKey("book.id"), primary_key=True)
+    rate_sum = Column(Integer, nullable=False, server_default='0')
+    rate_count = Column(Integer, nullable=False, server_default='0')
+    rate_avg = Column(Float, nullable=True)
+    last_rated_at = Column(TIMESTAMP, nullable=True)
+    comments_count = Column(Integer, nullable=False, server_default='0')
+
+
 m2m_shelf_shelf_tag = Table(
     '_m2m_shelf_shelf_tag',
     Base.metadata,
@@ -198,12 +216,29 @@ class Shelf(Base):
 
 class ShelfRate(Base):
     __tablename__ = "shelf_rate"
-    __table_args__ = {"schema": "jbook"}
+    __table_args__ = (
+        UniqueConstraint('user_uid', 'shelf_uid', name='uq_shelf_rate_user_uid_shelf_uid'),
+        {"schema": "jbook"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, unique=True)
     user_uid = Column(UUID(as_uuid=True), ForeignKey('user.uid'), primary_key=True)
     shelf_uid = Column(UUID(as_uuid=True), ForeignKey('shelf.uid'), primary_key=True)
     rate = Column(Integer)
+    rated_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class ShelfStats(Base):
+    """Rating, books and comments aggregates of a shelf, maintained on every write."""
+    __tablename__ = "shelf_stats"
+    __table_args__ = {"schema": "jbook"}
+
+    shelf_uid = Column(UUID(as_uuid=True), ForeignKey('shelf.uid'), primary_key=True)
+    rate_sum = Column(Integer, nullable=False, server_default='0')
+    rate_count = Column(Integer, nullable=False, server_default='0')
+    rate_avg = Column(Float, nullable=True)
+    books_count = Column(Integer, nullable=False, server_default='0')
+    comments_count = Column(Integer, nullable=False, server_default='0')
 
 
 class BookInShelfTag(Base):
@@ -226,4 +261,40 @@ class ShelfComment(Base):
     content = Column(Text)
 
 
+
+# Listing sort orders, see app.db.queries.sorting
+Index('ix_book_title_id', Book.title, Book.id)
+Index('ix_book_pub_date_id', Book.pub_date, Book.id)
+Index('ix_book_created_at_id', Book.created_at.desc().nullslast(), Book.id.desc())
+Index('ix_book_created_at_id_asc', Book.created_at.asc().nullslast(), Book.id)
+Index('ix_book_stats_rate_avg_book_id', BookStats.rate_avg.desc().nullslast(), BookStats.book_id.desc())
+Index('ix_book_stats_rate_avg_book_id_asc', BookStats.rate_avg.asc().nullslast(), BookStats.book_id)
+Index('ix_shelf_name_uid', Shelf.name, Shelf.uid)
+Index('ix_shelf_created_at_uid', Shelf.created_at.desc().nullslast(), Shelf.uid.desc())
+Index('ix_shelf_created_at_uid_asc', Shelf.created_at.asc().nullslast(), Shelf.uid)
+
+# Foreign key and filter lookups
+Index('ix_book_rate_book_id', BookRate.book_id)
+Index('ix_book_comment_book_id_pub_date_id',
+      BookComment.book_id, BookComment.pub_date.desc().nullslast(), BookComment.id.desc())
+Index('ix_shelf_comment_shelf_uid_pub_date_id',
+      ShelfComment.shelf_uid, ShelfComment.pub_date.desc().nullslast(), ShelfComment.id.desc())
+Index('ix_book_in_shelf_shelf_uid_id', BookInShelf.shelf_uid, BookInShelf.id)
+Index('ix_m2m_book_book_category_category_id', m2m_book_book_category.c.category_id)
+Index('ix_m2m_book_book_author_book_author_id', m2m_book_book_author.c.book_author_id)
+Index('ix_m2m_book_book_tag_book_tag', m2m_book_book_tag.c.book_tag)
+Index('ix_m2m_shelf_shelf_tag_shelf_tag', m2m_shelf_shelf_tag.c.shelf_tag)
+Index('ix_shelf_user_uid', Shelf.user_uid)
+Index('ix_shelf_type_created_at', Shelf.type, Shelf.created_at)
+
+# Full text search, see app.db.queries.search
+Index('ix_book_search_vector', Book.search_vector, postgresql_using='gin')
+
+# Autocomplete, see app.db.queries.autocomplete
+Index('ix_book_title_trgm', Book.title, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+Index('ix_book_author_name_trgm', BookAuthor.name, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+Index('ix_book_publisher_name_trgm', BookPublisher.name,
+      postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+Index('ix_book_tag_name_trgm', BookTag.name, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
 metadata = Base.metadata
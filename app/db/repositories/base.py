@@ -1,3 +1,4 @@
+import asyncpg
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -8,3 +9,13 @@ class BaseRepository:
     @property
     def session(self) -> AsyncSession:
         return self.__session
+
+    async def raw_connection(self) -> asyncpg.Connection:
+        """asyncpg connection the session runs on, so raw queries share its unit of work."""
+        connection = await self.session.connection()
+        fairy = await connection.get_raw_connection()
+        # the asyncpg adapter sends BEGIN lazily with its first statement, start it here so raw
+        # reads run inside the session transaction (READ ONLY on replicas) and share its snapshot
+        if not fairy.connection._started:
+            await connection.exec_driver_sql('SELECT 1')
+        return fairy.connection.driver_connection
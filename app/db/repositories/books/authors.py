@@ -1,5 +1,7 @@
 from sqlalchemy.future import select
 
+from app.core.const import DEFAULT_AUTOCOMPLETE_LIMIT
+from app.db.queries.autocomplete import autocomplete_params, autocomplete_query
 from app.db.repositories.base import BaseRepository
 from app.db.queries.tables import BookAuthor as BookAuthorTable
 
@@ -10,3 +12,7 @@ class BookAuthorRepository(BaseRepository):
     async def get_all_authors(self) -> list[BookAuthor]:
         authors = (await self.session.execute(select(BookAuthorTable))).scalars().all()
         return authors
+
+    async def autocomplete_authors(self, q: str, limit: int = DEFAULT_AUTOCOMPLETE_LIMIT) -> list[BookAuthor]:
+        query = autocomplete_query(BookAuthorTable.name, BookAuthorTable.id, BookAuthorTable.name)
+        return (await self.session.execute(query, autocomplete_params(q, limit))).all()
@@ -1,15 +1,41 @@
 from typing import Optional
 
-from sqlalchemy import func, text, desc, delete, insert
+from sqlalchemy import bindparam, func, delete, insert, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.core.const import DEFAULT_BOOK_ORDER_BY, DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT
+from app.core.config import get_app_settings
+from app.core.const import DEFAULT_BOOK_ORDER_BY, DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT, DEFAULT_COMMENTS_LIMIT, \
+    DEFAULT_AUTOCOMPLETE_LIMIT
 from app.db.queries.tables import User, BookComment, BookRate
 from app.db.repositories.base import BaseRepository
+from app.db.rows import BookRow, BookSearchRow, CommentRow, FacetRow, UserRow
 from app.db.queries import tables as models
+from app.db.queries.autocomplete import autocomplete_params, autocomplete_query
+from app.db.queries.facets import TOTAL, facet_counts_query
+from app.db.queries.relations import book_relations
+from app.db.queries.search import search_query, search_rank
+from app.db.queries.sorting import SortColumn, SortEngine, parse_sort
+from app.db.queries.statements import cached_statement, keyset_after_params, keyset_params, keyset_shape
+from app.db.queries.stats import book_stats_delta, rebuild_book_stats
 
-from app.models.domain.books import Book
+from app.models.domain.books import Book, BookMinimized
+
+settings = get_app_settings()
+
+BOOK_SORT = SortEngine({
+    'title': SortColumn(models.Book.title, models.Book.id),
+    # every book has a stats row, so the rate order is a scan of ix_book_stats_rate_avg_book_id
+    'rate': SortColumn(models.BookStats.rate_avg, models.BookStats.book_id, nullable=True),
+    'pub_date': SortColumn(models.Book.pub_date, models.Book.id),
+    'created_at': SortColumn(models.Book.created_at, models.Book.id, nullable=True),
+})
+
+# comment pages of a book, newest first along ix_book_comment_book_id_pub_date_id
+BOOK_COMMENTS_SORT = SortEngine({
+    'pub_date': SortColumn(models.BookComment.pub_date, models.BookComment.id, nullable=True),
+})
 
 
 class BookRepository(BaseRepository):
@@ -24,38 +50,32 @@ class BookRepository(BaseRepository):
             user: Optional[User] = None,
             sort_by: Optional[str] = DEFAULT_BOOK_ORDER_BY,
             offset=DEFAULT_BOOK_OFFSET,
-            limit=DEFAULT_BOOK_LIMIT) -> list[Book]:
-
-        user_uid = user.uid if user else None
-
-        user_rate_query = select(models.BookRate.book_id, models.BookRate.rate.label('userRate')) \
-            .filter(models.BookRate.user_uid == user_uid).cte()
+            limit=DEFAULT_BOOK_LIMIT,
+            after: Optional[tuple] = None) -> list[Book]:
 
-        rate_query = select(models.BookRate.book_id, func.avg(models.BookRate.rate).label('rate')) \
-            .group_by(models.BookRate.book_id).cte()
+        sort_key, sort_desc = parse_sort(sort_by)
+        if after is not None:
+            offset = 0
 
-        query = select(models.Book, rate_query.c.rate, user_rate_query.c.userRate) \
-            .options(
-            selectinload(models.Book.categories),
-            selectinload(models.Book.authors),
-            selectinload(models.Book.publisher),
-            selectinload(models.Book.tags),
-            selectinload(models.Book.images),
+        shape = (
+            'filter_books', settings.single_query_lists, bool(tags), bool(categories), bool(publishers),
+            bool(authors), sort_key, sort_desc, keyset_shape(after),
         )
-
-        if categories:
-            query = query.filter(models.Book.categories.any(models.BookCategory.id.in_(categories)))
-        if authors:
-            query = query.filter(models.Book.authors.any(models.BookAuthor.id.in_(authors)))
-        if publishers:
-            query = query.where(models.Book.publisher_id.in_(publishers))
-        if tags:
-            query = query.filter(models.Book.tags.any(models.BookTag.name.in_(tags)))
-        query = query.outerjoin(user_rate_query)
-        query = query.outerjoin(rate_query)
-        query = query.order_by(text(sort_by)).limit(limit).offset(offset)
-
-        raw_books = (await self.session.execute(query)).fetchall()
+        query = cached_statement(shape, lambda: self._filter_books_query(*shape[1:]))
+        params = {
+            'user_uid': user.uid if user else None,
+            'tags': tags,
+            'categories': categories,
+            'publishers': publishers,
+            'authors': authors,
+            'limit': limit,
+            'offset': offset,
+            **keyset_params(after),
+        }
+
+        raw_books = (await self.session.execute(query, params)).fetchall()
+        if settings.single_query_lists:
+            return [BookRow._make(book) for book in raw_books]
 
         books = []
         for book in raw_books:
@@ -65,6 +85,150 @@ class BookRepository(BaseRepository):
 
         return books
 
+    @staticmethod
+    def _filter_books_query(single_query: bool, tags: bool, categories: bool, publishers: bool, authors: bool,
+                            sort_key: str, sort_desc: bool, keyset: Optional[bool]):
+        user_rate_query = BookRepository._user_rate_query()
+
+        if single_query:
+            query = select(*BookRepository._book_row_columns(user_rate_query))
+        else:
+            query = select(models.Book, models.BookStats.rate_avg.label('rate'), user_rate_query.c.userRate) \
+                .options(
+                selectinload(models.Book.categories),
+                selectinload(models.Book.authors),
+                selectinload(models.Book.publisher),
+                selectinload(models.Book.tags),
+                selectinload(models.Book.images),
+            )
+
+        query = BookRepository._filter_facets(query, tags, categories, publishers, authors)
+        query = query.outerjoin(user_rate_query)
+        query = query.join(models.BookStats, models.BookStats.book_id == models.Book.id)
+
+        if keyset is not None:
+            query = query.filter(keyset_after_params(BOOK_SORT, sort_key, sort_desc, keyset))
+
+        return query.order_by(*BOOK_SORT.order_by(sort_key, sort_desc)) \
+            .limit(bindparam('limit')) \
+            .offset(bindparam('offset'))
+
+    async def count_facets(
+            self,
+            facets: list[str],
+            tags: Optional[list[str]] = None,
+            categories: Optional[list[int]] = None,
+            publishers: Optional[list[int]] = None,
+            authors: Optional[list[int]] = None) -> dict:
+        """Most frequent values of facets among the books matching the filters, in one statement.
+
+        Counts cover at most facet_sample_size books, truncated tells whether the
+        filtered set was larger than that.
+        """
+        facets = tuple(sorted(set(facets)))
+        shape = ('count_facets', facets, bool(tags), bool(categories), bool(publishers), bool(authors))
+        query = cached_statement(shape, lambda: self._count_facets_query(*shape[1:]))
+        params = {
+            'tags': tags,
+            'categories': categories,
+            'publishers': publishers,
+            'authors': authors,
+            'facet_sample_size': settings.facet_sample_size,
+            'facet_values': settings.facet_values_limit,
+        }
+
+        counts = {facet: [] for facet in facets}
+        total = 0
+        for facet, _id, name, count in await self.session.execute(query, params):
+            if facet == TOTAL:
+                total = count
+            else:
+                counts[facet].append(FacetRow(_id, name, count))
+
+        return {**counts, 'truncated': total >= settings.facet_sample_size}
+
+    @staticmethod
+    def _count_facets_query(facets: tuple[str, ...], tags: bool, categories: bool, publishers: bool, authors: bool):
+        matched_books = select(models.Book.id, models.Book.publisher_id)
+        matched_books = BookRepository._filter_facets(matched_books, tags, categories, publishers, authors)
+        return facet_counts_query(matched_books, facets)
+
+    async def search_books(
+            self,
+            q: str,
+            tags: Optional[list[str]] = None,
+            categories: Optional[list[int]] = None,
+            publishers: Optional[list[int]] = None,
+            authors: Optional[list[int]] = None,
+            user: Optional[User] = None,
+            limit=DEFAULT_BOOK_LIMIT,
+            after: Optional[tuple] = None) -> list[BookSearchRow]:
+        """Books matching the web search query q, best ranked first, placed after the (rank, id) of after."""
+        shape = ('search_books', bool(tags), bool(categories), bool(publishers), bool(authors), keyset_shape(after))
+        query = cached_statement(shape, lambda: self._search_books_query(*shape[1:]))
+        params = {
+            'q': q,
+            'user_uid': user.uid if user else None,
+            'tags': tags,
+            'categories': categories,
+            'publishers': publishers,
+            'authors': authors,
+            'limit': limit,
+            **keyset_params(after),
+        }
+
+        return [BookSearchRow._make(book) for book in await self.session.execute(query, params)]
+
+    @staticmethod
+    def _search_books_query(tags: bool, categories: bool, publishers: bool, authors: bool, keyset: Optional[bool]):
+        user_rate_query = BookRepository._user_rate_query()
+        tsquery = search_query()
+        rank = search_rank(tsquery)
+        # ranks are computed per query, so pages are cut from the matches the GIN index returns
+        rank_sort = SortEngine({'rank': SortColumn(rank, models.Book.id)})
+
+        query = select(*BookRepository._book_row_columns(user_rate_query), rank) \
+            .filter(models.Book.search_vector.op('@@')(tsquery))
+        query = BookRepository._filter_facets(query, tags, categories, publishers, authors)
+        query = query.outerjoin(user_rate_query)
+        query = query.join(models.BookStats, models.BookStats.book_id == models.Book.id)
+
+        if keyset is not None:
+            query = query.filter(keyset_after_params(rank_sort, 'rank', True, keyset))
+
+        return query.order_by(*rank_sort.order_by('rank', True)).limit(bindparam('limit'))
+
+    @staticmethod
+    def _user_rate_query():
+        return select(models.BookRate.book_id, models.BookRate.rate.label('userRate')) \
+            .filter(models.BookRate.user_uid == bindparam('user_uid', type_=models.BookRate.user_uid.type)).cte()
+
+    @staticmethod
+    def _book_row_columns(user_rate_query) -> list:
+        row_columns = {
+            **dict(models.Book.__table__.c.items()),
+            'rate': models.BookStats.rate_avg.label('rate'),
+            'user_rate': user_rate_query.c.userRate.label('user_rate'),
+            **{relation.name: relation for relation in book_relations()},
+        }
+        return [row_columns[name] for name in BookRow._fields]
+
+    @staticmethod
+    def _filter_facets(query, tags: bool, categories: bool, publishers: bool, authors: bool):
+        if categories:
+            query = query.filter(models.Book.categories.any(
+                models.BookCategory.id.in_(bindparam('categories', expanding=True))
+            ))
+        if authors:
+            query = query.filter(models.Book.authors.any(
+                models.BookAuthor.id.in_(bindparam('authors', expanding=True))
+            ))
+        if publishers:
+            query = query.where(models.Book.publisher_id.in_(bindparam('publishers', expanding=True)))
+        if tags:
+            query = query.filter(models.Book.tags.any(models.BookTag.name.in_(bindparam('tags', expanding=True))))
+        return query
+
     async def get_existing_book(self, book_ids: list[int], only_ids=False):
         if only_ids:
             query = select(models.Book.id)
@@ -83,12 +247,7 @@ class BookRepository(BaseRepository):
             .filter(models.BookRate.book_id == book_id) \
             .cte()
 
-        rate_query = select(models.BookRate.book_id, func.avg(models.BookRate.rate).label('rate')) \
-            .filter(models.BookRate.book_id == book_id) \
-            .group_by(models.BookRate.book_id) \
-            .cte()
-
-        query = select(models.Book, rate_query.c.rate, user_rate_query.c.userRate).options(
+        query = select(models.Book, models.BookStats.rate_avg, user_rate_query.c.userRate).options(
             selectinload(models.Book.categories),
             selectinload(models.Book.authors),
             selectinload(models.Book.publisher),
@@ -97,7 +256,7 @@ class BookRepository(BaseRepository):
         ).filter(models.Book.id == book_id)
 
         query = query.outerjoin(user_rate_query)
-        query = query.outerjoin(rate_query)
+        query = query.outerjoin(models.BookStats, models.BookStats.book_id == models.Book.id)
 
         book_raw = (await self.session.execute(query)).first()
         if book_raw[0] is None:
@@ -107,19 +266,48 @@ class BookRepository(BaseRepository):
 
         return book_raw[0]
 
+    async def autocomplete_titles(self, q: str, limit: int = DEFAULT_AUTOCOMPLETE_LIMIT) -> list[BookMinimized]:
+        query = autocomplete_query(models.Book.title, models.Book.id, models.Book.title)
+        return (await self.session.execute(query, autocomplete_params(q, limit))).all()
+
     async def get_book_instance_by_id(self, book_id) -> Optional[Book]:
         query = select(models.Book) \
             .filter(models.Book.id == book_id)
         return (await self.session.execute(query)).scalars().first()
 
     # Comments
-    async def get_comments(self, book: Book) -> list[BookComment]:
-        query = select(models.BookComment) \
-            .filter(models.BookComment.book_id == book.id) \
-            .order_by(desc(models.BookComment.pub_date)) \
-            .options(selectinload(models.BookComment.user))
-
-        return (await self.session.execute(query)).scalars().all()
+    async def get_comments(self, book: Book, limit: int = DEFAULT_COMMENTS_LIMIT,
+                           after: Optional[tuple] = None) -> list[CommentRow]:
+        """A page of the book comments, newest first, placed after the (pub_date, id) of after."""
+        shape = ('book_comments', keyset_shape(after))
+        query = cached_statement(shape, lambda: self._comments_query(*shape[1:]))
+        params = {'book_id': book.id, 'limit': limit, **keyset_params(after)}
+
+        return [
+            CommentRow(_id, content, pub_date, UserRow(first_name, surname))
+            for _id, content, pub_date, first_name, surname in await self.session.execute(query, params)
+        ]
+
+    @staticmethod
+    def _comments_query(keyset: Optional[bool]):
+        query = select(
+            models.BookComment.id,
+            models.BookComment.content,
+            models.BookComment.pub_date,
+            models.User.first_name,
+            models.User.surname,
+        ) \
+            .join(models.User, models.User.uid == models.BookComment.user_uid) \
+            .filter(models.BookComment.book_id == bindparam('book_id', type_=models.BookComment.book_id.type))
+
+        if keyset is not None:
+            query = query.filter(keyset_after_params(BOOK_COMMENTS_SORT, 'pub_date', True, keyset))
+
+        return query.order_by(*BOOK_COMMENTS_SORT.order_by('pub_date', True)).limit(bindparam('limit'))
+
+    async def get_comments_count(self, book: Book) -> int:
+        query = select(models.BookStats.comments_count).filter(models.BookStats.book_id == book.id)
+        return (await self.session.execute(query)).scalar() or 0
 
     async def get_comment_by_id(self, comment_id: int) -> Optional[BookComment]:
         select_query = select(models.BookComment).filter(
@@ -127,22 +315,28 @@ class BookRepository(BaseRepository):
         )
         return (await self.session.execute(select_query)).scalars().first()
 
-    async def create_comment(self, user: User, book: Book, content: str):
+    async def create_comment(self, user: User, book: Book, content: str) -> CommentRow:
         insert_query = insert(models.BookComment) \
             .values(user_uid=user.uid, book_id=book.id, content=content) \
             .returning(models.BookComment.id, models.BookComment.content, models.BookComment.pub_date)
 
-        comment_tuple = (await self.session.execute(insert_query)).first()
-        comment_obj = models.BookComment(id=comment_tuple[0], content=comment_tuple[1], pub_date=comment_tuple[2])
-        comment_obj.user = user
+        # a row, not a BookComment: attaching user to an ORM object would cascade it into the
+        # session and the commit would insert the comment a second time
+        _id, content, pub_date = (await self.session.execute(insert_query)).first()
+        comment_obj = CommentRow(_id, content, pub_date, UserRow(user.first_name, user.surname))
+
+        await self.session.execute(book_stats_delta(book.id, comments_delta=1))
 
         return comment_obj
 
     async def delete_comment(self, comment: BookComment):
         delete_query = delete(models.BookComment).filter(
             models.BookComment.id == comment.id
-        )
-        await self.session.execute(delete_query)
+        ).returning(models.BookComment.book_id)
+
+        book_id = (await self.session.execute(delete_query)).scalar()
+        if book_id is not None:
+            await self.session.execute(book_stats_delta(book_id, comments_delta=-1))
 
     # Rates
     async def get_rate(self, user: User, book: Book):
@@ -155,18 +349,37 @@ class BookRepository(BaseRepository):
 
         return book_rate
 
-    async def rate_book(self, user: User, book: Book, rate: int):
-        insert_query = insert(models.BookRate) \
+    # book_stats rate aggregates are maintained by the book_rate triggers
+    async def rate_book(self, user: User, book: Book, rate: int) -> Optional[BookRate]:
+        """Insert the user rate, None when the user has already rated the book."""
+        insert_query = pg_insert(models.BookRate) \
             .values(user_uid=user.uid, book_id=book.id, rate=rate) \
-            .returning(models.BookRate.id, models.BookRate.rate, models.BookRate.rated_at)
+            .on_conflict_do_nothing(index_elements=[models.BookRate.user_uid, models.BookRate.book_id]) \
+            .returning(models.BookRate.rate, models.BookRate.rated_at)
 
-        rate_tuple = (await self.session.execute(insert_query)).first()
-        rate_obj = models.BookRate(rate=rate_tuple[1], rated_at=rate_tuple[2])
+        return (await self.session.execute(insert_query)).first()
 
-        return rate_obj
+    async def upsert_rate(self, user: User, book_id: int, rate: int) -> Optional[BookRate]:
+        """Set the user rate in one statement, None when the book does not exist."""
+        book_query = select(literal(user.uid, models.BookRate.user_uid.type), models.Book.id, literal(rate), func.now()) \
+            .filter(models.Book.id == book_id)
+        insert_query = pg_insert(models.BookRate) \
+            .from_select(['user_uid', 'book_id', 'rate', 'rated_at'], book_query)
+        upsert_query = insert_query \
+            .on_conflict_do_update(
+                index_elements=[models.BookRate.user_uid, models.BookRate.book_id],
+                set_={'rate': insert_query.excluded.rate, 'rated_at': insert_query.excluded.rated_at},
+            ) \
+            .returning(models.BookRate.rate, models.BookRate.rated_at)
+
+        return (await self.session.execute(upsert_query)).first()
 
     async def delete_rate(self, rate: BookRate):
         delete_query = delete(models.BookRate).filter(
             models.BookRate.id == rate.id
         )
         await self.session.execute(delete_query)
+
+    async def rebuild_stats(self):
+        for query in rebuild_book_stats():
+            await self.session.execute(query)
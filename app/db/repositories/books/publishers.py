@@ -2,6 +2,8 @@ from typing import List
 
 from sqlalchemy.future import select
 
+from app.core.const import DEFAULT_AUTOCOMPLETE_LIMIT
+from app.db.queries.autocomplete import autocomplete_params, autocomplete_query
 from app.db.repositories.base import BaseRepository
 from app.db.queries.tables import BookPublisher as BookPublisherTable
 
@@ -12,3 +14,7 @@ class BookPublisherRepository(BaseRepository):
     async def get_all_publishers(self) -> List[BookPublisher]:
         publishers = (await self.session.execute(select(BookPublisherTable))).scalars().all()
         return publishers
+
+    async def autocomplete_publishers(self, q: str, limit: int = DEFAULT_AUTOCOMPLETE_LIMIT) -> List[BookPublisher]:
+        query = autocomplete_query(BookPublisherTable.name, BookPublisherTable.id, BookPublisherTable.name)
+        return (await self.session.execute(query, autocomplete_params(q, limit))).all()
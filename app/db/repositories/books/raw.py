@@ -0,0 +1,47 @@
+from typing import Optional
+
+from app.core.const import DEFAULT_BOOK_ORDER_BY, DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT
+from app.db.queries import raw
+from app.db.queries.sorting import parse_sort
+from app.db.queries.tables import User
+from app.db.repositories.books.books import BookRepository
+from app.db.rows import BookRow
+
+
+class RawBookRepository(BookRepository):
+    """BookRepository whose hottest reads run hand written SQL on the raw asyncpg connection."""
+
+    async def filter_books(
+            self,
+            tags: Optional[list[str]] = None,
+            categories: Optional[list[int]] = None,
+            publishers: Optional[list[int]] = None,
+            authors: Optional[list[int]] = None,
+            user: Optional[User] = None,
+            sort_by: Optional[str] = DEFAULT_BOOK_ORDER_BY,
+            offset=DEFAULT_BOOK_OFFSET,
+            limit=DEFAULT_BOOK_LIMIT,
+            after: Optional[tuple] = None) -> list[BookRow]:
+        sort_key, sort_desc = parse_sort(sort_by)
+        if after is not None:
+            offset = 0
+
+        connection = await self.raw_connection()
+        records = await connection.fetch(
+            raw.filter_books_sql(sort_key, sort_desc, after),
+            user.uid if user else None,
+            categories or None,
+            authors or None,
+            publishers or None,
+            tags or None,
+            limit,
+            offset,
+            *raw.keyset_args(after),
+        )
+        # json columns arrive decoded by the codec the SQLAlchemy dialect registers
+        return [BookRow(*record) for record in records]
+
+    async def get_book_by_id(self, book_id: int, user: Optional[User] = None) -> Optional[BookRow]:
+        connection = await self.raw_connection()
+        record = await connection.fetchrow(raw.GET_BOOK_BY_ID, user.uid if user else None, book_id)
+        return None if record is None else BookRow(*record)
@@ -2,6 +2,8 @@ from typing import List, Sequence
 
 from sqlalchemy.future import select
 
+from app.core.const import DEFAULT_AUTOCOMPLETE_LIMIT
+from app.db.queries.autocomplete import autocomplete_params, autocomplete_query
 from app.db.repositories.base import BaseRepository
 from app.db.queries.tables import BookTag
 
@@ -11,4 +13,8 @@ class BookTagsRepository(BaseRepository):
         tags = (await self.session.execute(select(BookTag))).scalars().all()
         return [tag.name for tag in tags]
 
+    async def autocomplete_tags(self, q: str, limit: int = DEFAULT_AUTOCOMPLETE_LIMIT) -> List[str]:
+        query = autocomplete_query(BookTag.name, BookTag.name)
+        return (await self.session.execute(query, autocomplete_params(q, limit))).scalars().all()
+
 
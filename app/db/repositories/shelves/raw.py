@@ -0,0 +1,50 @@
+from typing import Optional
+
+from app.core.const import DEFAULT_SHELF_LIMIT, DEFAULT_SHELF_OFFSET
+from app.db.errors import RequireUser
+from app.db.queries import raw
+from app.db.queries.sorting import parse_sort
+from app.db.queries import tables as models
+from app.db.repositories.shelves.shelves import ShelfRepository, settings
+from app.db.rows import ShelfRow, UserRow
+
+
+def _shelf_row(record) -> ShelfRow:
+    # json columns arrive decoded by the codec the SQLAlchemy dialect registers
+    *scalars, first_name, surname, avatar, tags, books_in_shelf = record
+    return ShelfRow(*scalars, UserRow(first_name, surname), avatar, tags, books_in_shelf)
+
+
+class RawShelfRepository(ShelfRepository):
+    """ShelfRepository whose hottest reads run hand written SQL on the raw asyncpg connection."""
+
+    async def filter_shelves(
+            self,
+            tags: Optional[list[str]],
+            sort_by: Optional[str],
+            _type: str = 'public',
+            limit: Optional[int] = DEFAULT_SHELF_LIMIT,
+            offset: Optional[int] = DEFAULT_SHELF_OFFSET,
+            user: Optional[models.User] = None,
+            only_user: bool = False,
+            after: Optional[tuple] = None,
+    ) -> list[ShelfRow]:
+        if only_user and not user:
+            raise RequireUser("When only_user passed, user should be included in query")
+
+        sort_key, sort_desc = parse_sort(sort_by)
+        if after is not None:
+            offset = 0
+
+        user_uid = user.uid if user else None
+        connection = await self.raw_connection()
+        records = await connection.fetch(
+            raw.filter_shelves_sql(sort_key, sort_desc, after, settings.shelf_preview_books),
+            user_uid,
+            tags or None,
+            user_uid if only_user else None,
+            limit,
+            offset,
+            *raw.keyset_args(after),
+        )
+        return [_shelf_row(record) for record in records]
@@ -1,17 +1,39 @@
+from collections import defaultdict
 from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import func, text, desc, delete, insert
+from sqlalchemy import bindparam, func, delete, insert, literal, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.core.const import DEFAULT_SHELF_LIMIT, DEFAULT_SHELF_OFFSET
+from app.core.config import get_app_settings
+from app.core.const import DEFAULT_SHELF_LIMIT, DEFAULT_SHELF_OFFSET, DEFAULT_COMMENTS_LIMIT
 from app.db.errors import RequireUser
 from app.db.queries import tables as models
 from app.db.queries.tables import ShelfComment
+from app.db.queries.relations import shelf_relations
+from app.db.queries.sorting import SortColumn, SortEngine, parse_sort
+from app.db.queries.statements import cached_statement, keyset_after_params, keyset_params, keyset_shape
+from app.db.queries.stats import shelf_stats_delta, rebuild_shelf_stats
 from app.db.repositories.base import BaseRepository
+from app.db.rows import CommentRow, ShelfRow, UserRow
 from app.db.queries import tables as models
 from app.models.domain.shelves import Shelf
+from app.services.invalidation import invalidation_bus
+
+settings = get_app_settings()
+
+SHELF_SORT = SortEngine({
+    'name': SortColumn(models.Shelf.name, models.Shelf.uid),
+    'created_at': SortColumn(models.Shelf.created_at, models.Shelf.uid, nullable=True),
+})
+
+# comment pages of a shelf, newest first along ix_shelf_comment_shelf_uid_pub_date_id
+SHELF_COMMENTS_SORT = SortEngine({
+    'pub_date': SortColumn(models.ShelfComment.pub_date, models.ShelfComment.id, nullable=True),
+})
 
 
 class ShelfRepository(BaseRepository):
@@ -22,6 +44,7 @@ class ShelfRepository(BaseRepository):
         return (await self.session.execute(query)).scalars().first()
 
     async def get_shelf_by_uid(self, shelf_uid: UUID, user: Optional[models.User] = None) -> Optional[models.Shelf]:
+        """The shelf with every book in it, lists only carry a preview, see shelf_preview_books."""
         user_uid = user.uid if user else None
 
         user_rate_query = select(models.ShelfRate.shelf_uid, models.ShelfRate.rate.label('userRate')) \
@@ -29,26 +52,20 @@ class ShelfRepository(BaseRepository):
             .filter(models.ShelfRate.shelf_uid == shelf_uid) \
             .cte()
 
-        rate_query = select(models.ShelfRate.shelf_uid, func.avg(models.ShelfRate.rate).label('rate')) \
-            .filter(models.ShelfRate.shelf_uid == shelf_uid) \
-            .group_by(models.ShelfRate.shelf_uid) \
-            .cte()
-
-        query = select(models.Shelf, rate_query.c.rate, user_rate_query.c.userRate).options(
+        query = select(models.Shelf, models.ShelfStats, user_rate_query.c.userRate).options(
             selectinload(models.Shelf.tags),
             selectinload(models.Shelf.avatar),
+            selectinload(models.Shelf.books_in_shelf),
         ).filter(models.Shelf.uid == shelf_uid)
 
         query = query.outerjoin(user_rate_query)
-        query = query.outerjoin(rate_query)
+        query = query.outerjoin(models.ShelfStats, models.ShelfStats.shelf_uid == models.Shelf.uid)
 
         shelf_raw = (await self.session.execute(query)).first()
         if shelf_raw[0] is None:
             return None
-        shelf_raw[0].rate = shelf_raw[1]
-        shelf_raw[0].user_rate = shelf_raw[2]
 
-        return shelf_raw[0]
+        return self._with_stats(*shelf_raw)
 
     async def filter_shelves(
             self,
@@ -58,47 +75,124 @@ class ShelfRepository(BaseRepository):
             limit: Optional[int] = DEFAULT_SHELF_LIMIT,
             offset: Optional[int] = DEFAULT_SHELF_OFFSET,
             user: Optional[models.User] = None,
-            only_user: bool = False
-
+            only_user: bool = False,
+            after: Optional[tuple] = None,
     ) -> list[models.Shelf]:
-        user_uid = user.uid if user else None
+        if only_user and not user:
+            raise RequireUser("When only_user passed, user should be included in query")
+
+        sort_key, sort_desc = parse_sort(sort_by)
+        if after is not None:
+            offset = 0
+
+        shape = ('filter_shelves', settings.single_query_lists, bool(tags), only_user, sort_key, sort_desc,
+                 keyset_shape(after))
+        query = cached_statement(shape, lambda: self._filter_shelves_query(*shape[1:]))
+        params = {
+            'user_uid': user.uid if user else None,
+            'tags': tags,
+            'limit': limit,
+            'offset': offset,
+            **keyset_params(after),
+        }
+
+        raw_shelves = (await self.session.execute(query, params)).fetchall()
+        if settings.single_query_lists:
+            return [self._shelf_row(*shelf) for shelf in raw_shelves]
+
+        shelves = [self._with_stats(*shelf) for shelf in raw_shelves]
+        await self._load_books_preview(shelves)
+        return shelves
 
+    async def _load_books_preview(self, shelves: list[models.Shelf]) -> None:
+        """Set books_in_shelf of every shelf to its first shelf_preview_books books, in one query."""
+        if not shelves:
+            return
+
+        preview = select(models.BookInShelf.id) \
+            .where(models.BookInShelf.shelf_uid == models.Shelf.uid) \
+            .correlate(models.Shelf) \
+            .order_by(models.BookInShelf.id) \
+            .limit(settings.shelf_preview_books) \
+            .lateral('book_in_shelf_preview')
+        query = select(models.BookInShelf) \
+            .select_from(models.Shelf) \
+            .join(preview, true()) \
+            .join(models.BookInShelf, models.BookInShelf.id == preview.c.id) \
+            .filter(models.Shelf.uid.in_([shelf.uid for shelf in shelves])) \
+            .order_by(models.BookInShelf.shelf_uid, models.BookInShelf.id)
+
+        books_in_shelf = defaultdict(list)
+        for book_in_shelf in (await self.session.execute(query)).scalars().unique():
+            books_in_shelf[book_in_shelf.shelf_uid].append(book_in_shelf)
+
+        for shelf in shelves:
+            set_committed_value(shelf, 'books_in_shelf', books_in_shelf[shelf.uid])
+
+    @staticmethod
+    def _filter_shelves_query(single_query: bool, tags: bool, only_user: bool, sort_key: str, sort_desc: bool,
+                              keyset: Optional[bool]):
+        user_uid = bindparam('user_uid', type_=models.ShelfRate.user_uid.type)
         user_rate_query = select(models.ShelfRate.shelf_uid, models.ShelfRate.rate.label('userRate')) \
             .filter(models.ShelfRate.user_uid == user_uid) \
             .cte()
 
-        rate_query = select(models.ShelfRate.shelf_uid, func.avg(models.ShelfRate.rate).label('rate')) \
-            .group_by(models.ShelfRate.shelf_uid) \
-            .cte()
-
-        query = select(models.Shelf, rate_query.c.rate, user_rate_query.c.userRate).options(
-            selectinload(models.Shelf.tags),
-            selectinload(models.Shelf.avatar),
-        )
+        if single_query:
+            query = select(
+                models.Shelf.uid,
+                models.Shelf.name,
+                models.Shelf.description,
+                models.Shelf.type,
+                models.Shelf.user_uid,
+                models.Shelf.created_at,
+                models.Shelf.updated_at,
+                models.ShelfStats.rate_avg,
+                user_rate_query.c.userRate,
+                func.coalesce(models.ShelfStats.books_count, 0),
+                func.coalesce(models.ShelfStats.comments_count, 0),
+                models.User.first_name,
+                models.User.surname,
+                *shelf_relations(settings.shelf_preview_books),
+            ).join(models.User, models.User.uid == models.Shelf.user_uid)
+        else:
+            # books in shelf are loaded by _load_books_preview, not the relationship default
+            query = select(models.Shelf, models.ShelfStats, user_rate_query.c.userRate).options(
+                selectinload(models.Shelf.tags),
+                selectinload(models.Shelf.avatar),
+                noload(models.Shelf.books_in_shelf),
+            )
 
         if tags:
-            query = query.filter(models.Shelf.tags.any(models.ShelfTag.name.in_(tags)))
+            query = query.filter(models.Shelf.tags.any(models.ShelfTag.name.in_(bindparam('tags', expanding=True))))
 
-        query = query.order_by(text(sort_by)).limit(limit).offset(offset)
+        if keyset is not None:
+            query = query.filter(keyset_after_params(SHELF_SORT, sort_key, sort_desc, keyset))
+
+        query = query.order_by(*SHELF_SORT.order_by(sort_key, sort_desc)) \
+            .limit(bindparam('limit')) \
+            .offset(bindparam('offset'))
 
         query = query.outerjoin(user_rate_query)
-        query = query.outerjoin(rate_query)
+        query = query.outerjoin(models.ShelfStats, models.ShelfStats.shelf_uid == models.Shelf.uid)
 
         if only_user:
-            if not user:
-                raise RequireUser("When only_user passed, user should be included in query")
-
-            query = query.filter(models.Shelf.user_uid == user.uid)
-
-        raw_shelves = (await self.session.execute(query)).fetchall()
-
-        shelves = []
-        for shelf in raw_shelves:
-            shelf[0].rate = shelf[1]
-            shelf[0].user_rate = shelf[2]
-            shelves.append(shelf[0])
-
-        return shelves
+            query = query.filter(models.Shelf.user_uid == user_uid)
+
+        return query
+
+    @staticmethod
+    def _shelf_row(*columns) -> ShelfRow:
+        *shelf_columns, first_name, surname, avatar, tags, books_in_shelf = columns
+        return ShelfRow(*shelf_columns, UserRow(first_name, surname), avatar, tags, books_in_shelf)
+
+    @staticmethod
+    def _with_stats(shelf: models.Shelf, stats: Optional[models.ShelfStats],
+                    user_rate: Optional[int]) -> models.Shelf:
+        shelf.rate = stats.rate_avg if stats else None
+        shelf.books_count = stats.books_count if stats else 0
+        shelf.comments_count = stats.comments_count if stats else 0
+        shelf.user_rate = user_rate
+        return shelf
 
     async def create_shelf(
             self,
@@ -124,6 +218,9 @@ class ShelfRepository(BaseRepository):
         shelf.tags.extend(shelf_tags_created)
         self.session.add(shelf)
         await self.session.flush()
+        await self.session.execute(shelf_stats_delta(shelf.uid, books_delta=len(books_in_shelf)))
+        if tags_objs:
+            invalidation_bus.publish(self.session, 'tag', 'shelf')
         await self.session.refresh(shelf)
 
         return shelf
@@ -139,31 +236,71 @@ class ShelfRepository(BaseRepository):
 
         return shelf_rate
 
-    async def rate_shelf(self, shelf: models.Shelf, user: models.User, rate: int) -> models.ShelfRate:
-        insert_query = insert(models.ShelfRate) \
+    # rate aggregates of shelf_stats are maintained by the shelf_rate triggers
+    async def rate_shelf(self, shelf: models.Shelf, user: models.User, rate: int) -> Optional[models.ShelfRate]:
+        """Insert the user rate, None when the user has already rated the shelf."""
+        insert_query = pg_insert(models.ShelfRate) \
             .values(user_uid=user.uid, shelf_uid=shelf.uid, rate=rate) \
-            .returning(models.ShelfRate.id, models.ShelfRate.rate, models.ShelfRate.rated_at)
+            .on_conflict_do_nothing(index_elements=[models.ShelfRate.user_uid, models.ShelfRate.shelf_uid]) \
+            .returning(models.ShelfRate.rate, models.ShelfRate.rated_at)
 
-        rate_tuple = (await self.session.execute(insert_query)).first()
-        rate_obj = models.ShelfRate(rate=rate_tuple[1], rated_at=rate_tuple[2])
+        return (await self.session.execute(insert_query)).first()
 
-        return rate_obj
+    async def upsert_rate(self, shelf_uid: UUID, user: models.User, rate: int) -> Optional[models.ShelfRate]:
+        """Set the user rate in one statement, None when the shelf does not exist."""
+        shelf_query = select(
+            literal(user.uid, models.ShelfRate.user_uid.type), models.Shelf.uid, literal(rate), func.now()
+        ).filter(models.Shelf.uid == shelf_uid)
+        insert_query = pg_insert(models.ShelfRate) \
+            .from_select(['user_uid', 'shelf_uid', 'rate', 'rated_at'], shelf_query)
+        upsert_query = insert_query \
+            .on_conflict_do_update(
+                index_elements=[models.ShelfRate.user_uid, models.ShelfRate.shelf_uid],
+                set_={'rate': insert_query.excluded.rate, 'rated_at': insert_query.excluded.rated_at},
+            ) \
+            .returning(models.ShelfRate.rate, models.ShelfRate.rated_at)
+
+        return (await self.session.execute(upsert_query)).first()
 
     async def delete_rate(self, rate):
         delete_query = delete(models.ShelfRate).filter(
             models.ShelfRate.id == rate.id
         )
-
         await self.session.execute(delete_query)
 
     # Comments
-    async def get_comments(self, shelf: models.Shelf) -> list[models.ShelfComment]:
-        query = select(models.ShelfComment) \
-            .filter(models.ShelfComment.shelf_uid == shelf.uid) \
-            .order_by(desc(models.ShelfComment.pub_date)) \
-            .options(selectinload(models.ShelfComment.user))
-
-        return (await self.session.execute(query)).scalars().all()
+    async def get_comments(self, shelf: models.Shelf, limit: int = DEFAULT_COMMENTS_LIMIT,
+                           after: Optional[tuple] = None) -> list[CommentRow]:
+        """A page of the shelf comments, newest first, placed after the (pub_date, id) of after."""
+        shape = ('shelf_comments', keyset_shape(after))
+        query = cached_statement(shape, lambda: self._comments_query(*shape[1:]))
+        params = {'shelf_uid': shelf.uid, 'limit': limit, **keyset_params(after)}
+
+        return [
+            CommentRow(_id, content, pub_date, UserRow(first_name, surname))
+            for _id, content, pub_date, first_name, surname in await self.session.execute(query, params)
+        ]
+
+    @staticmethod
+    def _comments_query(keyset: Optional[bool]):
+        query = select(
+            models.ShelfComment.id,
+            models.ShelfComment.content,
+            models.ShelfComment.pub_date,
+            models.User.first_name,
+            models.User.surname,
+        ) \
+            .join(models.User, models.User.uid == models.ShelfComment.user_uid) \
+            .filter(models.ShelfComment.shelf_uid == bindparam('shelf_uid', type_=models.ShelfComment.shelf_uid.type))
+
+        if keyset is not None:
+            query = query.filter(keyset_after_params(SHELF_COMMENTS_SORT, 'pub_date', True, keyset))
+
+        return query.order_by(*SHELF_COMMENTS_SORT.order_by('pub_date', True)).limit(bindparam('limit'))
+
+    async def get_comments_count(self, shelf: models.Shelf) -> int:
+        query = select(models.ShelfStats.comments_count).filter(models.ShelfStats.shelf_uid == shelf.uid)
+        return (await self.session.execute(query)).scalar() or 0
 
     async def get_comment_by_id(self, comment_id: int) -> models.ShelfComment:
         select_query = select(models.ShelfComment).filter(
@@ -171,22 +308,27 @@ class ShelfRepository(BaseRepository):
         )
         return (await self.session.execute(select_query)).scalars().first()
 
-    async def create_comment(self, user: models.User, shelf: models.Shelf, content: str) -> models.ShelfComment:
+    async def create_comment(self, user: models.User, shelf: models.Shelf, content: str) -> CommentRow:
         insert_query = insert(models.ShelfComment) \
             .values(user_uid=user.uid, shelf_uid=shelf.uid, content=content) \
             .returning(models.ShelfComment.id, models.ShelfComment.content, models.ShelfComment.pub_date)
 
-        comment_tuple = (await self.session.execute(insert_query)).first()
-        comment_obj = models.ShelfComment(id=comment_tuple[0], content=comment_tuple[1], pub_date=comment_tuple[2])
-        comment_obj.user = user
+        # a row, not a ShelfComment, see BookRepository.create_comment
+        _id, content, pub_date = (await self.session.execute(insert_query)).first()
+        comment_obj = CommentRow(_id, content, pub_date, UserRow(user.first_name, user.surname))
+
+        await self.session.execute(shelf_stats_delta(shelf.uid, comments_delta=1))
 
         return comment_obj
 
     async def delete_comment(self, comment: ShelfComment):
         delete_query = delete(models.ShelfComment).filter(
             models.ShelfComment.id == comment.id
-        )
-        await self.session.execute(delete_query)
+        ).returning(models.ShelfComment.shelf_uid)
+
+        shelf_uid = (await self.session.execute(delete_query)).scalar()
+        if shelf_uid is not None:
+            await self.session.execute(shelf_stats_delta(shelf_uid, comments_delta=-1))
 
     # Books
     async def get_book_in_shelf_by_id(self, book_in_shelf_id: int) -> models.BookInShelf:
@@ -209,6 +351,7 @@ class ShelfRepository(BaseRepository):
         )
         self.session.add(book_in_shelf)
         await self.session.flush()
+        await self.session.execute(shelf_stats_delta(shelf.uid, books_delta=1))
         await self.session.refresh(book_in_shelf)
 
         return book_in_shelf
@@ -216,8 +359,11 @@ class ShelfRepository(BaseRepository):
     async def delete_book_in_shelf(self, book_in_shelf: models.BookInShelf):
         delete_query = delete(models.BookInShelf).filter(
             models.BookInShelf.id == book_in_shelf.id
-        )
-        await self.session.execute(delete_query)
+        ).returning(models.BookInShelf.shelf_uid)
+
+        shelf_uid = (await self.session.execute(delete_query)).scalar()
+        if shelf_uid is not None:
+            await self.session.execute(shelf_stats_delta(shelf_uid, books_delta=-1))
 
     async def change_book_in_shelf(self, book_in_shelf: models.BookInShelf, tags: set[str]) -> models.BookInShelf:
         book_in_shelf.tags = []
@@ -228,3 +374,7 @@ class ShelfRepository(BaseRepository):
         await self.session.refresh(book_in_shelf)
 
         return book_in_shelf
+
+    async def rebuild_stats(self):
+        for query in rebuild_shelf_stats():
+            await self.session.execute(query)
@@ -1,31 +1,66 @@
 from typing import Optional
 
-from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
 
+from app.core.config import get_app_settings
 from app.db.queries.tables import User
-from app.models.domain import users as users_
 from app.db.repositories.base import BaseRepository
 from app.db.queries import tables as models
+from app.services.cache import TTLCache
+
+settings = get_app_settings()
+
+# (uid, first_name, surname) of committed users keyed by the JWT subject
+user_cache = TTLCache(max_size=settings.user_cache_max_size, ttl=settings.user_cache_ttl)
 
 
 class UsersRepository(BaseRepository):
     async def get_or_create_user(self, user_uid: str, first_name: Optional[str] = None,
                                  surname: Optional[str] = None) -> User:
-        get_query = select(models.User).filter(models.User.uid == user_uid)
-        user = (await self.session.execute(get_query)).scalars().first()
+        user = self._get_cached_user(user_uid)
+        if user is not None:
+            return user
+
+        user = await self._select_user(user_uid)
         if user is None:
-            _user = users_.User(uid=user_uid, first_name=first_name, surname=surname)
-            insert_query = insert(models.User).values(uid=user_uid, first_name=first_name, surname=surname)
-            await self.session.execute(insert_query)
-            await self.session.commit()
-            user = _user
+            # concurrent first logins of the same user must not fail on the unique uid
+            insert_query = insert(models.User) \
+                .values(uid=user_uid, first_name=first_name, surname=surname) \
+                .on_conflict_do_nothing(index_elements=[models.User.uid]) \
+                .returning(models.User.uid, models.User.first_name, models.User.surname)
+
+            user_tuple = (await self.session.execute(insert_query)).first()
+            if user_tuple is not None:
+                # not committed yet, the next request caches it from the select
+                return models.User(uid=user_tuple[0], first_name=user_tuple[1], surname=user_tuple[2])
+
+            user = await self._select_user(user_uid)
 
         return user
 
     async def get_user_id_exists(self, user_uid: Optional[str]) -> Optional[User]:
         if user_uid is None:
             return None
+
+        user = self._get_cached_user(user_uid)
+        if user is not None:
+            return user
+
+        return await self._select_user(user_uid)
+
+    async def _select_user(self, user_uid: str) -> Optional[User]:
         get_query = select(models.User).filter(models.User.uid == user_uid)
         user = (await self.session.execute(get_query)).scalars().first()
+        if user is not None:
+            user_cache.set(str(user_uid), (user.uid, user.first_name, user.surname))
         return user
+
+    @staticmethod
+    def _get_cached_user(user_uid: str) -> Optional[User]:
+        cached = user_cache.get(str(user_uid))
+        if cached is None:
+            return None
+
+        uid, first_name, surname = cached
+        return models.User(uid=uid, first_name=first_name, surname=surname)
@@ -0,0 +1,69 @@
+"""Read-only records for list endpoints, built straight from result rows.
+
+Unlike ORM instances they skip the identity map and attribute instrumentation;
+the response serializers and pydantic orm_mode read them by attribute alike.
+"""
+from datetime import datetime
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+
+class UserRow(NamedTuple):
+    first_name: Optional[str]
+    surname: Optional[str]
+
+
+class BookRow(NamedTuple):
+    id: int
+    title: str
+    description: Optional[str]
+    annotation: Optional[str]
+    pub_date: datetime
+    created_at: datetime
+    updated_at: datetime
+    publisher_id: Optional[int]
+    rate: Optional[float]
+    user_rate: Optional[int]
+    # json built by app.db.queries.relations.book_relations
+    categories: list
+    authors: list
+    publisher: Optional[dict]
+    tags: list
+    images: list
+
+
+# BookRow followed by its text search rank, the keyset of search result pages
+BookSearchRow = NamedTuple('BookSearchRow', [*BookRow.__annotations__.items(), ('rank', float)])
+
+
+class ShelfRow(NamedTuple):
+    uid: UUID
+    name: str
+    description: Optional[str]
+    type: str
+    user_uid: UUID
+    created_at: datetime
+    updated_at: datetime
+    rate: Optional[float]
+    user_rate: Optional[int]
+    books_count: int
+    comments_count: int
+    user: UserRow
+    # json built by app.db.queries.relations.shelf_relations
+    avatar: Optional[dict]
+    tags: list
+    books_in_shelf: list
+
+
+class FacetRow(NamedTuple):
+    # None for tags, which are keyed by name
+    id: Optional[int]
+    name: str
+    count: int
+
+
+class CommentRow(NamedTuple):
+    id: int
+    content: str
+    pub_date: Optional[datetime]
+    user: UserRow
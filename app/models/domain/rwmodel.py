@@ -1,6 +1,13 @@
 import datetime
+from typing import Any, Callable, Optional
+from uuid import UUID
 
 from pydantic import BaseConfig, BaseModel
+from pydantic.fields import ModelField, SHAPE_LIST, SHAPE_SINGLETON
+
+Serializer = Callable[[Any], Optional[dict]]
+
+_MISSING = object()
 
 
 def convert_datetime_to_realworld(dt: datetime.datetime) -> str:
@@ -14,9 +21,99 @@ def convert_field_to_camel_case(string: str) -> str:
     )
 
 
+_SCALARS: dict[type, Callable[[Any], Any]] = {
+    bool: bool,
+    int: int,
+    float: float,
+    str: str,
+    UUID: str,
+    datetime.datetime: convert_datetime_to_realworld,
+}
+
+_serializers: dict[type, Serializer] = {}
+
+
+def _compile_getter(alias: str, name: str) -> Callable[[Any], Any]:
+    # same lookup order as pydantic: alias first, then the field name
+    if alias == name:
+        def get(obj: Any) -> Any:
+            if type(obj) is dict:
+                return obj.get(name, _MISSING)
+            return getattr(obj, name, _MISSING)
+        return get
+
+    def get_aliased(obj: Any) -> Any:
+        if type(obj) is dict:
+            value = obj.get(alias, _MISSING)
+            return obj.get(name, _MISSING) if value is _MISSING else value
+
+        value = getattr(obj, alias, _MISSING)
+        return getattr(obj, name, _MISSING) if value is _MISSING else value
+
+    return get_aliased
+
+
+def _compile_converter(field: ModelField) -> Callable[[Any], Any]:
+    type_ = field.type_
+    if isinstance(type_, type) and issubclass(type_, BaseModel):
+        convert = get_serializer(type_)
+    else:
+        convert = _SCALARS.get(type_)
+
+    if field.shape == SHAPE_LIST:
+        if convert is None:
+            return lambda value: None if value is None else list(value)
+        return lambda value: None if value is None else [
+            None if item is None else convert(item) for item in value
+        ]
+
+    if field.shape != SHAPE_SINGLETON or convert is None:
+        return lambda value: value
+
+    return lambda value: None if value is None else convert(value)
+
+
+def _compile_serializer(model: type[BaseModel]) -> Serializer:
+    fields = [
+        (field.alias, _compile_getter(field.alias, field.name), _compile_converter(field), field.get_default)
+        for field in model.__fields__.values()
+    ]
+
+    def serialize(obj: Any) -> Optional[dict]:
+        if obj is None:
+            return None
+
+        data = {}
+        for alias, get, convert, get_default in fields:
+            value = get(obj)
+            data[alias] = get_default() if value is _MISSING else convert(value)
+        return data
+
+    return serialize
+
+
+def get_serializer(model: type[BaseModel]) -> Serializer:
+    """Serializer producing the by-alias json data of model straight from ORM objects, rows or dicts.
+
+    It mirrors what FastAPI renders for a response_model without validating the
+    source, so it is only meant for data read back from the database.
+    """
+    serializer = _serializers.get(model)
+    if serializer is None:
+        # registered before compiling so self referencing schemas resolve
+        _serializers[model] = lambda obj: _serializers[model](obj)
+        serializer = _serializers[model] = _compile_serializer(model)
+    return serializer
+
+
 class RWModel(BaseModel):
     class Config(BaseConfig):
         allow_population_by_field_name = True
         json_encoders = {datetime.datetime: convert_datetime_to_realworld}
         alias_generator = convert_field_to_camel_case
         orm_mode = True
+
+    @classmethod
+    def serialize(cls, obj: Any) -> Optional[dict]:
+        """Json data of obj rendered as this model, see get_serializer."""
+        return get_serializer(cls)(obj)
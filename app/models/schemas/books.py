@@ -3,8 +3,9 @@ from typing import Optional
 
 from pydantic import Field
 
-from app.core.const import DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT
-from app.models.domain.books import Book, BookCategory, BookPublisher, BookTag, BookComment, BookAuthor
+from app.core.const import DEFAULT_BOOK_OFFSET, DEFAULT_BOOK_LIMIT, DEFAULT_BOOK_ORDER_BY
+from app.models.domain.books import Book, BookCategory, BookPublisher, BookTag, BookComment, BookAuthor, \
+    BookMinimized
 from app.models.schemas.rwschema import RWSchema
 
 
@@ -33,8 +34,30 @@ class ListOfMinimizedBooksInResponse(RWSchema):
     books: list[BookMinimizedForResponse]
 
 
+class FacetValue(RWSchema):
+    # tags have no id, their name is the value to filter by
+    id: Optional[int]
+    name: str
+    count: int
+
+
+class BookFacets(RWSchema):
+    categories: Optional[list[FacetValue]] = None
+    authors: Optional[list[FacetValue]] = None
+    publishers: Optional[list[FacetValue]] = None
+    tags: Optional[list[FacetValue]] = None
+    # counts only cover the first facet_sample_size matching books
+    truncated: bool = False
+
+
 class ListOfBooksInResponse(RWSchema):
     books: list[BookForResponse]
+    next_cursor: Optional[str] = None
+    facets: Optional[BookFacets] = None
+
+
+class ListOfBookTitlesInResponse(RWSchema):
+    books: list[BookMinimized]
 
 
 class ListOfBookCategoriesInResponse(RWSchema):
@@ -59,7 +82,20 @@ class BooksFilter(RWSchema):
     authors: Optional[list[int]] = None
     categories: Optional[list[int]] = None
     publishers: Optional[list[int]] = None
-    sort_by: Optional[str] = 'created_at DESC'
+    sort_by: Optional[str] = DEFAULT_BOOK_ORDER_BY
+    facets: Optional[list[str]] = None
 
     limit: int = Field(DEFAULT_BOOK_LIMIT, ge=1)
     offset: int = Field(DEFAULT_BOOK_OFFSET, ge=0)
+    after: Optional[tuple] = None
+
+
+class BooksSearch(RWSchema):
+    q: str
+    tags: Optional[list[str]] = None
+    authors: Optional[list[int]] = None
+    categories: Optional[list[int]] = None
+    publishers: Optional[list[int]] = None
+
+    limit: int = Field(DEFAULT_BOOK_LIMIT, ge=1)
+    after: Optional[tuple] = None
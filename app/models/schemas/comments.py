@@ -1,6 +1,9 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
+from pydantic import Field
+
+from app.core.const import DEFAULT_COMMENTS_LIMIT
 from app.models.domain.users import User
 from app.models.schemas.rwschema import RWSchema
 
@@ -9,11 +12,14 @@ class CommentForResponse(RWSchema):
     id: int
     user: User
     content: str
-    pub_date: datetime
+    # the column is nullable, it only defaults to now()
+    pub_date: Optional[datetime]
 
 
 class ListOfCommentsInResponse(RWSchema):
     comments: List[CommentForResponse]
+    comments_count: int = 0
+    next_cursor: Optional[str] = None
 
 
 class CommentInResponse(RWSchema):
@@ -22,3 +28,8 @@ class CommentInResponse(RWSchema):
 
 class CommentInCreate(RWSchema):
     content: str
+
+
+class CommentsPage(RWSchema):
+    limit: int = Field(DEFAULT_COMMENTS_LIMIT, ge=1)
+    after: Optional[tuple] = None
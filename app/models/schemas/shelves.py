@@ -4,6 +4,8 @@ from uuid import UUID
 
 from pydantic import Field
 
+from app.core.const import DEFAULT_SHELF_ORDER_BY
+
 from app.models.domain.shelves import Shelf, ShelfImage, ShelfTag, BookInShelf
 from app.models.domain.users import User
 from app.models.schemas.rwschema import RWSchema
@@ -31,6 +33,8 @@ class ListOfShelvesForResponse(RWSchema):
     user: User
     rate: Optional[float]
     user_rate: Optional[int]
+    books_count: int = 0
+    comments_count: int = 0
     books_in_shelf: list[BookInShelf]
     tags: list[ShelfTag]
     created_at: datetime
@@ -39,6 +43,7 @@ class ListOfShelvesForResponse(RWSchema):
 
 class ListOfShelvesInResponse(RWSchema):
     shelves: list[ListOfShelvesForResponse]
+    next_cursor: Optional[str] = None
 
 
 class ShelfForCreate(RWSchema):
@@ -80,7 +85,8 @@ class BookInShelfInUpdate(RWSchema):
 
 class ShelfFilter(RWSchema):
     tags: Optional[list[str]] = None
-    sort_by: Optional[str] = 'created_at DESC'
+    sort_by: Optional[str] = DEFAULT_SHELF_ORDER_BY
 
     limit: int = Field(DEFAULT_SHELF_LIMIT, ge=1)
     offset: int = Field(DEFAULT_SHELF_OFFSET, ge=0)
+    after: Optional[tuple] = None
@@ -0,0 +1,13 @@
+from app.models.schemas.rwschema import RWSchema
+
+
+class CacheStats(RWSchema):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class CacheStatsInResponse(RWSchema):
+    caches: dict[str, CacheStats]
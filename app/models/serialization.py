@@ -0,0 +1,10 @@
+from typing import Any, Type
+
+import orjson
+
+from app.models.domain.rwmodel import RWModel
+
+
+def dump_json(model: Type[RWModel], obj: Any) -> bytes:
+    """obj rendered as model and encoded to json bytes."""
+    return orjson.dumps(model.serialize(obj))
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.core.config import get_app_settings
+
+settings = get_app_settings()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ttl seconds after being set.
+
+    set accepts a per-entry ttl overriding the cache default. The time of the
+    last invalidation of each key is kept, see invalidated_within.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float]):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._invalidated_at: OrderedDict = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> Any:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+        return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        now = time.monotonic()
+        for key in keys:
+            self._data.pop(key, None)
+            self._invalidated_at[key] = now
+            self._invalidated_at.move_to_end(key)
+
+        while len(self._invalidated_at) > self.max_size:
+            self._invalidated_at.popitem(last=False)
+
+    def invalidated_within(self, key: Hashable, seconds: float) -> bool:
+        invalidated_at = self._invalidated_at.get(key)
+        return invalidated_at is not None and time.monotonic() - invalidated_at < seconds
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
+
+
+BOOK_TAGS = 'books:tags'
+BOOK_PUBLISHERS = 'books:publishers'
+BOOK_AUTHORS = 'books:authors'
+BOOK_CATEGORIES = 'books:categories'
+SHELF_TAGS = 'shelves:tags'
+
+# Serialized responses of the reference data endpoints
+reference_cache = TTLCache(max_size=settings.reference_cache_max_size, ttl=settings.reference_cache_ttl)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Callable, Optional
+
+import asyncpg
+from loguru import logger
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import get_app_settings
+from app.services.cache import reference_cache, BOOK_TAGS, SHELF_TAGS
+
+settings = get_app_settings()
+
+INVALIDATION_CHANNEL = 'jbook_invalidation'
+
+# session.info key of the events published in the session transaction
+PENDING_EVENTS = 'invalidation_events'
+
+Handler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """Fans entity change events out to every replica over postgres LISTEN/NOTIFY.
+
+    Handlers are called with the changed key, or with None when every cached
+    entry of the entity has to go (e.g. after the listener reconnected and
+    notifications could have been missed).
+    """
+
+    def __init__(self, channel: str = INVALIDATION_CHANNEL, health_check_interval: float = 30,
+                 reconnect_delay: float = 1, max_reconnect_delay: float = 30):
+        self.channel = channel
+        self.health_check_interval = health_check_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, entity: str, handler: Handler) -> None:
+        self._handlers[entity].append(handler)
+
+    def dispatch(self, entity: str, key: Optional[str] = None) -> None:
+        for handler in self._handlers.get(entity, ()):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler failed for {0}:{1}", entity, key)
+
+    def dispatch_all(self) -> None:
+        for entity in list(self._handlers):
+            self.dispatch(entity)
+
+    def publish(self, session: AsyncSession, entity: str, key: Optional[str] = None) -> None:
+        """Queue the event on session, flush sends it once the session transaction committed."""
+        session.info.setdefault(PENDING_EVENTS, {})[(entity, key)] = None
+
+    async def flush(self, session: AsyncSession) -> None:
+        """Evict locally and notify the other replicas of the events session queued.
+
+        Called after the commit, so no reader refills a cache with data of an
+        uncommitted (or rolled back) transaction in between.
+        """
+        events = session.info.pop(PENDING_EVENTS, None)
+        if not events:
+            return
+
+        for entity, key in events:
+            self.dispatch(entity, key)
+
+        notifications = [
+            func.pg_notify(self.channel, json.dumps({'entity': entity, 'key': key}))
+            for entity, key in events
+        ]
+        try:
+            async with session.begin():
+                await session.execute(select(*notifications))
+        except (OSError, SQLAlchemyError):
+            logger.exception("Could not notify invalidations: {0}", list(events))
+
+    async def start(self, dsn: str) -> None:
+        self._task = asyncio.create_task(self._listen(dsn))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            event = json.loads(payload)
+            self.dispatch(event['entity'], event.get('key'))
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Malformed invalidation payload: {0}", payload)
+
+    async def _listen(self, dsn: str) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except Exception as error:
+                logger.warning("Invalidation listener can't connect: {0}, retry in {1}s", error, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            delay = self.reconnect_delay
+            try:
+                await self._serve(connection)
+            except Exception as error:
+                # anything escaping would end the task and every later invalidation with it, e.g.
+                # asyncpg.InterfaceError on a closed connection is no PostgresError. CancelledError
+                # is no Exception, so stop() still ends the loop
+                logger.warning("Invalidation listener lost connection: {0!r}", error)
+            finally:
+                if not connection.is_closed():
+                    connection.terminate()
+
+            logger.info("Invalidation listener reconnects in {0}s", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _serve(self, connection: asyncpg.Connection) -> None:
+        lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: lost.set())
+        await connection.add_listener(self.channel, self._on_notification)
+
+        # notifications sent while we were not listening are gone
+        self.dispatch_all()
+        logger.info("Listening for cache invalidations on {0}", self.channel)
+
+        while not lost.is_set():
+            try:
+                await asyncio.wait_for(lost.wait(), timeout=self.health_check_interval)
+            except asyncio.TimeoutError:
+                await connection.fetchval('SELECT 1', timeout=self.health_check_interval)
+
+
+def _invalidate_tags(key: Optional[str]) -> None:
+    if key in (None, 'book'):
+        reference_cache.invalidate(BOOK_TAGS)
+    if key in (None, 'shelf'):
+        reference_cache.invalidate(SHELF_TAGS)
+
+
+invalidation_bus = InvalidationBus()
+invalidation_bus.subscribe('tag', _invalidate_tags)
@@ -0,0 +1,281 @@
+"""Opt-in benchmarks, run with RUN_BENCHMARKS=1 python -m pytest -s tests -k benchmark
+
+The ones reading the database seed their catalog inside the transaction of
+run_in_session, which is rolled back, so nothing they insert outlives them.
+Sizes are overridable through BENCHMARK_<NAME> environment variables.
+"""
+import contextlib
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Iterator, NamedTuple
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+requires_benchmarks = pytest.mark.skipif(os.environ.get('RUN_BENCHMARKS') != '1',
+                                         reason="set RUN_BENCHMARKS=1 to run benchmarks")
+
+# words titles, descriptions and names are made of, so searches and prefixes have realistic selectivity
+WORDS = (
+    'silent river winter garden shadow empire stone glass forest ocean night letter house road fire '
+    'iron crown storm mountain city island secret memory summer light dark broken hidden last first '
+    'little great golden black white red blue green wild lost distant ancient modern quiet burning '
+    'falling rising endless frozen northern southern eastern western king queen soldier doctor child '
+    'mother father sister brother stranger traveller hunter thief poet painter witch dragon wolf raven '
+    'fox horse bird tree flower sea sky star moon sun rain snow wind cloud bridge tower castle village '
+    'market harbour library museum school church palace prison kitchen window door mirror clock map '
+    'book song dance game war peace love death life time dream journey return escape promise truth'
+).split()
+
+
+def benchmark_size(name: str, default: int) -> int:
+    return int(os.environ.get(f'BENCHMARK_{name}', default))
+
+
+class Timings(NamedTuple):
+    """Wall clock samples of a benchmarked call, in milliseconds."""
+    samples: list[float]
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(0.5)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(0.99)
+
+    @property
+    def mean(self) -> float:
+        return sum(self.samples) / len(self.samples)
+
+    def __str__(self) -> str:
+        return f'p50 {self.p50:8.3f} ms  p99 {self.p99:8.3f} ms  mean {self.mean:8.3f} ms  n={len(self.samples)}'
+
+
+def measure(run: Callable[[], Any], repeat: int, warmup: int = 3) -> Timings:
+    for _ in range(warmup):
+        run()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return Timings(samples)
+
+
+async def measure_async(run: Callable[[], Awaitable[Any]], repeat: int, warmup: int = 3) -> Timings:
+    for _ in range(warmup):
+        await run()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return Timings(samples)
+
+
+def report(title: str, rows: dict[str, Any]) -> None:
+    print(f'\n== {title}')
+    width = max(map(len, rows), default=0)
+    for name, value in rows.items():
+        print(f'  {name:<{width}}  {value}')
+
+
+@contextlib.contextmanager
+def captured_statements(session: AsyncSession) -> Iterator[list[tuple[str, Any]]]:
+    """(statement, parameters) of everything session sends to the driver inside the block."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = session.bind.sync_engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+async def explain(session: AsyncSession, statement: str, parameters: Any) -> str:
+    connection = await session.connection()
+    result = await connection.exec_driver_sql(f'EXPLAIN (ANALYZE, BUFFERS) {statement}', parameters)
+    return '\n'.join(row[0] for row in result)
+
+
+class Catalog(NamedTuple):
+    books: int
+    users: int
+    shelves: int
+
+
+# per row triggers (stats, search vector) are switched off while seeding and their work done in bulk after
+SEEDED_TABLES = ('book', 'book_rate', '_m2m_book_book_author', '_m2m_book_book_tag')
+
+SEED_CATALOG = [
+    '''
+    INSERT INTO jbook."user" (uid, first_name, surname)
+    SELECT md5('user' || i)::uuid, 'User', 'N' || i FROM generate_series(1, :users) i
+    ''',
+    '''
+    INSERT INTO jbook.book_author (name)
+    SELECT initcap(w[1 + i % cardinality(w)]) || ' ' || initcap(w[1 + (i * 7) % cardinality(w)]) || ' ' || i
+    FROM generate_series(1, :authors) i, string_to_array(:words, ' ') w
+    ''',
+    '''
+    INSERT INTO jbook.book_publisher (name)
+    SELECT initcap(w[1 + i % cardinality(w)]) || ' Press ' || i
+    FROM generate_series(1, :publishers) i, string_to_array(:words, ' ') w
+    ''',
+    '''
+    INSERT INTO jbook.book_category (name, popularity)
+    SELECT 'category ' || i, i FROM generate_series(1, :categories) i
+    ''',
+    '''
+    INSERT INTO jbook.book_tag (name)
+    SELECT w[1 + i % cardinality(w)] || '-' || i
+    FROM generate_series(1, :tags) i, string_to_array(:words, ' ') w
+    ''',
+    '''
+    INSERT INTO jbook.book (title, description, annotation, pub_date, created_at, publisher_id)
+    SELECT initcap(w[1 + (i * 13) % cardinality(w)] || ' ' || w[1 + (i * 31) % cardinality(w)]
+                   || ' ' || w[1 + (i * 71) % cardinality(w)]),
+           w[1 + (i * 17) % cardinality(w)] || ' ' || w[1 + (i * 19) % cardinality(w)] || ' '
+               || w[1 + (i * 23) % cardinality(w)] || ' ' || w[1 + (i * 29) % cardinality(w)],
+           w[1 + (i * 37) % cardinality(w)] || ' ' || w[1 + (i * 41) % cardinality(w)],
+           timestamp '1950-01-01' + (i % 25000) * interval '1 day',
+           now() - (i % 100000) * interval '1 minute',
+           p.ids[1 + i % cardinality(p.ids)]
+    FROM generate_series(1, :books) i, string_to_array(:words, ' ') w,
+         (SELECT array_agg(id ORDER BY id) AS ids FROM jbook.book_publisher) p
+    ''',
+    '''
+    INSERT INTO jbook._m2m_book_book_author (book_id, book_author_id)
+    SELECT b.id, a.ids[1 + (b.id * 7 + k) % cardinality(a.ids)]
+    FROM jbook.book b, (SELECT array_agg(id ORDER BY id) AS ids FROM jbook.book_author) a, generate_series(0, 1) k
+    WHERE b.id > :after_book AND (k = 0 OR b.id % 3 = 0)
+    ''',
+    '''
+    INSERT INTO jbook._m2m_book_book_category (book_id, category_id)
+    SELECT b.id, c.ids[1 + b.id % cardinality(c.ids)]
+    FROM jbook.book b, (SELECT array_agg(id ORDER BY id) AS ids FROM jbook.book_category) c
+    WHERE b.id > :after_book
+    ''',
+    '''
+    INSERT INTO jbook._m2m_book_book_tag (book_id, book_tag)
+    SELECT b.id, t.names[1 + (b.id * 11 + k * 5) % cardinality(t.names)]
+    FROM jbook.book b, (SELECT array_agg(name ORDER BY name) AS names FROM jbook.book_tag) t, generate_series(0, 1) k
+    WHERE b.id > :after_book
+    ''',
+    '''
+    INSERT INTO jbook.book_image (src, book_id, alt_text, is_main)
+    SELECT '/covers/' || id || '.png', id, 'cover', true FROM jbook.book WHERE id > :after_book
+    ''',
+    '''
+    INSERT INTO jbook.book_rate (book_id, user_uid, rate, rated_at)
+    SELECT b.id, md5('user' || (1 + (b.id * 13 + k) % :users))::uuid, 1 + (b.id + k) % 5, now()
+    FROM jbook.book b, generate_series(0, 2) k
+    WHERE b.id > :after_book AND b.id % 4 <> 0
+    ''',
+    '''
+    INSERT INTO jbook.book_comment (book_id, user_uid, content, pub_date)
+    SELECT b.id, md5('user' || (1 + (b.id + k) % :users))::uuid, 'comment ' || k,
+           now() - (b.id % 1000 + k) * interval '1 minute'
+    FROM jbook.book b, generate_series(1, 3) k
+    WHERE b.id > :after_book AND b.id % 2 = 0
+    ''',
+    '''
+    INSERT INTO jbook.book_stats (book_id, rate_sum, rate_count, rate_avg, last_rated_at, comments_count)
+    SELECT b.id, coalesce(r.rate_sum, 0), coalesce(r.rate_count, 0), r.rate_avg, r.last_rated_at,
+           coalesce(c.count, 0)
+    FROM jbook.book b
+    LEFT JOIN (SELECT book_id, sum(rate) AS rate_sum, count(*) AS rate_count, avg(rate) AS rate_avg,
+                      max(rated_at) AS last_rated_at
+               FROM jbook.book_rate GROUP BY book_id) r ON r.book_id = b.id
+    LEFT JOIN (SELECT book_id, count(*) FROM jbook.book_comment GROUP BY book_id) c ON c.book_id = b.id
+    WHERE b.id > :after_book
+    ON CONFLICT (book_id) DO NOTHING
+    ''',
+    '''
+    UPDATE jbook.book b
+    SET search_vector = jbook.book_search_vector(b.id, b.title, b.description, b.annotation)
+    WHERE b.id > :after_book
+    ''',
+    '''
+    INSERT INTO jbook.shelf_tag (name)
+    SELECT 'shelf-' || w[1 + i % cardinality(w)] || '-' || i
+    FROM generate_series(1, 50) i, string_to_array(:words, ' ') w
+    ''',
+    '''
+    INSERT INTO jbook.shelf (uid, name, description, type, user_uid, created_at)
+    SELECT md5('shelf' || i)::uuid, initcap(w[1 + (i * 3) % cardinality(w)]) || ' shelf ' || i, 'benchmark',
+           CASE WHEN i % 5 = 0 THEN 'private' ELSE 'public' END,
+           md5('user' || (1 + i % :users))::uuid, now() - i * interval '1 minute'
+    FROM generate_series(1, :shelves) i, string_to_array(:words, ' ') w
+    ''',
+    '''
+    INSERT INTO jbook._m2m_shelf_shelf_tag (shelf_uid, shelf_tag)
+    SELECT s.uid, t.names[1 + abs(hashtext(s.uid::text)) % cardinality(t.names)]
+    FROM jbook.shelf s, (SELECT array_agg(name ORDER BY name) AS names FROM jbook.shelf_tag WHERE name LIKE 'shelf-%') t
+    WHERE s.description = 'benchmark'
+    ''',
+    '''
+    INSERT INTO jbook.book_in_shelf (book_id, shelf_uid)
+    SELECT b.id, s.uid
+    FROM jbook.shelf s
+    CROSS JOIN generate_series(1, 20) k
+    CROSS JOIN (SELECT min(id) AS first, max(id) - min(id) + 1 AS span FROM jbook.book WHERE id > :after_book) r
+    JOIN jbook.book b ON b.id = r.first + (abs(hashtext(s.uid::text)) + k * 97) % r.span
+    WHERE s.description = 'benchmark'
+    ''',
+    '''
+    INSERT INTO jbook.shelf_comment (shelf_uid, user_uid, content, pub_date)
+    SELECT s.uid, s.user_uid, 'comment ' || k, now() - k * interval '1 minute'
+    FROM jbook.shelf s, generate_series(1, 5) k
+    WHERE s.description = 'benchmark'
+    ''',
+    '''
+    INSERT INTO jbook.shelf_stats (shelf_uid, books_count, comments_count)
+    SELECT uid, 20, 5 FROM jbook.shelf WHERE description = 'benchmark'
+    ON CONFLICT (shelf_uid) DO NOTHING
+    ''',
+]
+
+
+async def seed_catalog(session: AsyncSession, books: int, users: int = 2000, shelves: int = 5000,
+                       authors: int = 0, publishers: int = 0, tags: int = 0) -> Catalog:
+    """Generate a catalog of books with authors, tags, images, rates, comments and shelves, then ANALYZE it."""
+    params = {
+        'books': books,
+        'users': users,
+        'shelves': shelves,
+        'authors': authors or max(100, books // 20),
+        'publishers': publishers or max(20, books // 500),
+        'categories': 40,
+        'tags': tags or max(200, books // 100),
+        'words': ' '.join(WORDS),
+        'after_book': (await session.execute(text('SELECT coalesce(max(id), 0) FROM jbook.book'))).scalar(),
+    }
+    for table in SEEDED_TABLES:
+        await session.execute(text(f'ALTER TABLE jbook.{table} DISABLE TRIGGER USER'))
+    for statement in SEED_CATALOG:
+        await session.execute(text(statement), {key: value for key, value in params.items() if f':{key}' in statement})
+    for table in SEEDED_TABLES:
+        await session.execute(text(f'ALTER TABLE jbook.{table} ENABLE TRIGGER USER'))
+
+    await session.execute(text('ANALYZE'))
+    return Catalog(books=books, users=users, shelves=shelves)
+
+
+async def random_ids(session: AsyncSession, query: str, count: int, seed: int = 0) -> list:
+    """count values of the first column of query, sampled with a fixed seed."""
+    values = (await session.execute(text(query))).scalars().all()
+    return random.Random(seed).choices(values, k=count)
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, TypeVar
+
+os.environ.setdefault('APP_ENV', 'test')
+os.environ.setdefault('INVALIDATION_BUS_ENABLED', 'false')
+
+import asyncpg  # noqa: E402
+import jwt  # noqa: E402
+import pytest  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+from app.core.config import get_app_settings  # noqa: E402
+from app.main import get_application  # noqa: E402
+
+settings = get_app_settings()
+
+T = TypeVar('T')
+
+
+def _database_available() -> bool:
+    async def ping() -> None:
+        connection = await asyncpg.connect(settings.asyncpg_dsn, timeout=2)
+        await connection.close()
+
+    try:
+        asyncio.run(ping())
+    except (OSError, asyncpg.PostgresError, asyncio.TimeoutError):
+        return False
+    return True
+
+
+# the tests run against the migrated database of DATABASE_URL
+requires_database = pytest.mark.skipif(not _database_available(), reason="test database is not reachable")
+
+
+def run_in_session(work: Callable[[AsyncSession], Awaitable[T]], commit: bool = False) -> T:
+    """Run work in a transaction of its own, rolled back unless commit."""
+    async def run() -> T:
+        engine = create_async_engine(settings.database_url)
+        try:
+            async with AsyncSession(engine) as session:
+                result = await work(session)
+                if commit:
+                    await session.commit()
+                return result
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def client() -> TestClient:
+    with TestClient(get_application()) as client:
+        yield client
+
+
+@pytest.fixture
+def user_uid() -> uuid.UUID:
+    return uuid.uuid4()
+
+
+@pytest.fixture
+def auth_headers(user_uid: uuid.UUID) -> dict:
+    claims = {
+        'sub': str(user_uid),
+        'user': {'first_name': 'Test', 'surname': 'User'},
+        'type': 'access',
+        'exp': int(time.time()) + 600,
+    }
+    token = jwt.encode(claims, settings.authjwt_secret_key, algorithm=settings.authjwt_algorithm)
+    if isinstance(token, bytes):
+        token = token.decode()
+    return {settings.authjwt_header_name: f'{settings.authjwt_header_type} {token}'}
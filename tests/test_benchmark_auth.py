@@ -0,0 +1,52 @@
+"""Auth overhead per request of the verified token cache, no database needed."""
+import asyncio
+
+import jwt
+from starlette.requests import Request
+
+from app.core.auth import JWTPossible, JWTRequired, verified_tokens
+from tests.benchmark import measure_async, report, requires_benchmarks
+from tests.conftest import settings
+
+pytestmark = requires_benchmarks
+
+REPEAT = 2000
+
+
+def _request(headers: dict) -> Request:
+    return Request({'type': 'http', 'headers': [(name.lower().encode(), value.encode())
+                                                for name, value in headers.items()]})
+
+
+def test_verified_token_cache(auth_headers):
+    request = _request(auth_headers)
+    token = JWTPossible.get_token_from_header(request.headers)
+    possible, required = JWTPossible(), JWTRequired()
+
+    async def uncached() -> None:
+        # what a request paid before: JWTPossible and AuthJWT each verified the token
+        for _ in range(2):
+            jwt.decode(token, settings.authjwt_secret_key, algorithms=[settings.authjwt_algorithm])
+
+    async def cold() -> None:
+        verified_tokens.clear()
+        await possible(request)
+        await required(request)
+
+    async def cached() -> None:
+        await possible(request)
+        await required(request)
+
+    async def run() -> dict:
+        assert await required(request) == jwt.decode(token, settings.authjwt_secret_key,
+                                                     algorithms=[settings.authjwt_algorithm])
+        return {
+            'two jwt.decode': await measure_async(uncached, REPEAT),
+            'cache miss': await measure_async(cold, REPEAT),
+            'cache hit': await measure_async(cached, REPEAT),
+        }
+
+    try:
+        report('JWTPossible and JWTRequired of one request', asyncio.run(run()))
+    finally:
+        verified_tokens.clear()
@@ -0,0 +1,63 @@
+"""Autocomplete latency on 100k names per table (BENCHMARK_AUTOCOMPLETE_NAMES).
+
+Prefixes and misspelt names of three characters or more must answer within a
+5 ms p99. pg_trgm cannot take one or two characters to its index, those are
+scans of the table and only reported.
+"""
+import random
+
+from app.db.repositories.books.authors import BookAuthorRepository
+from app.db.repositories.books.books import BookRepository
+from app.db.repositories.books.publishers import BookPublisherRepository
+from app.db.repositories.books.tags import BookTagsRepository
+from tests.benchmark import benchmark_size, measure_async, random_ids, report, requires_benchmarks, seed_catalog
+from tests.conftest import requires_database, run_in_session
+
+pytestmark = [requires_database, requires_benchmarks]
+
+REPEAT = 200
+P99_MS = 5
+
+
+def _typo(name: str, rng: random.Random) -> str:
+    """name with two neighbouring letters of its first word swapped."""
+    word, _, rest = name.partition(' ')
+    if len(word) < 3:
+        return name
+    i = rng.randrange(1, len(word) - 1)
+    return ' '.join(filter(None, [word[:i] + word[i + 1] + word[i] + word[i + 2:], rest]))
+
+
+def test_autocomplete_p99_on_100k_names():
+    async def work(session) -> None:
+        names = benchmark_size('AUTOCOMPLETE_NAMES', 100_000)
+        await seed_catalog(session, books=names, shelves=0, authors=names, publishers=names, tags=names)
+
+        cases = [
+            ('titles', BookRepository(session).autocomplete_titles, 'SELECT title FROM jbook.book'),
+            ('authors', BookAuthorRepository(session).autocomplete_authors, 'SELECT name FROM jbook.book_author'),
+            ('publishers', BookPublisherRepository(session).autocomplete_publishers,
+             'SELECT name FROM jbook.book_publisher'),
+            ('tags', BookTagsRepository(session).autocomplete_tags, 'SELECT name FROM jbook.book_tag'),
+        ]
+        rng = random.Random(0)
+        slow = []
+        for table, autocomplete, sample_query in cases:
+            samples = await random_ids(session, sample_query, REPEAT + 3)
+            queries = {
+                '1-2 characters': [name[:rng.randint(1, 2)].lower() for name in samples],
+                'prefix': [name[:rng.randint(3, 8)].lower() for name in samples],
+                'typo': [_typo(name, rng) for name in samples],
+            }
+
+            timings = {}
+            for kind, qs in queries.items():
+                qs = iter(qs)
+                timings[kind] = await measure_async(lambda: autocomplete(next(qs)), REPEAT)
+            report(f'autocomplete {table}', timings)
+
+            slow += [f'{table} {kind}: {timings[kind]}' for kind in ('prefix', 'typo') if timings[kind].p99 >= P99_MS]
+
+        assert not slow, f'p99 over {P99_MS} ms: {slow}'
+
+    run_in_session(work)
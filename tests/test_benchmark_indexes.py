@@ -0,0 +1,106 @@
+"""EXPLAIN plans and latency of the repository reads served by the lookup indexes of 8b2d61f0c3a7.
+
+Each case runs against the seeded catalog with its indexes, then again with them
+dropped inside a savepoint, which restores them afterwards. Selective lookups
+assert that their plan reads the index. The category and shelf type filters are
+only reported: with few distinct values the planner may rightly walk the sort
+index instead. ix_book_rate_book_id is not listed, no repository method reads
+book_rate by book_id alone, it backs the foreign key checks of book deletes.
+"""
+from typing import Awaitable, Callable, NamedTuple
+
+from sqlalchemy import text
+
+from app.db.queries import tables as models
+from app.db.repositories.books.books import BookRepository
+from app.db.repositories.shelves.shelves import ShelfRepository
+from tests.benchmark import benchmark_size, captured_statements, explain, measure_async, random_ids, report, \
+    requires_benchmarks, seed_catalog
+from tests.conftest import requires_database, run_in_session
+
+pytestmark = [requires_database, requires_benchmarks]
+
+REPEAT = 50
+
+
+class Case(NamedTuple):
+    name: str
+    indexes: tuple[str, ...]
+    asserted: bool
+    # builds the call of one sample out of the repositories and the sampled key
+    call: Callable[[BookRepository, ShelfRepository, object], Awaitable]
+    sample_query: str
+
+
+CASES = [
+    Case('filter_books by author', ('ix_m2m_book_book_author_book_author_id',), True,
+         lambda books, shelves, key: books.filter_books(authors=[key]),
+         'SELECT id FROM jbook.book_author'),
+    Case('filter_books by tag', ('ix_m2m_book_book_tag_book_tag',), True,
+         lambda books, shelves, key: books.filter_books(tags=[key]),
+         'SELECT name FROM jbook.book_tag'),
+    Case('filter_books by category', ('ix_m2m_book_book_category_category_id',), False,
+         lambda books, shelves, key: books.filter_books(categories=[key]),
+         'SELECT id FROM jbook.book_category'),
+    Case('book get_comments', ('ix_book_comment_book_id_pub_date_id',), True,
+         lambda books, shelves, key: books.get_comments(models.Book(id=key)),
+         'SELECT book_id FROM jbook.book_comment'),
+    Case('shelf get_comments', ('ix_shelf_comment_shelf_uid_pub_date_id',), True,
+         lambda books, shelves, key: shelves.get_comments(models.Shelf(uid=key)),
+         "SELECT uid FROM jbook.shelf WHERE description = 'benchmark'"),
+    Case('filter_shelves of a user', ('ix_shelf_user_uid', 'ix_book_in_shelf_shelf_uid_id'), True,
+         lambda books, shelves, key: shelves.filter_shelves(tags=None, sort_by='-created_at',
+                                                            user=models.User(uid=key), only_user=True),
+         "SELECT user_uid FROM jbook.shelf WHERE description = 'benchmark'"),
+    Case('filter_shelves by tag', ('ix_m2m_shelf_shelf_tag_shelf_tag',), True,
+         lambda books, shelves, key: shelves.filter_shelves(tags=[key], sort_by='-created_at'),
+         "SELECT name FROM jbook.shelf_tag WHERE name LIKE 'shelf-%'"),
+    Case('public filter_shelves', ('ix_shelf_type_created_at',), False,
+         lambda books, shelves, key: shelves.filter_shelves(tags=None, sort_by='-created_at'),
+         'SELECT 1'),
+]
+
+
+async def _plans(session, run: Callable[[], Awaitable]) -> str:
+    with captured_statements(session) as statements:
+        await run()
+    return '\n\n'.join([await explain(session, statement, parameters) for statement, parameters in statements])
+
+
+def test_lookup_indexes_serve_repository_reads():
+    async def work(session) -> None:
+        await seed_catalog(session, books=benchmark_size('INDEX_BOOKS', 200_000))
+        books, shelves = BookRepository(session), ShelfRepository(session)
+
+        for case in CASES:
+            keys = iter(await random_ids(session, case.sample_query, REPEAT * 3 + 10))
+
+            async def run():
+                return await case.call(books, shelves, next(keys))
+
+            with_indexes = await _plans(session, run)
+            timings_with = await measure_async(run, REPEAT)
+
+            savepoint = await session.begin_nested()
+            for index in case.indexes:
+                await session.execute(text(f'DROP INDEX jbook.{index}'))
+            without_indexes = await _plans(session, run)
+            timings_without = await measure_async(run, REPEAT)
+            await savepoint.rollback()
+
+            report(case.name, {'without': timings_without, 'with': timings_with})
+            print(f'-- plan without {", ".join(case.indexes)}\n{without_indexes}')
+            print(f'-- plan with {", ".join(case.indexes)}\n{with_indexes}')
+
+            if case.asserted:
+                for index in case.indexes:
+                    assert index in with_indexes, f'{case.name} does not read {index}'
+
+        # the dropped indexes are back for whatever runs next in this transaction
+        restored = (await session.execute(
+            text("SELECT count(*) FROM pg_indexes WHERE schemaname = 'jbook' AND indexname = ANY(:names)"),
+            {'names': [index for case in CASES for index in case.indexes]},
+        )).scalar()
+        assert restored == sum(len(case.indexes) for case in CASES)
+
+    run_in_session(work)
@@ -0,0 +1,88 @@
+"""List pages built as rows against ORM instances, on a seeded catalog (BENCHMARK_LIST_BOOKS).
+
+single_query_lists switches filter_books and filter_shelves between the two.
+The identity map is emptied before each call, as a request starts with a
+fresh session.
+"""
+import tracemalloc
+from typing import Awaitable, Callable
+
+from app.db.repositories.books.books import BookRepository
+from app.db.repositories.shelves.shelves import ShelfRepository
+from tests.benchmark import benchmark_size, captured_statements, measure_async, report, requires_benchmarks, seed_catalog
+from tests.conftest import requires_database, run_in_session, settings
+
+pytestmark = [requires_database, requires_benchmarks]
+
+REPEAT = 30
+PAGE_SIZES = [40, 500]
+
+
+async def _peak_memory(run: Callable[[], Awaitable], repeat: int) -> float:
+    """Mean peak of memory allocated while run builds its page, in KiB."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            page = await run()
+            peaks.append(tracemalloc.get_traced_memory()[1] - start)
+            del page
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024
+
+
+def _pages(session) -> dict[str, Callable[[int], Callable[[], Awaitable]]]:
+    books, shelves = BookRepository(session), ShelfRepository(session)
+
+    def fresh(call):
+        async def run():
+            session.expunge_all()
+            return await call()
+        return run
+
+    return {
+        'filter_books': lambda size: fresh(lambda: books.filter_books(limit=size)),
+        'filter_shelves': lambda size: fresh(lambda: shelves.filter_shelves(tags=None, sort_by='-created_at',
+                                                                           limit=size)),
+    }
+
+
+def test_rows_against_orm_instances(monkeypatch):
+    async def work(session) -> None:
+        await seed_catalog(session, books=benchmark_size('LIST_BOOKS', 20_000))
+        for name, page in _pages(session).items():
+            for size in PAGE_SIZES:
+                timings, memory = {}, {}
+                for single_query_lists, mode in [(True, 'rows'), (False, 'orm')]:
+                    monkeypatch.setattr(settings, 'single_query_lists', single_query_lists)
+                    run = page(size)
+                    assert len(await run()) == size
+                    timings[mode] = await measure_async(run, REPEAT)
+                    memory[mode] = f'{await _peak_memory(run, 5):10.1f} KiB peak'
+                report(f'{name} of {size}, latency', timings)
+                report(f'{name} of {size}, memory', memory)
+
+    run_in_session(work)
+
+
+def test_single_query_lists_round_trips(monkeypatch):
+    async def work(session) -> None:
+        await seed_catalog(session, books=benchmark_size('LIST_BOOKS', 20_000))
+        for name, page in _pages(session).items():
+            timings, round_trips = {}, {}
+            for single_query_lists, mode in [(True, 'single query'), (False, 'selectinload')]:
+                monkeypatch.setattr(settings, 'single_query_lists', single_query_lists)
+                run = page(40)
+                with captured_statements(session) as statements:
+                    await run()
+                round_trips[mode] = len(statements)
+                timings[mode] = await measure_async(run, REPEAT)
+
+            report(f'{name} of 40, round trips', round_trips)
+            report(f'{name} of 40, latency', timings)
+            assert round_trips['single query'] == 1
+
+    run_in_session(work)
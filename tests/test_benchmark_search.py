@@ -0,0 +1,59 @@
+"""search_books latency on a generated catalog of 1M books (BENCHMARK_SEARCH_BOOKS).
+
+Common words match a few percent of the catalog, every match is ranked before
+the page is cut, so they are the slow end; author numbers match a handful.
+"""
+from app.db.queries import tables as models
+from app.db.repositories.books.books import BookRepository
+from tests.benchmark import benchmark_size, captured_statements, explain, measure_async, random_ids, report, \
+    requires_benchmarks, seed_catalog
+from tests.conftest import requires_database, run_in_session
+
+pytestmark = [requires_database, requires_benchmarks]
+
+REPEAT = 30
+
+QUERIES = {
+    'common word': 'river',
+    'two words': 'silent river',
+    'phrase': '"winter garden"',
+    'excluded word': 'library -war',
+    'or': 'dragon or raven',
+}
+
+
+def test_search_books_on_a_large_catalog():
+    async def work(session) -> None:
+        catalog = await seed_catalog(session, books=benchmark_size('SEARCH_BOOKS', 1_000_000))
+        books = BookRepository(session)
+        user = models.User(uid=(await random_ids(session, 'SELECT uid FROM jbook."user"', 1))[0])
+        # author names end with their number, a term only their own books carry
+        rare = [name.rsplit(' ', 1)[-1] for name in await random_ids(
+            session, 'SELECT name FROM jbook.book_author WHERE name ~ \' [0-9]+$\'', REPEAT + 3)]
+        tag = (await random_ids(session, 'SELECT name FROM jbook.book_tag', 1))[0]
+
+        timings = {}
+        for name, q in QUERIES.items():
+            timings[name] = await measure_async(lambda: books.search_books(q, user=user), REPEAT)
+            timings[f'{name}, tag facet'] = await measure_async(
+                lambda: books.search_books(q, tags=[tag], user=user), REPEAT)
+
+        rare_terms = iter(rare)
+        timings['rare term'] = await measure_async(lambda: books.search_books(next(rare_terms), user=user), REPEAT)
+
+        first_page = await books.search_books(QUERIES['common word'], user=user)
+        last = first_page[-1]
+        timings['common word, second page'] = await measure_async(
+            lambda: books.search_books(QUERIES['common word'], user=user, after=(last.rank, last.id)), REPEAT)
+
+        report(f'search_books over {catalog.books} books', timings)
+
+        for name, q in [('common word', QUERIES['common word']), ('rare term', rare[0])]:
+            with captured_statements(session) as statements:
+                await books.search_books(q, user=user)
+            (statement, parameters), = statements
+            plan = await explain(session, statement, parameters)
+            print(f'-- plan of {name} {q!r}\n{plan}')
+            assert 'ix_book_search_vector' in plan
+
+    run_in_session(work)
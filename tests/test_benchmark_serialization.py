@@ -0,0 +1,120 @@
+"""Cost of rendering list pages to json, no database needed.
+
+Pages are synthetic, built the way the repositories return them: BookRow
+records with json relations from the single query path, ORM instances from
+the relationship loading path.
+"""
+import asyncio
+import datetime
+
+import orjson
+import pytest
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse
+
+from app.api.responses import model_response
+from app.db.queries import tables as models
+from app.db.rows import BookRow
+from app.models.schemas.books import ListOfBooksInResponse
+from app.models.serialization import dump_json
+from tests.benchmark import WORDS, measure, measure_async, report, requires_benchmarks
+from tests.conftest import settings
+
+pytestmark = requires_benchmarks
+
+CREATED_AT = datetime.datetime(2021, 5, 4, 12, 30)
+
+
+def _word(i: int) -> str:
+    return WORDS[i % len(WORDS)]
+
+
+def book_rows(count: int) -> list[BookRow]:
+    return [
+        BookRow(
+            id=i,
+            title=f'{_word(i)} {_word(i * 7)}'.title(),
+            description=' '.join(_word(i * k) for k in range(3, 40)),
+            annotation=' '.join(_word(i * k) for k in range(5, 15)),
+            pub_date=CREATED_AT - datetime.timedelta(days=i),
+            created_at=CREATED_AT,
+            updated_at=CREATED_AT,
+            publisher_id=i % 50,
+            rate=(i % 50) / 10 or None,
+            user_rate=i % 5 or None,
+            categories=[{'id': i % 40, 'name': f'category {i % 40}'}],
+            authors=[{'id': i * 2 + k, 'name': f'{_word(i + k)} {_word(i * 3 + k)}'.title()} for k in range(2)],
+            publisher={'id': i % 50, 'name': f'{_word(i)} press'.title()},
+            tags=[{'name': f'{_word(i + k)}-{k}'} for k in range(4)],
+            images=[{'id': i, 'src': f'/covers/{i}.png', 'alt_text': 'cover', 'is_main': True}],
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def orm_books(count: int) -> list[models.Book]:
+    """Transient instances carrying the rates the ORM path sets on loaded books."""
+    books = []
+    for row in book_rows(count):
+        book = models.Book(
+            id=row.id, title=row.title, description=row.description, annotation=row.annotation,
+            pub_date=row.pub_date, created_at=row.created_at, updated_at=row.updated_at,
+            publisher_id=row.publisher_id,
+            publisher=models.BookPublisher(**row.publisher),
+            authors=[models.BookAuthor(**author) for author in row.authors],
+            categories=[models.BookCategory(**category) for category in row.categories],
+            tags=[models.BookTag(**tag) for tag in row.tags],
+            images=[models.BookImage(**image) for image in row.images],
+        )
+        book.rate, book.user_rate = row.rate, row.user_rate
+        books.append(book)
+    return books
+
+
+BOOK_PAGES = {'rows': book_rows, 'orm': orm_books}
+
+
+RESPONSE_FIELD = create_response_field('response', ListOfBooksInResponse)
+
+
+async def _validated_response(books) -> bytes:
+    """What FastAPI does to ListOfBooksInResponse(books=books) returned by an async route with its response_model."""
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=ListOfBooksInResponse(books=books))
+    return JSONResponse(content).body
+
+
+async def _fast_response(books) -> bytes:
+    return model_response(ListOfBooksInResponse, books=books).body
+
+
+@pytest.mark.parametrize('source', BOOK_PAGES)
+@pytest.mark.parametrize('size', [40, 500])
+def test_fast_responses_against_validated_responses(monkeypatch, source, size):
+    monkeypatch.setattr(settings, 'fast_json_responses', True)
+    books = BOOK_PAGES[source](size)
+    repeat = max(10, 2000 // size)
+
+    async def run() -> dict:
+        assert orjson.loads(await _fast_response(books)) == orjson.loads(await _validated_response(books))
+        return {
+            'response_model': await measure_async(lambda: _validated_response(books), repeat=repeat),
+            'fast_json_responses': await measure_async(lambda: _fast_response(books), repeat=repeat),
+        }
+
+    report(f'ListOfBooksInResponse of {size} {source}', asyncio.run(run()))
+
+
+@pytest.mark.parametrize('source', BOOK_PAGES)
+def test_serializer_against_pydantic_on_1000_books(source):
+    books = BOOK_PAGES[source](1000)
+    content = {'books': books}
+    assert orjson.loads(dump_json(ListOfBooksInResponse, content)) == \
+        orjson.loads(ListOfBooksInResponse(**content).json(by_alias=True))
+
+    report(f'1000 {source} as ListOfBooksInResponse', {
+        'pydantic .dict()': measure(lambda: ListOfBooksInResponse(**content).dict(by_alias=True), repeat=10),
+        'pydantic .json()': measure(lambda: ListOfBooksInResponse(**content).json(by_alias=True), repeat=10),
+        'RWModel.serialize': measure(lambda: ListOfBooksInResponse.serialize(content), repeat=50),
+        'dump_json': measure(lambda: dump_json(ListOfBooksInResponse, content), repeat=50),
+    })
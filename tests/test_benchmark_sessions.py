@@ -0,0 +1,61 @@
+"""Per request cost of the READ ONLY session of safe methods against the begin/commit unit of work of writes.
+
+Every sample opens a session from the pool, runs one request worth of reads
+and ends it the way get_session does. The reads run against DATABASE_URL as it
+is, point it at a populated database for pages that carry books.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.events import _read_session_maker
+from app.db.repositories.books.books import BookRepository
+from tests.benchmark import measure_async, report, requires_benchmarks
+from tests.conftest import requires_database, settings
+
+pytestmark = [requires_database, requires_benchmarks]
+
+REPEAT = 300
+
+
+async def _select_one(session: AsyncSession) -> None:
+    await session.execute(text('SELECT 1'))
+
+
+async def _book_page(session: AsyncSession) -> None:
+    await BookRepository(session).filter_books(limit=40)
+
+
+WORKLOADS = {'SELECT 1': _select_one, '40 books': _book_page}
+
+
+@pytest.mark.parametrize('single_query_lists', [True, False], ids=['rows', 'orm'])
+def test_read_only_sessions_against_commits(monkeypatch, single_query_lists):
+    monkeypatch.setattr(settings, 'single_query_lists', single_query_lists)
+
+    async def run() -> None:
+        engine = create_async_engine(settings.database_url, **settings.engine_kwargs)
+        write_session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+        read_session_maker = _read_session_maker(engine)
+        try:
+            for name, work in WORKLOADS.items():
+                async def committed() -> None:
+                    async with write_session_maker() as session:
+                        async with session.begin():
+                            await work(session)
+
+                async def read_only() -> None:
+                    async with read_session_maker() as session:
+                        await work(session)
+
+                report(f'{name}, {"rows" if single_query_lists else "orm"}', {
+                    'begin/commit': await measure_async(committed, REPEAT),
+                    'read only': await measure_async(read_only, REPEAT),
+                })
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
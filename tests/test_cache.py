@@ -0,0 +1,43 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.responses import cached_json_response
+from app.models.schemas.tags import TagsInList
+from app.services.cache import TTLCache
+
+
+def _serve(cache: TTLCache, tags: list[str], replica: bool) -> bytes:
+    async def build() -> TagsInList:
+        return TagsInList(tags=tags)
+
+    session = AsyncSession(info={'replica': replica})
+    return asyncio.run(cached_json_response(cache, 'tags', build, session)).body
+
+
+def test_invalidated_within():
+    cache = TTLCache(max_size=2, ttl=None)
+    assert not cache.invalidated_within('tags', 5)
+
+    cache.invalidate('tags')
+    assert cache.invalidated_within('tags', 5)
+    assert not cache.invalidated_within('tags', 0)
+
+
+def test_replica_read_after_invalidation_is_not_stored():
+    cache = TTLCache(max_size=2, ttl=None)
+    _serve(cache, ['old'], replica=True)
+    cache.invalidate('tags')
+
+    # a lagging replica may still answer with the old tags
+    assert b'old' in _serve(cache, ['old'], replica=True)
+    assert b'new' in _serve(cache, ['new'], replica=False)
+    assert b'new' in _serve(cache, ['newer'], replica=True)
+
+
+def test_cache_stats_require_a_token(client, auth_headers):
+    assert client.get(client.app.url_path_for('stats:caches')).status_code == 401
+
+    response = client.get(client.app.url_path_for('stats:caches'), headers=auth_headers)
+    assert response.status_code == 200
+    assert set(response.json()['caches']) == {'reference', 'users', 'tokens', 'query_shapes'}
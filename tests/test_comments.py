@@ -0,0 +1,102 @@
+import datetime
+import uuid
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from app.db.queries import tables as models
+from tests.conftest import requires_database, run_in_session
+
+pytestmark = requires_database
+
+
+@pytest.fixture
+def book_id(user_uid: uuid.UUID) -> int:
+    async def create(session) -> int:
+        book = models.Book(title='Comment feed', pub_date=datetime.datetime(2020, 1, 1))
+        session.add(book)
+        await session.flush()
+        return book.id
+
+    _book_id = run_in_session(create, commit=True)
+    yield _book_id
+
+    async def remove(session) -> None:
+        await session.execute(delete(models.BookComment).filter(models.BookComment.book_id == _book_id))
+        await session.execute(delete(models.BookStats).filter(models.BookStats.book_id == _book_id))
+        await session.execute(delete(models.Book).filter(models.Book.id == _book_id))
+        await session.execute(delete(models.User).filter(models.User.uid == user_uid))
+
+    run_in_session(remove, commit=True)
+
+
+@pytest.fixture
+def shelf_uid(user_uid: uuid.UUID) -> uuid.UUID:
+    async def create(session) -> uuid.UUID:
+        session.add(models.User(uid=user_uid, first_name='Test', surname='User'))
+        shelf = models.Shelf(name='Comment feed', description='', type='public', user_uid=user_uid)
+        session.add(shelf)
+        await session.flush()
+        return shelf.uid
+
+    _shelf_uid = run_in_session(create, commit=True)
+    yield _shelf_uid
+
+    async def remove(session) -> None:
+        await session.execute(delete(models.ShelfComment).filter(models.ShelfComment.shelf_uid == _shelf_uid))
+        await session.execute(delete(models.ShelfStats).filter(models.ShelfStats.shelf_uid == _shelf_uid))
+        await session.execute(delete(models.Shelf).filter(models.Shelf.uid == _shelf_uid))
+        await session.execute(delete(models.User).filter(models.User.uid == user_uid))
+
+    run_in_session(remove, commit=True)
+
+
+def _count_comments(table, key_column, key) -> int:
+    async def count(session) -> int:
+        return len((await session.execute(select(table.id).filter(key_column == key))).all())
+
+    return run_in_session(count)
+
+
+def test_book_comment_is_persisted_once(client, auth_headers, book_id):
+    response = client.post(f'/api/books/{book_id}/comments/', json={'comment': {'content': 'Great read'}},
+                           headers=auth_headers)
+    assert response.status_code == 200
+    comment = response.json()['comment']
+    assert comment['content'] == 'Great read'
+    assert comment['user'] == {'firstName': 'Test', 'surname': 'User'}
+
+    response = client.get(f'/api/books/{book_id}/comments/')
+    assert response.status_code == 200
+    body = response.json()
+    assert [c['id'] for c in body['comments']] == [comment['id']]
+    assert body['commentsCount'] == 1
+    assert _count_comments(models.BookComment, models.BookComment.book_id, book_id) == 1
+
+
+def test_shelf_comment_is_persisted_once(client, auth_headers, shelf_uid):
+    response = client.post(f'/api/shelves/{shelf_uid}/comments/', json={'comment': {'content': 'Nice pick'}},
+                           headers=auth_headers)
+    assert response.status_code == 200
+    comment = response.json()['comment']
+
+    response = client.get(f'/api/shelves/{shelf_uid}/comments/')
+    assert response.status_code == 200
+    body = response.json()
+    assert [c['id'] for c in body['comments']] == [comment['id']]
+    assert body['commentsCount'] == 1
+    assert _count_comments(models.ShelfComment, models.ShelfComment.shelf_uid, shelf_uid) == 1
+
+
+def test_comment_without_pub_date_is_listed(client, user_uid, book_id):
+    async def create(session) -> None:
+        session.add(models.User(uid=user_uid, first_name='Test', surname='User'))
+        await session.flush()
+        session.add(models.BookComment(book_id=book_id, user_uid=user_uid, content='Undated', pub_date=None))
+
+    run_in_session(create, commit=True)
+
+    response = client.get(f'/api/books/{book_id}/comments/')
+    assert response.status_code == 200
+    assert [(c['content'], c['pubDate']) for c in response.json()['comments']] == [('Undated', None)]
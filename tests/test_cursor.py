@@ -0,0 +1,87 @@
+import datetime
+import uuid
+
+import pytest
+from starlette.exceptions import HTTPException
+
+from app.api.dependencies.books import BookFilterManager, BookSearchManager, SEARCH_SORT_BY
+from app.api.dependencies.comments import comments_page
+from app.api.dependencies.shelves import ShelfFilterManager
+from app.core.cursor import cursor_value, decode_cursor, encode_cursor
+
+PUB_DATE = datetime.datetime(2021, 5, 4, 12, 30)
+
+
+def test_cursor_round_trip():
+    shelf_uid = uuid.uuid4()
+    assert decode_cursor(encode_cursor('-created_at', PUB_DATE, shelf_uid)) == ('-created_at', PUB_DATE, shelf_uid)
+
+
+@pytest.mark.parametrize('value, type_, nullable, expected', [
+    ('title', str, False, 'title'),
+    (4, float, False, 4.0),
+    (4.5, float, True, 4.5),
+    (None, float, True, None),
+    (PUB_DATE, datetime.datetime, False, PUB_DATE),
+])
+def test_cursor_value(value, type_, nullable, expected):
+    assert cursor_value(value, type_, nullable) == expected
+
+
+@pytest.mark.parametrize('value, type_', [
+    (None, str),
+    ('2021-05-04', datetime.datetime),
+    (PUB_DATE.replace(tzinfo=datetime.timezone.utc), datetime.datetime),
+    ('1', int),
+    (1.5, int),
+    (True, int),
+    ('4.5', float),
+    ([1], str),
+])
+def test_cursor_value_rejects(value, type_):
+    with pytest.raises(ValueError):
+        cursor_value(value, type_)
+
+
+def test_book_cursor_values_are_checked():
+    manager = BookFilterManager(['title', 'rate', 'pub_date', 'created_at'])
+    assert manager.decode_after(encode_cursor('-pub_date', PUB_DATE, 7), '-pub_date') == (PUB_DATE, 7)
+    assert manager.decode_after(encode_cursor('rate', None, 7), 'rate') == (None, 7)
+
+    for cursor, sort_by in [
+        (encode_cursor('-pub_date', 'yesterday', 7), '-pub_date'),
+        (encode_cursor('title', 'Dune', '7'), 'title'),
+        (encode_cursor('rate', 'high', 7), 'rate'),
+        (encode_cursor('title', None, 7), 'title'),
+    ]:
+        with pytest.raises(HTTPException) as error:
+            manager.decode_after(cursor, sort_by)
+        assert error.value.status_code == 400
+
+
+def test_search_cursor_values_are_checked():
+    manager = BookSearchManager()
+    assert manager.decode_after(encode_cursor(SEARCH_SORT_BY, 0.5, 7), SEARCH_SORT_BY) == (0.5, 7)
+
+    with pytest.raises(HTTPException):
+        manager.decode_after(encode_cursor(SEARCH_SORT_BY, {'dt': 'x'}, 7), SEARCH_SORT_BY)
+
+
+def test_shelf_cursor_values_are_checked():
+    manager = ShelfFilterManager(['name', 'created_at'])
+    shelf_uid = uuid.uuid4()
+    assert manager.decode_after(encode_cursor('name', 'Sci-fi', shelf_uid), 'name') == ('Sci-fi', shelf_uid)
+
+    with pytest.raises(HTTPException) as error:
+        manager.decode_after(encode_cursor('name', 'Sci-fi', str(shelf_uid)), 'name')
+    assert error.value.status_code == 400
+
+
+def test_comment_cursor_values_are_checked():
+    assert comments_page.decode_after(encode_cursor(PUB_DATE, 7)) == (PUB_DATE, 7)
+    assert comments_page.decode_after(encode_cursor(None, 7)) == (None, 7)
+
+    for cursor in [encode_cursor('2021-05-04', 7), encode_cursor(PUB_DATE, '7'), encode_cursor(PUB_DATE)]:
+        with pytest.raises(HTTPException) as error:
+            comments_page.decode_after(cursor)
+        assert error.value.status_code == 400
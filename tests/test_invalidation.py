@@ -0,0 +1,114 @@
+import asyncio
+import json
+import uuid
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.cache import reference_cache, BOOK_TAGS, SHELF_TAGS
+from app.services import invalidation
+from app.services.invalidation import InvalidationBus, invalidation_bus
+from tests.conftest import requires_database, run_in_session, settings
+
+
+def test_publish_waits_for_flush():
+    session = AsyncSession()
+    reference_cache.set(SHELF_TAGS, b'{"tags": []}')
+
+    invalidation_bus.publish(session, 'tag', 'shelf')
+    invalidation_bus.publish(session, 'tag', 'shelf')
+    assert reference_cache.get(SHELF_TAGS) is not None
+    assert list(session.info['invalidation_events']) == [('tag', 'shelf')]
+
+
+def test_flush_without_events_is_a_noop():
+    reference_cache.set(BOOK_TAGS, b'{"tags": []}')
+    asyncio.run(invalidation_bus.flush(AsyncSession()))
+    assert reference_cache.get(BOOK_TAGS) is not None
+
+
+@requires_database
+def test_flush_evicts_and_notifies():
+    reference_cache.set(SHELF_TAGS, b'{"tags": []}')
+
+    async def work(session) -> dict:
+        invalidation_bus.publish(session, 'tag', 'shelf')
+        await invalidation_bus.flush(session)
+        return session.info
+
+    info = run_in_session(work)
+    assert reference_cache.get(SHELF_TAGS) is None
+    assert 'invalidation_events' not in info
+
+
+class _ClosedConnection:
+    def is_closed(self) -> bool:
+        return True
+
+
+def test_listener_survives_interface_errors(monkeypatch):
+    bus = InvalidationBus(reconnect_delay=0.01)
+    served = []
+
+    async def connect(dsn):
+        return _ClosedConnection()
+
+    async def serve(connection):
+        served.append(connection)
+        if len(served) == 1:
+            raise asyncpg.InterfaceError('connection is closed')
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(invalidation.asyncpg, 'connect', connect)
+    monkeypatch.setattr(bus, '_serve', serve)
+
+    async def run() -> None:
+        await bus.start('postgresql://unused')
+        for _ in range(100):
+            if len(served) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await bus.stop()
+
+    asyncio.run(run())
+    assert len(served) == 2
+
+
+@requires_database
+def test_listener_reconnects_after_losing_its_connection():
+    channel = f'jbook_invalidation_test_{uuid.uuid4().hex[:8]}'
+    bus = InvalidationBus(channel=channel, reconnect_delay=0.05)
+    seen = []
+    bus.subscribe('tag', seen.append)
+
+    async def run() -> None:
+        connection = await asyncpg.connect(settings.asyncpg_dsn)
+
+        async def notify_until_seen(key: str) -> None:
+            payload = json.dumps({'entity': 'tag', 'key': key})
+            for _ in range(100):
+                await connection.execute('SELECT pg_notify($1, $2)', channel, payload)
+                await asyncio.sleep(0.05)
+                if key in seen:
+                    return
+            raise AssertionError(f'{key} was never dispatched')
+
+        await bus.start(settings.asyncpg_dsn)
+        try:
+            await notify_until_seen('before')
+
+            # the listener's backend, its last statement is the LISTEN
+            terminated = await connection.fetchval(
+                'SELECT count(pg_terminate_backend(pid)) FROM pg_stat_activity WHERE query LIKE $1',
+                f'LISTEN %{channel}%',
+            )
+            assert terminated == 1
+
+            await notify_until_seen('after')
+        finally:
+            await bus.stop()
+            await connection.close()
+
+    asyncio.run(run())
+    # every (re)connect evicts everything, notifications sent while away are lost
+    assert seen.count(None) == 2
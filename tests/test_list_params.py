@@ -0,0 +1,48 @@
+import datetime
+import uuid
+
+import pytest
+
+from app.core.const import DEFAULT_BOOK_ORDER_BY, DEFAULT_SHELF_ORDER_BY
+from app.core.cursor import encode_cursor
+from app.api.routes.books import book_filter_manager
+from app.api.routes.shelves import shelf_filter_manager
+from tests.conftest import requires_database
+
+# rejected while resolving the dependencies, before any query runs
+BAD_LIST_PARAMS = [
+    ('/api/books/', 'cursor=garbage'),
+    ('/api/books/', f'sort_by=title&cursor={encode_cursor("title", {"dt": "2021-01-01T00:00:00"}, 1)}'),
+    ('/api/books/', 'sort_by=-popularity'),
+    ('/api/shelves/', 'cursor=garbage'),
+    ('/api/shelves/', f'sort_by=name&cursor={encode_cursor("name", "Sci-fi", "not a uuid")}'),
+    ('/api/shelves/', f'sort_by=-created_at&cursor={encode_cursor("-created_at", "yesterday", str(uuid.uuid4()))}'),
+    ('/api/shelves/', 'sort_by=-created_at&cursor=' + encode_cursor('name', 'Sci-fi', str(uuid.uuid4()))),
+    ('/api/shelves/', 'sort_by=popularity'),
+]
+
+
+@pytest.mark.parametrize('path, query', BAD_LIST_PARAMS)
+def test_bad_list_params_are_400(client, path, query):
+    response = client.get(f'{path}?{query}')
+    assert response.status_code == 400
+
+
+def _filter_params(**params) -> dict:
+    defaults = dict(tags=None, sort_by='', offset=0, limit=10, cursor=None)
+    return {**defaults, **params}
+
+
+def test_empty_sort_by_is_the_default_order():
+    assert book_filter_manager(**_filter_params(categories=None, publishers=None, authors=None, facets=None)) \
+        .sort_by == DEFAULT_BOOK_ORDER_BY
+    assert shelf_filter_manager(**_filter_params()).sort_by == DEFAULT_SHELF_ORDER_BY
+
+    cursor = encode_cursor(DEFAULT_SHELF_ORDER_BY, datetime.datetime(2021, 1, 1), uuid.uuid4())
+    assert shelf_filter_manager(**_filter_params(cursor=cursor)).after is not None
+
+
+@requires_database
+@pytest.mark.parametrize('path', ['/api/books/', '/api/shelves/'])
+def test_empty_sort_by_lists(client, path):
+    assert client.get(f'{path}?sort_by=').status_code == 200
@@ -0,0 +1,143 @@
+import datetime
+import uuid
+
+import orjson
+import pytest
+
+from app.api.dependencies.database import RAW_REPOSITORIES
+from app.db.queries import tables as models
+from app.db.repositories.books.books import BookRepository
+from app.db.repositories.shelves.shelves import ShelfRepository
+from app.models.schemas.books import BookInResponse, ListOfBooksInResponse
+from app.models.schemas.shelves import ListOfShelvesInResponse
+from app.models.serialization import dump_json
+from tests.conftest import requires_database, run_in_session, settings
+
+pytestmark = requires_database
+
+BOOK_SORTS = ['title', '-title', 'rate', '-rate', 'pub_date', '-pub_date', 'created_at', '-created_at']
+SHELF_SORTS = ['name', '-name', 'created_at', '-created_at']
+
+
+@pytest.fixture(params=[True, False], ids=['single_query', 'relationship_loads'])
+def single_query_lists(request, monkeypatch) -> bool:
+    monkeypatch.setattr(settings, 'single_query_lists', request.param)
+    return request.param
+
+
+async def _create_fixtures(session, user_uid: uuid.UUID) -> dict:
+    """Books and a shelf tagged with a fresh tag, so filtering by it leaves out everything else."""
+    suffix = uuid.uuid4().hex[:8]
+    user = models.User(uid=user_uid, first_name='Raw', surname='Parity')
+    author = models.BookAuthor(name=f'author {suffix}')
+    category = models.BookCategory(name=f'category {suffix}', popularity=1)
+    publisher = models.BookPublisher(name=f'publisher {suffix}')
+    book_tag = models.BookTag(name=f'book-{suffix}')
+    shelf_tag = models.ShelfTag(name=f'shelf-{suffix}')
+
+    books = [
+        models.Book(
+            title=f'{title} {suffix}',
+            description='description',
+            annotation='annotation',
+            pub_date=datetime.datetime(2000 + i, 1, 1),
+            publisher=publisher,
+            authors=[author],
+            categories=[category],
+            tags=[book_tag],
+            images=[models.BookImage(src=f'/{i}.png', alt_text=title, is_main=True)],
+        )
+        for i, title in enumerate(['Gamma', 'Alpha', 'Beta'])
+    ]
+    session.add_all([user, shelf_tag, *books])
+    await session.flush()
+
+    # the first book stays unrated so the rate order has a NULL to place
+    session.add_all([
+        models.BookRate(book_id=books[1].id, user_uid=user_uid, rate=4),
+        models.BookRate(book_id=books[2].id, user_uid=user_uid, rate=2),
+    ])
+
+    shelves = [
+        models.Shelf(
+            name=f'{name} {suffix}',
+            description='description',
+            type='public',
+            user_uid=user_uid,
+            avatar=models.ShelfImage(src=f'/{name}.png', alt_text=name),
+            tags=[shelf_tag],
+            books_in_shelf=[models.BookInShelf(book_id=book.id) for book in books],
+        )
+        for name in ['Second', 'First']
+    ]
+    session.add_all(shelves)
+    await session.flush()
+    session.expunge_all()
+
+    return {'user': user, 'books': [book.id for book in books], 'book_tag': book_tag.name,
+            'shelf_tag': shelf_tag.name}
+
+
+def _repositories(session, repo_type):
+    return repo_type(session), RAW_REPOSITORIES[repo_type](session)
+
+
+def _dump(schema, **content) -> dict:
+    return orjson.loads(dump_json(schema, content))
+
+
+@pytest.mark.parametrize('with_user', [True, False], ids=['user', 'anonymous'])
+def test_filter_books_matches_orm(user_uid, single_query_lists, with_user):
+    async def work(session) -> None:
+        fixtures = await _create_fixtures(session, user_uid)
+        user = fixtures['user'] if with_user else None
+        orm, raw = _repositories(session, BookRepository)
+
+        for sort_by in BOOK_SORTS:
+            expected = await orm.filter_books(tags=[fixtures['book_tag']], user=user, sort_by=sort_by)
+            actual = await raw.filter_books(tags=[fixtures['book_tag']], user=user, sort_by=sort_by)
+            assert len(expected) == len(fixtures['books'])
+            assert _dump(ListOfBooksInResponse, books=actual) == _dump(ListOfBooksInResponse, books=expected), sort_by
+
+            expected_page = await orm.filter_books(tags=[fixtures['book_tag']], user=user, sort_by=sort_by,
+                                                   limit=1, offset=1)
+            actual_page = await raw.filter_books(tags=[fixtures['book_tag']], user=user, sort_by=sort_by,
+                                                 limit=1, offset=1)
+            assert _dump(ListOfBooksInResponse, books=actual_page) == \
+                _dump(ListOfBooksInResponse, books=expected_page), sort_by
+
+    run_in_session(work)
+
+
+def test_get_book_by_id_matches_orm(user_uid):
+    async def work(session) -> None:
+        fixtures = await _create_fixtures(session, user_uid)
+        orm, raw = _repositories(session, BookRepository)
+
+        for book_id in fixtures['books']:
+            for user in (fixtures['user'], None):
+                expected = await orm.get_book_by_id(book_id, user=user)
+                actual = await raw.get_book_by_id(book_id, user=user)
+                assert _dump(BookInResponse, book=actual) == _dump(BookInResponse, book=expected)
+
+        assert await raw.get_book_by_id(-1) is None
+
+    run_in_session(work)
+
+
+def test_filter_shelves_matches_orm(user_uid, single_query_lists):
+    async def work(session) -> None:
+        fixtures = await _create_fixtures(session, user_uid)
+        orm, raw = _repositories(session, ShelfRepository)
+
+        for sort_by in SHELF_SORTS:
+            for only_user in (False, True):
+                kwargs = dict(tags=[fixtures['shelf_tag']], sort_by=sort_by, user=fixtures['user'],
+                              only_user=only_user)
+                expected = await orm.filter_shelves(**kwargs)
+                actual = await raw.filter_shelves(**kwargs)
+                assert len(expected) == 2
+                assert _dump(ListOfShelvesInResponse, shelves=actual) == \
+                    _dump(ListOfShelvesInResponse, shelves=expected), sort_by
+
+    run_in_session(work)